@@ -1,52 +1,82 @@
-from django.db.models import Prefetch, Q, Subquery, OuterRef
+from django.db.models import Prefetch, Q, Subquery, OuterRef, Exists
 from django.utils import timezone
 
-from .models import Activity, Announcement
+from .models import Activity, ActivityInbox, Announcement, AnnouncementTarget
 from .serializers import ActivitySerializer, AnnouncementSerializer
 from ..events.models import Event
 
+ACTIVITY_PAGE_SIZE = 40
+READ_REQUIRED_ACTION_ACTIVITIES_COUNT = 20
 
-def get_activities(person):
-    return (
-        activity
-        for activity in Activity.objects.without_required_action()
-        .filter(recipient=person)
-        .select_related("supportgroup", "individual")
-        .prefetch_related(
-            Prefetch("event", Event.objects.with_serializer_prefetch(person),)
-        )[:40]
-        if person.role.has_perm("activity.view_activity", activity)
+
+def _with_serializer_prefetch(activities, person):
+    return activities.select_related("supportgroup", "individual").prefetch_related(
+        Prefetch("event", Event.objects.with_serializer_prefetch(person),)
     )
 
 
+def get_activities(person, before=None, limit=ACTIVITY_PAGE_SIZE):
+    """Renvoie une page des activités de la personne
+
+    :param before: l'identifiant de la dernière activité de la page précédente
+    """
+    activities = Activity.objects.without_required_action().visible_to(person)
+
+    if before is not None:
+        activities = activities.before(before)
+
+    return _with_serializer_prefetch(activities, person)[:limit]
+
+
 def get_required_action_activities(person):
-    required_action_activities = (
-        Activity.objects.with_required_action()
-        .filter(recipient=person)
-        .select_related("supportgroup", "individual")
-        .prefetch_related(
-            Prefetch("event", Event.objects.with_serializer_prefetch(person),)
-        )
+    required_action_activities = _with_serializer_prefetch(
+        Activity.objects.with_required_action().visible_to(person), person
+    )
+
+    # On affiche toutes les activités avec action requise non traitées, et les 20
+    # dernières activités avec action requise déjà traitées
+    unread_required_action_activities = list(
+        required_action_activities.exclude(status=Activity.STATUS_INTERACTED)
     )
-    # On affiche toutes les activités avec action requise non traitées
-    unread_required_action_activities = required_action_activities.exclude(
-        status=Activity.STATUS_INTERACTED
+    read_required_action_activities = list(
+        required_action_activities.filter(status=Activity.STATUS_INTERACTED).order_by(
+            "-created"
+        )[:READ_REQUIRED_ACTION_ACTIVITIES_COUNT]
     )
-    # On affiche les 20 dernières activités avec action requise déjà traitées
-    read_required_action_activities = required_action_activities.filter(
-        status=Activity.STATUS_INTERACTED
-    ).order_by("-created")[:20]
-
-    return (
-        activity
-        for activity in required_action_activities.filter(
-            pk__in=[a.pk for a in unread_required_action_activities]
-            + [a.pk for a in read_required_action_activities]
-        ).order_by("-created")
-        if person.role.has_perm("activity.view_activity", activity)
+
+    return sorted(
+        unread_required_action_activities + read_required_action_activities,
+        key=lambda a: a.created,
+        reverse=True,
     )
 
 
+def get_activity_counts(person):
+    """Renvoie le nombre d'activités non lues, et d'activités avec action requise non
+    traitées de la personne"""
+    return ActivityInbox.get_counts(person)
+
+
+def is_targeted(announcement, person):
+    """Indique si la personne fait partie du public de l'annonce
+
+    Le public des annonces est précalculé : l'appartenance est alors vérifiée dans la
+    même requête que la liste des annonces. Seules les personnes créées après le dernier
+    calcul, et les annonces dont le public n'a pas encore été calculé, sont testées
+    individuellement.
+    """
+    segment = announcement.segment
+
+    if segment is None:
+        return True
+
+    computed_at = announcement.targets_computed_at
+    if computed_at is not None and person.created < computed_at:
+        return announcement.is_target
+
+    return segment.get_subscribers_queryset().filter(pk=person.id).exists()
+
+
 def get_announcements(person=None):
     today = timezone.now()
     cond = Q(start_date__lt=today) & (Q(end_date__isnull=True) | Q(end_date__gt=today))
@@ -60,9 +90,8 @@ def get_announcements(person=None):
     )
 
     if person:
-        return [
-            a
-            for a in announcements.exclude(
+        announcements = (
+            announcements.exclude(
                 Q(
                     activity__in=Activity.objects.filter(
                         recipient=person, status=Activity.STATUS_INTERACTED
@@ -75,11 +104,16 @@ def get_announcements(person=None):
                     Activity.objects.filter(
                         recipient=person, announcement_id=OuterRef("id")
                     ).values("id")[:1]
-                )
+                ),
+                is_target=Exists(
+                    AnnouncementTarget.objects.filter(
+                        announcement_id=OuterRef("id"), person=person
+                    )
+                ),
             )
             .select_related("segment")
-            if a.segment is None
-            or a.segment.get_subscribers_queryset().filter(pk=person.id).exists()
-        ]
+        )
+
+        return [a for a in announcements if is_targeted(a, person)]
     else:
         return announcements.filter(segment__isnull=True)
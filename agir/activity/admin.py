@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 
 from agir.activity.models import Activity, Announcement
+from agir.lib.images import variation_url
 
 
 @admin.register(Activity)
@@ -59,10 +60,10 @@ class AnnouncementAdmin(admin.ModelAdmin):
             return "-"
 
         mobile = format_html(
-            self.MINIATURE_BOX, type="mobile", link=obj.image.mobile.url
+            self.MINIATURE_BOX, type="mobile", link=variation_url(obj.image, "mobile")
         )
         desktop = format_html(
-            self.MINIATURE_BOX, type="desktop", link=obj.image.desktop.url
+            self.MINIATURE_BOX, type="desktop", link=variation_url(obj.image, "desktop")
         )
 
         return format_html(
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ActivityConfig(AppConfig):
     name = "agir.activity"
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,134 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Les listes de types correspondent à Activity.DISPLAYED_TYPES et
+# Activity.REQUIRED_ACTION_ACTIVITY_TYPES au moment de cette migration : toute
+# modification de ces listes doit s'accompagner d'une mise à jour de la fonction
+# activity_inbox_increments (vérifié par ActivityInboxTestCase).
+UNREAD_TYPES = """
+'group-info-update', 'new-attendee', 'event-update', 'new-event-mygroups', 'new-report',
+'cancelled-event', 'referral-accepted', 'group-coorganization-info', 'new-event-aroundme',
+'accepted-invitation-member', 'group-coorganization-accepted', 'transferred-group-member',
+'new-members-through-transfer', 'new-message', 'new-comment'
+"""
+REQUIRED_ACTION_TYPES = """
+'waiting-payment', 'group-invitation', 'new-member', 'waiting-location-group',
+'group-coorganization-invite', 'waiting-location-event', 'group-creation-confirmation',
+'group-membership-limit-reminder'
+"""
+
+ADD_INBOX_TRIGGER = f"""
+-- noinspection SqlResolve
+CREATE FUNCTION activity_inbox_increments(
+  type activity_activity.type%TYPE, status activity_activity.status%TYPE,
+  OUT unread integer, OUT required_action integer
+) AS $$
+BEGIN
+  unread := CASE WHEN type IN ({UNREAD_TYPES}) AND status = 'U' THEN 1 ELSE 0 END;
+  required_action := CASE WHEN type IN ({REQUIRED_ACTION_TYPES}) AND status <> 'I' THEN 1 ELSE 0 END;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+CREATE FUNCTION process_update_activity() RETURNS TRIGGER AS $$
+DECLARE
+  increments RECORD;
+BEGIN
+  --
+  -- Trigger function to keep the activity counters of the recipient up to date
+  --
+  IF (tg_op = 'UPDATE' OR tg_op = 'DELETE') THEN
+    SELECT * INTO increments FROM activity_inbox_increments(OLD.type, OLD.status);
+    IF (increments.unread <> 0 OR increments.required_action <> 0) THEN
+      UPDATE activity_activityinbox
+      SET unread_count = GREATEST(unread_count - increments.unread, 0),
+          required_action_count = GREATEST(required_action_count - increments.required_action, 0)
+      WHERE person_id = OLD.recipient_id;
+    END IF;
+  END IF;
+
+  IF (tg_op = 'UPDATE' OR tg_op = 'INSERT') THEN
+    SELECT * INTO increments FROM activity_inbox_increments(NEW.type, NEW.status);
+    IF (increments.unread <> 0 OR increments.required_action <> 0) THEN
+      INSERT INTO activity_activityinbox (person_id, unread_count, required_action_count)
+      VALUES (NEW.recipient_id, increments.unread, increments.required_action)
+      ON CONFLICT (person_id) DO UPDATE
+      SET unread_count = activity_activityinbox.unread_count + EXCLUDED.unread_count,
+          required_action_count = activity_activityinbox.required_action_count + EXCLUDED.required_action_count;
+    END IF;
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_activity_inbox_when_modified
+AFTER INSERT OR DELETE OR UPDATE OF type, status, recipient_id ON activity_activity
+  FOR EACH ROW EXECUTE PROCEDURE process_update_activity();
+
+INSERT INTO activity_activityinbox (person_id, unread_count, required_action_count)
+SELECT recipient_id, SUM(increments.unread), SUM(increments.required_action)
+FROM activity_activity, activity_inbox_increments(type, status) increments
+GROUP BY recipient_id
+HAVING SUM(increments.unread) > 0 OR SUM(increments.required_action) > 0;
+"""
+
+REMOVE_INBOX_TRIGGER = """
+-- noinspection SqlResolve
+DROP TRIGGER update_activity_inbox_when_modified ON activity_activity;
+DROP FUNCTION process_update_activity();
+DROP FUNCTION activity_inbox_increments(activity_activity.type%TYPE, activity_activity.status%TYPE);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("people", "0004_display_name_and_image"),
+        ("activity", "0013_auto_20210217_1744"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ActivityInbox",
+            fields=[
+                (
+                    "person",
+                    models.OneToOneField(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="activity_inbox",
+                        serialize=False,
+                        to="people.person",
+                    ),
+                ),
+                (
+                    "unread_count",
+                    models.PositiveIntegerField(
+                        default=0, editable=False, verbose_name="Activités non lues"
+                    ),
+                ),
+                (
+                    "required_action_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        editable=False,
+                        verbose_name="Activités avec action requise non traitées",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Compteurs d'activité",
+                "verbose_name_plural": "Compteurs d'activité",
+            },
+        ),
+        migrations.AlterModelOptions(
+            name="activity",
+            options={
+                "ordering": ("-timestamp", "-id"),
+                "verbose_name": "Notice d'activité",
+                "verbose_name_plural": "Notices d'activité",
+            },
+        ),
+        migrations.RunSQL(sql=ADD_INBOX_TRIGGER, reverse_sql=REMOVE_INBOX_TRIGGER),
+    ]
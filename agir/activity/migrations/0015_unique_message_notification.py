@@ -0,0 +1,34 @@
+from django.db import migrations
+
+REMOVE_DUPLICATES = """
+-- noinspection SqlResolve
+DELETE FROM activity_activity a
+USING activity_activity b
+WHERE a.type = 'new-message' AND b.type = 'new-message'
+  AND a.recipient_id = b.recipient_id
+  AND a.meta->>'message' = b.meta->>'message'
+  AND a.id > b.id;
+"""
+
+ADD_UNIQUE_INDEX = """
+-- noinspection SqlResolve
+CREATE UNIQUE INDEX activity_unique_new_message_notification
+ON activity_activity (recipient_id, (meta->>'message'))
+WHERE type = 'new-message';
+"""
+
+REMOVE_UNIQUE_INDEX = """
+DROP INDEX activity_unique_new_message_notification;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("activity", "0014_activityinbox"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=REMOVE_DUPLICATES, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(sql=ADD_UNIQUE_INDEX, reverse_sql=REMOVE_UNIQUE_INDEX),
+    ]
@@ -0,0 +1,62 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("people", "0005_person_created_id_index"),
+        ("activity", "0015_unique_message_notification"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="announcement",
+            name="targets_computed_at",
+            field=models.DateTimeField(
+                editable=False,
+                null=True,
+                verbose_name="Date du dernier calcul du public",
+            ),
+        ),
+        migrations.CreateModel(
+            name="AnnouncementTarget",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "announcement",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="targets",
+                        to="activity.announcement",
+                    ),
+                ),
+                (
+                    "person",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="announcement_targets",
+                        to="people.person",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Personne ciblée par une annonce",
+                "verbose_name_plural": "Personnes ciblées par les annonces",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="announcementtarget",
+            constraint=models.UniqueConstraint(
+                fields=("announcement", "person"), name="unique_announcement_target"
+            ),
+        ),
+    ]
@@ -1,12 +1,13 @@
 import dynamic_filenames
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from stdimage import StdImageField
 from stdimage.validators import MinSizeValidator
 
+from agir.lib.images import render_variations_async
 from agir.lib.models import TimeStampedModel, DescriptionField, BaseAPIResource
 
-__all__ = ["Activity", "Announcement"]
+__all__ = ["Activity", "ActivityInbox", "Announcement", "AnnouncementTarget"]
 
 
 class ActivityQuerySet(models.QuerySet):
@@ -21,6 +22,67 @@ class ActivityQuerySet(models.QuerySet):
             type__in=Activity.REQUIRED_ACTION_ACTIVITY_TYPES
         )
 
+    def visible_to(self, person):
+        """Filtre les activités que la personne a le droit de voir
+
+        Traduction en SQL de la permission `activity.view_activity`, pour éviter
+        d'avoir à la vérifier pour chaque activité.
+        """
+        from agir.events.models import Event, OrganizerConfig
+
+        return self.filter(recipient=person).filter(
+            models.Q(event__isnull=True)
+            | models.Q(event__visibility=Event.VISIBILITY_PUBLIC)
+            | models.Q(
+                models.Exists(
+                    OrganizerConfig.objects.filter(
+                        event_id=models.OuterRef("event_id"), person=person
+                    )
+                ),
+                event__visibility=Event.VISIBILITY_ORGANIZER,
+            ),
+            models.Q(supportgroup__isnull=True)
+            | models.Q(supportgroup__published=True),
+        )
+
+    def before(self, activity_id):
+        """Filtre les activités qui suivent l'activité indiquée dans l'ordre d'affichage
+
+        Permet la pagination par curseur sur (timestamp, id).
+        """
+        timestamp = (
+            self.model.objects.filter(pk=activity_id)
+            .values_list("timestamp", flat=True)
+            .first()
+        )
+        if timestamp is None:
+            return self.none()
+
+        return self.filter(
+            models.Q(timestamp__lt=timestamp)
+            | models.Q(timestamp=timestamp, id__lt=activity_id)
+        )
+
+
+class ActivityManager(models.Manager.from_queryset(ActivityQuerySet)):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        # avec `ignore_conflicts`, PostgreSQL ne renvoie pas les lignes insérées : seuls
+        # les objets dont on sait qu'ils ont été créés sont publiés
+        publish_activities(obj for obj in objs if obj.pk is not None)
+        return objs
+
+
+def publish_activities(activities):
+    """Prévient les destinataires des activités via le canal en temps réel"""
+    from agir.lib.push import EVENT_ACTIVITY, person_channel, publish
+
+    publish(
+        (person_channel(a.recipient_id), EVENT_ACTIVITY, {"type": a.type})
+        for a in activities
+        if a.type in Activity.DISPLAYED_TYPES
+    )
+
 
 class Activity(TimeStampedModel):
     # Avec affichage d'une notification
@@ -134,7 +196,7 @@ class Activity(TimeStampedModel):
         (STATUS_INTERACTED, "Le destinataire a interagi avec"),
     )  # attention : l'ordre croissant par niveau d'interaction est important
 
-    objects = ActivityQuerySet.as_manager()
+    objects = ActivityManager()
 
     timestamp = models.DateTimeField(
         verbose_name="Date de la notification", null=False, default=timezone.now
@@ -192,7 +254,7 @@ class Activity(TimeStampedModel):
     class Meta:
         verbose_name = "Notice d'activité"
         verbose_name_plural = "Notices d'activité"
-        ordering = ("-timestamp",)
+        ordering = ("-timestamp", "-id")
         indexes = (
             models.Index(
                 fields=("recipient", "timestamp"), name="notifications_by_recipient"
@@ -201,6 +263,40 @@ class Activity(TimeStampedModel):
         unique_together = ("recipient", "announcement")
 
 
+class ActivityInbox(models.Model):
+    """Compteurs des activités d'une personne
+
+    Ces compteurs sont maintenus à jour par un trigger de la base de données, à chaque
+    création, suppression ou changement de statut d'une activité : ils restent donc
+    corrects même en cas de `bulk_create` ou de `update`.
+    """
+
+    person = models.OneToOneField(
+        "people.Person",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="activity_inbox",
+        editable=False,
+    )
+
+    unread_count = models.PositiveIntegerField(
+        "Activités non lues", default=0, editable=False
+    )
+    required_action_count = models.PositiveIntegerField(
+        "Activités avec action requise non traitées", default=0, editable=False
+    )
+
+    class Meta:
+        verbose_name = "Compteurs d'activité"
+        verbose_name_plural = "Compteurs d'activité"
+
+    @classmethod
+    def get_counts(cls, person):
+        return cls.objects.filter(person=person).values_list(
+            "unread_count", "required_action_count"
+        ).first() or (0, 0)
+
+
 class AnnouncementQuerySet(models.QuerySet):
     def active(self):
         now = timezone.now()
@@ -238,6 +334,7 @@ class Announcement(BaseAPIResource):
             "desktop": {"width": 255, "height": 130, "crop": True},
             "mobile": {"width": 160, "height": 160, "crop": True},
         },
+        render_variations=render_variations_async,
         upload_to=dynamic_filenames.FilePattern(
             filename_pattern="activity/announcements/{uuid:.2base32}/{uuid:s}{ext}"
         ),
@@ -269,6 +366,56 @@ class Announcement(BaseAPIResource):
         " Deux annonces de même priorité sont affichées dans l'ordre anti-chronologique (par date de début)",
     )
 
+    targets_computed_at = models.DateTimeField(
+        verbose_name="Date du dernier calcul du public", null=True, editable=False
+    )
+
+    def refresh_targets(self, batch_size=5000):
+        """Recalcule la liste enregistrée des personnes membres du segment de l'annonce
+
+        Seules les différences avec la liste précédente sont écrites.
+
+        :return: un couple (nombre de personnes ajoutées, nombre de personnes retirées)
+        """
+        with transaction.atomic():
+            # verrouille l'annonce pour éviter deux recalculs simultanés
+            Announcement.objects.select_for_update().filter(pk=self.pk).first()
+
+            if self.segment is None:
+                removed, _ = self.targets.all().delete()
+                Announcement.objects.filter(pk=self.pk).update(targets_computed_at=None)
+                self.targets_computed_at = None
+                return 0, removed
+
+            computed_at = timezone.now()
+            live_ids = self.segment.get_subscribers_queryset().values("id")
+
+            removed, _ = self.targets.exclude(person_id__in=live_ids).delete()
+
+            new_ids = (
+                self.segment.get_subscribers_queryset()
+                .exclude(announcement_targets__announcement=self)
+                .values_list("id", flat=True)
+            )
+
+            added = 0
+            batch = []
+            for person_id in new_ids.iterator(chunk_size=batch_size):
+                batch.append(AnnouncementTarget(announcement=self, person_id=person_id))
+                if len(batch) == batch_size:
+                    AnnouncementTarget.objects.bulk_create(batch)
+                    added += len(batch)
+                    batch = []
+            AnnouncementTarget.objects.bulk_create(batch)
+            added += len(batch)
+
+            self.targets_computed_at = computed_at
+            Announcement.objects.filter(pk=self.pk).update(
+                targets_computed_at=computed_at
+            )
+
+        return added, removed
+
     def __str__(self):
         return f"« {self.title} »"
 
@@ -280,3 +427,27 @@ class Announcement(BaseAPIResource):
             ),
         )
         ordering = ("-start_date", "end_date")
+
+
+class AnnouncementTarget(models.Model):
+    """Personne faisant partie du public d'une annonce ciblée
+
+    Le public est précalculé pour chaque annonce, indépendamment du segment, dont le
+    fonctionnement n'est ainsi pas modifié pour ses autres utilisations.
+    """
+
+    announcement = models.ForeignKey(
+        "Announcement", on_delete=models.CASCADE, related_name="targets"
+    )
+    person = models.ForeignKey(
+        "people.Person", on_delete=models.CASCADE, related_name="announcement_targets"
+    )
+
+    class Meta:
+        verbose_name = "Personne ciblée par une annonce"
+        verbose_name_plural = "Personnes ciblées par les annonces"
+        constraints = (
+            models.UniqueConstraint(
+                fields=["announcement", "person"], name="unique_announcement_target"
+            ),
+        )
@@ -3,6 +3,7 @@ from rest_framework import serializers
 from agir.activity.models import Activity, Announcement
 from agir.events.serializers import EventSerializer
 from agir.groups.serializers import SupportGroupSerializer
+from agir.lib.images import variation_url
 from agir.lib.serializers import FlexibleFieldsMixin
 from agir.people.serializers import PersonSerializer
 
@@ -60,7 +61,10 @@ class AnnouncementSerializer(serializers.ModelSerializer):
 
     def get_image(self, obj):
         if obj.image:
-            return {"desktop": obj.image.desktop.url, "mobile": obj.image.mobile.url}
+            return {
+                "desktop": variation_url(obj.image, "desktop"),
+                "mobile": variation_url(obj.image, "mobile"),
+            }
         return {}
 
     class Meta:
@@ -0,0 +1,25 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Activity, Announcement, publish_activities
+
+
+@receiver(post_save, sender=Announcement, dispatch_uid="refresh_announcement_targets")
+def refresh_announcement_targets_on_save(sender, instance, raw=False, **kwargs):
+    # le public des annonces est vérifié à chaque chargement de page : on le précalcule
+    # pour chaque annonce, puis il est recalculé régulièrement
+    if raw or (instance.segment_id is None and instance.targets_computed_at is None):
+        return
+
+    from .tasks import refresh_announcement_targets
+
+    transaction.on_commit(partial(refresh_announcement_targets.delay, instance.pk))
+
+
+@receiver(post_save, sender=Activity, dispatch_uid="publish_new_activity")
+def publish_new_activity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        publish_activities([instance])
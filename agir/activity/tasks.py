@@ -0,0 +1,43 @@
+import logging
+
+from celery import shared_task
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Announcement
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_announcement_targets(announcement_pk):
+    try:
+        announcement = Announcement.objects.select_related("segment").get(
+            pk=announcement_pk
+        )
+    except Announcement.DoesNotExist:
+        return
+
+    added, removed = announcement.refresh_targets()
+    logger.info(
+        f"Annonce {announcement.pk} : {added} personnes ajoutées, {removed} retirées"
+    )
+
+
+@shared_task
+def refresh_announcements_targets():
+    now = timezone.now()
+
+    # les annonces terminées n'ont plus besoin de leur public
+    for announcement in Announcement.objects.filter(
+        end_date__lte=now, targets_computed_at__isnull=False
+    ):
+        announcement.targets.all().delete()
+        Announcement.objects.filter(pk=announcement.pk).update(targets_computed_at=None)
+
+    for announcement_pk in (
+        Announcement.objects.filter(segment__isnull=False)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gt=now))
+        .values_list("pk", flat=True)
+    ):
+        refresh_announcement_targets(announcement_pk)
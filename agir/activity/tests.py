@@ -1,12 +1,13 @@
 from datetime import timedelta
 
+from django.db import connection
 from django.test import TestCase
 from django.urls import reverse
 from django.utils.timezone import now
 from rest_framework import status
 
-from agir.activity.actions import get_announcements
-from agir.activity.models import Activity, Announcement
+from agir.activity.actions import get_announcements, get_activities
+from agir.activity.models import Activity, ActivityInbox, Announcement
 from agir.events.models import Event
 from agir.mailing.models import Segment
 from agir.people.models import Person
@@ -126,6 +127,33 @@ class AnnouncementTestCase(TestCase):
         announcements = get_announcements(self.nsp)
         self.assertCountEqual(announcements, [])
 
+    def test_announcement_targets_are_precomputed(self):
+        segment_insoumis = Segment.objects.create(is_insoumise=True)
+        a1 = Announcement.objects.create(
+            title="1ère annonce",
+            link="https://lafranceinsoumise.fr",
+            content="SUPER",
+            segment=segment_insoumis,
+        )
+
+        # le segment lui-même n'est pas modifié
+        segment_insoumis.refresh_from_db()
+        self.assertFalse(segment_insoumis.materialized)
+
+        self.assertEqual(a1.refresh_targets(), (1, 0))
+        self.assertCountEqual(get_announcements(self.insoumise), [a1])
+        self.assertCountEqual(get_announcements(self.nsp), [])
+
+        # une personne créée après le calcul du public est testée individuellement
+        new_insoumise = Person.objects.create_insoumise("c@c.c")
+        self.assertCountEqual(get_announcements(new_insoumise), [a1])
+
+        self.assertEqual(a1.refresh_targets(), (1, 0))
+        self.insoumise.is_insoumise = False
+        self.insoumise.save()
+        self.assertEqual(a1.refresh_targets(), (0, 1))
+        self.assertCountEqual(get_announcements(self.insoumise), [])
+
 
 class ActivityStatusUpdateViewTestCase(TestCase):
     def setUp(self) -> None:
@@ -209,3 +237,126 @@ class ActivityStatusUpdateViewTestCase(TestCase):
             Activity.STATUS_INTERACTED,
             "le champ `status' n'aurait pas dû changer !",
         )
+
+
+class ActivityInboxTestCase(TestCase):
+    def setUp(self) -> None:
+        self.person = Person.objects.create_insoumise(email="a@a.a", create_role=True)
+
+    def test_counters_are_updated_on_creation(self):
+        self.assertEqual(ActivityInbox.get_counts(self.person), (0, 0))
+
+        Activity.objects.create(recipient=self.person, type=Activity.TYPE_NEW_ATTENDEE)
+        Activity.objects.bulk_create(
+            [
+                Activity(recipient=self.person, type=Activity.TYPE_GROUP_INVITATION),
+                Activity(recipient=self.person, type=Activity.TYPE_NEW_MEMBER),
+                Activity(
+                    recipient=self.person,
+                    type=Activity.TYPE_EVENT_UPDATE,
+                    status=Activity.STATUS_DISPLAYED,
+                ),
+                # type non affiché
+                Activity(recipient=self.person, type=Activity.TYPE_ANNOUNCEMENT),
+            ]
+        )
+
+        self.assertEqual(ActivityInbox.get_counts(self.person), (1, 2))
+
+    def test_counters_are_updated_on_status_change(self):
+        a1 = Activity.objects.create(
+            recipient=self.person, type=Activity.TYPE_NEW_ATTENDEE
+        )
+        a2 = Activity.objects.create(
+            recipient=self.person, type=Activity.TYPE_GROUP_INVITATION
+        )
+
+        self.client.force_login(self.person.role)
+        res = self.client.post(
+            "/api/activity/bulk/update-status/",
+            data={"status": Activity.STATUS_DISPLAYED, "ids": [a1.id, a2.id]},
+        )
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(ActivityInbox.get_counts(self.person), (0, 1))
+
+        a2.status = Activity.STATUS_INTERACTED
+        a2.save()
+        self.assertEqual(ActivityInbox.get_counts(self.person), (0, 0))
+
+    def test_counters_are_updated_on_deletion(self):
+        activity = Activity.objects.create(
+            recipient=self.person, type=Activity.TYPE_NEW_ATTENDEE
+        )
+        self.assertEqual(ActivityInbox.get_counts(self.person), (1, 0))
+
+        activity.delete()
+        self.assertEqual(ActivityInbox.get_counts(self.person), (0, 0))
+
+    def test_trigger_types_match_model_types(self):
+        # les listes de types sont recopiées dans la fonction SQL utilisée par le trigger
+        unread_types = set(Activity.DISPLAYED_TYPES) - set(
+            Activity.REQUIRED_ACTION_ACTIVITY_TYPES
+        )
+        required_action_types = set(Activity.DISPLAYED_TYPES) & set(
+            Activity.REQUIRED_ACTION_ACTIVITY_TYPES
+        )
+
+        trigger_unread_types = set()
+        trigger_required_action_types = set()
+        with connection.cursor() as cursor:
+            for type, _ in Activity.TYPE_CHOICES:
+                cursor.execute(
+                    "SELECT unread, required_action FROM activity_inbox_increments(%s, %s)",
+                    [type, Activity.STATUS_UNDISPLAYED],
+                )
+                unread, required_action = cursor.fetchone()
+                if unread:
+                    trigger_unread_types.add(type)
+                if required_action:
+                    trigger_required_action_types.add(type)
+
+        self.assertEqual(trigger_unread_types, unread_types)
+        self.assertEqual(trigger_required_action_types, required_action_types)
+
+
+class ActivityPaginationTestCase(TestCase):
+    def setUp(self) -> None:
+        self.person = Person.objects.create_insoumise(email="a@a.a", create_role=True)
+        timestamp = now()
+        self.activities = [
+            Activity.objects.create(
+                recipient=self.person,
+                type=Activity.TYPE_NEW_ATTENDEE,
+                timestamp=timestamp - timedelta(minutes=i // 2),
+            )
+            for i in range(10)
+        ]
+        self.activities.sort(key=lambda a: (a.timestamp, a.id), reverse=True)
+
+    def test_can_page_through_activities(self):
+        first_page = list(get_activities(self.person, limit=4))
+        self.assertEqual(first_page, self.activities[:4])
+
+        second_page = list(
+            get_activities(self.person, before=first_page[-1].id, limit=4)
+        )
+        self.assertEqual(second_page, self.activities[4:8])
+
+        third_page = list(
+            get_activities(self.person, before=second_page[-1].id, limit=4)
+        )
+        self.assertEqual(third_page, self.activities[8:])
+
+    def test_api_accepts_before_parameter(self):
+        self.client.force_login(self.person.role)
+
+        res = self.client.get(
+            "/api/user/activities/", data={"before": self.activities[4].id}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [a["id"] for a in res.data], [a.id for a in self.activities[5:]]
+        )
+
+        res = self.client.get("/api/user/activities/", data={"before": "abc"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,6 +1,7 @@
 from django.http import HttpResponseRedirect
 from django.views.generic import DetailView
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import RetrieveUpdateAPIView, GenericAPIView, ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -8,6 +9,7 @@ from rest_framework.response import Response
 from agir.activity.actions import get_activities, get_required_action_activities
 from agir.activity.models import Activity, Announcement
 from agir.activity.serializers import ActivitySerializer, ActivityStatusUpdateRequest
+from agir.authentication.session_context import invalidate_session_context
 from agir.lib.rest_framework_permissions import (
     GlobalOrObjectPermissions,
     IsPersonPermission,
@@ -28,7 +30,11 @@ class UserActivitiesAPIView(ListAPIView):
     serializer_class = ActivitySerializer
 
     def get_queryset(self):
-        return get_activities(self.request.user.person)
+        before = self.request.query_params.get("before")
+        if before is not None and not before.isdigit():
+            raise ValidationError({"before": "Identifiant d'activité invalide."})
+
+        return get_activities(self.request.user.person, before=before)
 
 
 class UserRequiredActivitiesAPIView(ListAPIView):
@@ -76,5 +82,7 @@ class ActivityStatusUpdateView(GenericAPIView):
             status__in=lower_statuses,
             id__in=serializer.validated_data["ids"],
         ).update(status=serializer.validated_data["status"])
+        # les activités peuvent concerner des annonces, affichées dans le contexte de session
+        invalidate_session_context(request.user.person.pk)
 
         return Response(None, status=status.HTTP_204_NO_CONTENT)
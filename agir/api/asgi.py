@@ -0,0 +1,36 @@
+"""
+ASGI config for src project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+Ce point d'entrée ne sert que le flux d'événements en temps réel (voir agir.lib.push).
+Il est destiné à un processus distinct, par exemple `uvicorn agir.api.asgi:application`,
+vers lequel le proxy ne renvoie que les requêtes sur `PUSH_PATH` : le reste du site
+reste servi en WSGI (voir agir.api.wsgi). Le front n'ouvre le flux que si le réglage
+`PUSH_ENABLED` est activé. Voir le README pour le déploiement.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agir.api.settings")
+
+django.setup(set_prefix=False)
+
+from agir.lib.push import PUSH_PATH, push_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http" and scope["path"] == PUSH_PATH:
+        return await push_application(scope, receive, send)
+
+    if scope["type"] == "http":
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 404,
+                "headers": [(b"content-type", b"text/plain")],
+            }
+        )
+        await send({"type": "http.response.body", "body": b""})
@@ -43,6 +43,11 @@ def basic_information(request):
         "facebookLogin": reverse("social:begin", args=["facebook"]),
     }
 
+    if settings.PUSH_ENABLED:
+        from agir.lib.push import PUSH_PATH
+
+        routes["push"] = PUSH_PATH
+
     return {
         "MAIN_DOMAIN": settings.MAIN_DOMAIN,
         "API_DOMAIN": settings.API_DOMAIN,
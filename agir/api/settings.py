@@ -18,6 +18,7 @@ from pathlib import Path
 import dj_database_url
 import dj_email_url
 import sentry_sdk
+from celery.schedules import crontab
 from django.contrib import messages
 from django.contrib.messages import ERROR
 from django.core.exceptions import ImproperlyConfigured
@@ -36,6 +37,14 @@ DEBUG = os.environ.get("DEBUG", "true").lower() == "true"
 ENABLE_DEBUG_TOOLBAR = os.environ.get("ENABLE_DEBUG_TOOLBAR", "false").lower() == "true"
 ENABLE_SILK = os.environ.get("ENABLE_SILK", "false").lower() == "true"
 
+# Proportion des requêtes profilées (nombre de requêtes SQL, temps en base, etc.), voir
+# agir.lib.profiling
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))
+# Nombre d'exécutions d'une même requête SQL au-delà duquel elle est signalée
+PROFILING_REPEATED_QUERY_THRESHOLD = int(
+    os.environ.get("PROFILING_REPEATED_QUERY_THRESHOLD", "10")
+)
+
 # Risque de sécurité important ! Principalement utilisé pour le load testing
 TRUST_X_FORWARDED_FOR = (
     os.environ.get("TRUST_X_FORWARDED_FOR", "false").lower() == "true"
@@ -131,6 +140,7 @@ INSTALLED_APPS = [
     "agir.legacy",
     "agir.telegram",
     "agir.elus.apps.ElusConfig",
+    "agir.statistics",
     # default contrib apps
     "agir.api.apps.AdminAppConfig",
     "django.contrib.auth",
@@ -182,6 +192,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django_prometheus.middleware.PrometheusBeforeMiddleware",
+    "agir.lib.middleware.ProfilingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "agir.lib.middleware.NoVaryCookieMiddleWare",
     "agir.lib.middleware.TurbolinksMiddleware",
@@ -588,6 +599,14 @@ CACHES = {
     }
 }
 
+# durée maximale de conservation du contexte de session de chaque personne
+SESSION_CONTEXT_CACHE_TTL = 300
+
+# le flux d'événements en temps réel (voir agir.lib.push) est servi par un processus
+# ASGI distinct : le front ne s'y connecte que si celui-ci est déployé
+PUSH_ENABLED = os.environ.get("PUSH_ENABLED", "false").lower() == "true"
+# intervalle, en secondes, entre deux messages de maintien de connexion sur le flux
+PUSH_KEEPALIVE_INTERVAL = 20
 
 # SECURITY
 CORS_ORIGIN_ALLOW_ALL = True
@@ -620,6 +639,60 @@ CELERY_TASK_SEND_SENT_EVENT = True
 
 CELERY_RESULT_BACKEND = os.environ.get("BROKER_URL", "redis://")
 
+# géocodage par lots : les éléments créés ou modifiés sont mis en file d'attente, et
+# géocodés ensemble à cet intervalle (en secondes)
+GEOCODING_BATCH_SIZE = 1000
+GEOCODING_QUEUE_INTERVAL = int(os.environ.get("GEOCODING_QUEUE_INTERVAL", 30))
+GEOCODING_CACHE_TTL = 30 * 24 * 3600
+
+# notifications des messages de groupe : nombre de destinataires traités par tâche, et
+# nombre de lignes par requête d'insertion
+MESSAGE_NOTIFICATIONS_CHUNK_SIZE = 5000
+MESSAGE_NOTIFICATIONS_BATCH_SIZE = 1000
+
+# traitement asynchrone des appels du webhook SystemPay : nombre maximum de tentatives,
+# et délai au-delà duquel un appel toujours en attente est considéré comme oublié
+SYSTEMPAY_WEBHOOK_MAX_ATTEMPTS = 8
+SYSTEMPAY_WEBHOOK_STALE_DELAY = 15 * 60
+
+# tâches périodiques (à lancer avec celery beat)
+MAP_SNAPSHOT_INTERVAL = int(os.environ.get("MAP_SNAPSHOT_INTERVAL", 120))
+# un instantané de carte périmé n'est plus servi, même si sa reconstruction a échoué
+MAP_SNAPSHOT_EXPIRATION = 15 * MAP_SNAPSHOT_INTERVAL
+SEGMENT_REFRESH_INTERVAL = int(os.environ.get("SEGMENT_REFRESH_INTERVAL", 3600))
+ANNOUNCEMENT_TARGETS_REFRESH_INTERVAL = int(
+    os.environ.get("ANNOUNCEMENT_TARGETS_REFRESH_INTERVAL", 900)
+)
+# nombre de journées passées dont les statistiques manquantes sont calculées chaque nuit
+STATISTICS_FILL_DAYS = 7
+
+CELERY_BEAT_SCHEDULE = {
+    "build_map_snapshots": {
+        "task": "agir.carte.tasks.build_map_snapshots",
+        "schedule": MAP_SNAPSHOT_INTERVAL,
+    },
+    "refresh_materialized_segments": {
+        "task": "agir.mailing.tasks.refresh_materialized_segments",
+        "schedule": SEGMENT_REFRESH_INTERVAL,
+    },
+    "refresh_announcements_targets": {
+        "task": "agir.activity.tasks.refresh_announcements_targets",
+        "schedule": ANNOUNCEMENT_TARGETS_REFRESH_INTERVAL,
+    },
+    "store_daily_statistics": {
+        "task": "agir.statistics.tasks.store_daily_statistics",
+        "schedule": crontab(hour=0, minute=30),
+    },
+    "geocode_queued_items": {
+        "task": "agir.lib.tasks.geocode_queued_items",
+        "schedule": GEOCODING_QUEUE_INTERVAL,
+    },
+    "process_stale_webhook_calls": {
+        "task": "agir.system_pay.tasks.process_stale_webhook_calls",
+        "schedule": 300,
+    },
+}
+
 DEFAULT_EVENT_IMAGE = "front/images/default_event_pic.jpg"
 
 PHONENUMBER_DEFAULT_REGION = "FR"
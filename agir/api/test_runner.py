@@ -10,6 +10,43 @@ from .redis import using_separate_redis_server
 class TestRunner(DiscoverRunner):
     "Mixin to create MEDIA_ROOT in temp and tear down when complete."
 
+    def __init__(self, query_budgets=None, **kwargs):
+        super().__init__(**kwargs)
+        self.query_budgets = query_budgets
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--query-budgets",
+            action="store_true",
+            dest="query_budgets",
+            default=None,
+            help="Vérifie les budgets de requêtes SQL par vue (voir "
+            "agir.lib.query_budgets). Par défaut, ils ne sont vérifiés que lorsque "
+            "toute la suite de tests est lancée.",
+        )
+        parser.add_argument(
+            "--no-query-budgets", action="store_false", dest="query_budgets",
+        )
+
+    def build_suite(self, test_labels=None, extra_tests=None, **kwargs):
+        """Ajoute les tests de budgets de requêtes SQL à la suite
+
+        Ils sont ajoutés lorsque toute la suite de tests est lancée, ou lorsque l'option
+        --query-budgets est utilisée.
+        """
+        query_budgets = self.query_budgets
+        if query_budgets is None:
+            query_budgets = not test_labels
+
+        if query_budgets:
+            from agir.lib.query_budgets import build_query_budget_tests
+
+            extra_tests = list(extra_tests or []) + build_query_budget_tests()
+
+        return super().build_suite(test_labels, extra_tests=extra_tests, **kwargs)
+
     def setup_test_environment(self):
         """Met en place un environnement de test adapté.
 
@@ -4,11 +4,12 @@ from django.middleware.csrf import get_token
 from django.urls import reverse
 from rest_framework import serializers
 
-from agir.activity.actions import get_announcements
-from agir.activity.models import Activity
+from agir.activity.actions import get_announcements, get_activity_counts
 from agir.activity.serializers import AnnouncementSerializer
+from agir.authentication.session_context import get_or_build_session_context
 from agir.groups.models import SupportGroup
 from agir.front.serializer_utils import MediaURLField
+from agir.lib.images import variation_url
 from agir.lib.utils import front_url
 
 
@@ -31,7 +32,7 @@ class UserContextSerializer(serializers.Serializer):
 
     def get_image(self, obj):
         if obj.image and obj.image.thumbnail:
-            return obj.image.thumbnail.url
+            return variation_url(obj.image, "thumbnail")
 
 
 class SessionSerializer(serializers.Serializer):
@@ -48,44 +49,76 @@ class SessionSerializer(serializers.Serializer):
         method_name="get_required_action_activities_count"
     )
 
-    def get_user_routes(self, request):
-        if request.user.is_authenticated:
-            person = request.user.person
-
-            if person.is_insoumise:
-                routes = {
-                    "materiel": "https://materiel.lafranceinsoumise.fr/",
-                    "resources": "https://lafranceinsoumise.fr/fiches_pour_agir/",
-                    "news": "https://lafranceinsoumise.fr/actualites/",
-                    "thematicTeams": front_url("thematic_teams_list"),
-                    "nspReferral": front_url("nsp_referral"),
-                }
-            else:
-                routes = {
-                    "materiel": "https://noussommespour.fr/boutique/",
-                    "resources": "https://noussommespour.fr/sinformer/",
-                    "donations": "https://noussommespour.fr/don/",
-                    "nspReferral": front_url("nsp_referral"),
-                }
+    def get_person_context(self, request):
+        """Renvoie la partie du contexte propre à la personne, depuis le cache si possible
 
-            person_groups = (
-                SupportGroup.objects.filter(memberships__person=person)
-                .active()
-                .annotate(membership_type=F("memberships__membership_type"))
-                .order_by("-membership_type", "name")
+        Seuls le jeton CSRF et les messages sont calculés à chaque requête.
+        """
+        if not hasattr(self, "_person_context"):
+            self._person_context = get_or_build_session_context(
+                request.user.person, lambda: self.build_person_context(request)
             )
+        return self._person_context
 
-            if person_groups.count() > 0:
-                routes["groups__personGroups"] = []
-                for group in person_groups:
-                    link = {
-                        "id": group.id,
-                        "label": group.name,
-                        "to": reverse("view_group", kwargs={"pk": group.pk}),
-                    }
-                    routes["groups__personGroups"].append(link)
+    def build_person_context(self, request):
+        person = request.user.person
+
+        return {
+            "user": UserContextSerializer(instance=person).data,
+            "routes": self.build_user_routes(person),
+            "announcements": AnnouncementSerializer(
+                many=True,
+                instance=get_announcements(person),
+                context={"request": request},
+            ).data,
+            "facebookLogin": request.user.social_auth.filter(
+                provider="facebook"
+            ).exists(),
+        }
+
+    def build_user_routes(self, person):
+        if person.is_insoumise:
+            routes = {
+                "materiel": "https://materiel.lafranceinsoumise.fr/",
+                "resources": "https://lafranceinsoumise.fr/fiches_pour_agir/",
+                "news": "https://lafranceinsoumise.fr/actualites/",
+                "thematicTeams": front_url("thematic_teams_list"),
+                "nspReferral": front_url("nsp_referral"),
+            }
+        else:
+            routes = {
+                "materiel": "https://noussommespour.fr/boutique/",
+                "resources": "https://noussommespour.fr/sinformer/",
+                "donations": "https://noussommespour.fr/don/",
+                "nspReferral": front_url("nsp_referral"),
+            }
+
+        person_groups = list(
+            SupportGroup.objects.filter(memberships__person=person)
+            .active()
+            .annotate(membership_type=F("memberships__membership_type"))
+            .order_by("-membership_type", "name")
+            .values("id", "name")
+        )
+
+        if person_groups:
+            routes["groups__personGroups"] = [
+                {
+                    "id": group["id"],
+                    "label": group["name"],
+                    "to": reverse("view_group", kwargs={"pk": group["id"]}),
+                }
+                for group in person_groups
+            ]
 
-            return routes
+        return routes
+
+    def is_person(self, request):
+        return request.user.is_authenticated and request.user.person is not None
+
+    def get_user_routes(self, request):
+        if self.is_person(request):
+            return self.get_person_context(request)["routes"]
 
     def get_csrf_token(self, request):
         return get_token(request)
@@ -97,40 +130,35 @@ class SessionSerializer(serializers.Serializer):
         ]
 
     def get_user(self, request):
-        if request.user.is_authenticated and request.user.person is not None:
-            return UserContextSerializer(instance=request.user.person).data
+        if self.is_person(request):
+            return self.get_person_context(request)["user"]
         return False
 
     def get_announcements(self, request):
-        if request.user.is_authenticated and request.user.person is not None:
-            return AnnouncementSerializer(
-                many=True,
-                instance=get_announcements(request.user.person),
-                context={"request": request},
-            ).data
+        if self.is_person(request):
+            return self.get_person_context(request)["announcements"]
 
     def get_facebook_login(self, request):
+        if self.is_person(request):
+            return self.get_person_context(request)["facebookLogin"]
         return (
             request.user.is_authenticated
             and request.user.social_auth.filter(provider="facebook").exists()
         )
 
+    def get_activity_counts(self, request):
+        # les compteurs sont lus directement dans la table maintenue par trigger : une
+        # seule requête par clé primaire, toujours à jour, inutile de les mettre en cache
+        if not hasattr(self, "_activity_counts"):
+            self._activity_counts = get_activity_counts(request.user.person)
+        return self._activity_counts
+
     def get_has_unread_activities(self, request):
-        if request.user.is_authenticated and request.user.person is not None:
-            return (
-                Activity.objects.without_required_action()
-                .filter(
-                    recipient=request.user.person, status=Activity.STATUS_UNDISPLAYED
-                )
-                .exists()
-            )
+        if self.is_person(request):
+            unread_count, _ = self.get_activity_counts(request)
+            return unread_count > 0
 
     def get_required_action_activities_count(self, request):
-        if request.user.is_authenticated and request.user.person is not None:
-            return (
-                Activity.objects.with_required_action()
-                .filter(recipient=request.user.person)
-                .exclude(status=Activity.STATUS_INTERACTED)
-                .distinct()
-                .count()
-            )
+        if self.is_person(request):
+            _, required_action_count = self.get_activity_counts(request)
+            return required_action_count
@@ -0,0 +1,50 @@
+"""Cache par personne du contexte de session renvoyé par `/api/session/`
+
+Le contexte (informations de la personne, liens vers ses groupes, annonces, connexion
+Facebook) est conservé en cache et invalidé de façon ciblée lorsque les données dont
+il dépend sont modifiées. Une durée de vie limitée garantit que les changements non
+détectés (début ou fin d'une annonce, évolution d'un segment) finissent par apparaître.
+
+Les annonces dépendant de données communes à toutes les personnes, leur modification
+invalide l'ensemble des contextes en changeant la version incluse dans les clés.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+SESSION_CONTEXT_KEY = "session_context:{version}:{person_id}"
+SESSION_CONTEXT_VERSION_KEY = "session_context:version"
+
+
+def get_session_context_version():
+    return cache.get_or_set(SESSION_CONTEXT_VERSION_KEY, lambda: uuid.uuid4().hex, None)
+
+
+def get_session_context_key(person_id, version=None):
+    return SESSION_CONTEXT_KEY.format(
+        version=version or get_session_context_version(), person_id=person_id
+    )
+
+
+def get_or_build_session_context(person, builder):
+    key = get_session_context_key(person.pk)
+    context = cache.get(key)
+
+    if context is None:
+        context = builder()
+        cache.set(key, context, settings.SESSION_CONTEXT_CACHE_TTL)
+
+    return context
+
+
+def invalidate_session_context(*person_ids):
+    if person_ids:
+        version = get_session_context_version()
+        cache.delete_many(
+            [get_session_context_key(person_id, version) for person_id in person_ids]
+        )
+
+
+def invalidate_all_session_contexts():
+    cache.set(SESSION_CONTEXT_VERSION_KEY, uuid.uuid4().hex, None)
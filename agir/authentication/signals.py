@@ -4,10 +4,20 @@ from django.contrib.auth import (
     user_logged_out,
     user_login_failed,
 )
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from social_django.models import UserSocialAuth
 
 import agir.authentication
+from agir.activity.models import Activity, Announcement
 from agir.authentication import metrics
+from agir.authentication.session_context import (
+    invalidate_session_context,
+    invalidate_all_session_contexts,
+)
+from agir.groups.models import Membership, SupportGroup
+from agir.mailing.models import Segment
+from agir.people.models import Person
 
 
 @receiver(user_logged_in, dispatch_uid="user_logged_in_count")
@@ -30,3 +40,64 @@ def user_login_failed_count(credentials, **kwargs):
 
     if backend is not None:
         agir.authentication.metrics.login_failed.labels(backend).inc()
+
+
+@receiver(post_save, sender=Person, dispatch_uid="session_context_person_changed")
+def session_context_person_changed(sender, instance, **kwargs):
+    invalidate_session_context(instance.pk)
+
+
+@receiver(post_save, sender=Membership, dispatch_uid="session_context_membership_saved")
+@receiver(
+    post_delete, sender=Membership, dispatch_uid="session_context_membership_deleted"
+)
+def session_context_membership_changed(sender, instance, **kwargs):
+    invalidate_session_context(instance.person_id)
+
+
+@receiver(
+    post_save, sender=SupportGroup, dispatch_uid="session_context_supportgroup_saved"
+)
+def session_context_supportgroup_changed(sender, instance, **kwargs):
+    invalidate_session_context(
+        *instance.memberships.values_list("person_id", flat=True)
+    )
+
+
+@receiver(
+    post_save, sender=UserSocialAuth, dispatch_uid="session_context_social_auth_saved"
+)
+@receiver(
+    post_delete,
+    sender=UserSocialAuth,
+    dispatch_uid="session_context_social_auth_deleted",
+)
+def session_context_social_auth_changed(sender, instance, **kwargs):
+    invalidate_session_context(
+        *Person.objects.filter(role_id=instance.user_id).values_list("pk", flat=True)
+    )
+
+
+@receiver(post_save, sender=Activity, dispatch_uid="session_context_activity_saved")
+def session_context_activity_changed(sender, instance, **kwargs):
+    # seules les activités liées à une annonce modifient le contexte (annonces masquées)
+    if instance.announcement_id is not None:
+        invalidate_session_context(instance.recipient_id)
+
+
+@receiver(
+    post_save, sender=Announcement, dispatch_uid="session_context_announcement_saved"
+)
+@receiver(
+    post_delete,
+    sender=Announcement,
+    dispatch_uid="session_context_announcement_deleted",
+)
+def session_context_announcement_changed(sender, **kwargs):
+    invalidate_all_session_contexts()
+
+
+@receiver(post_save, sender=Segment, dispatch_uid="session_context_segment_saved")
+def session_context_segment_changed(sender, instance, **kwargs):
+    if Announcement.objects.filter(segment=instance).exists():
+        invalidate_all_session_contexts()
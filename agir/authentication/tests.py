@@ -5,7 +5,7 @@ import re
 from django.contrib.auth import get_user
 from django.core import mail
 from django.http import QueryDict
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
@@ -13,7 +13,7 @@ from rest_framework import status
 from agir.api.redis import using_separate_redis_server
 from agir.authentication.tokens import connection_token_generator, short_code_generator
 from agir.events.models import Event
-from agir.groups.models import SupportGroup
+from agir.groups.models import SupportGroup, Membership
 from agir.people.models import Person
 
 
@@ -294,3 +294,53 @@ class AuthorizationTestCase(TestCase):
         self.assertContains(
             response, "Vous êtes déjà connecté", count=1, status_code=200, msg_prefix=""
         )
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class SessionContextCacheTestCase(TestCase):
+    def setUp(self):
+        self.person = Person.objects.create_insoumise("a@a.a", create_role=True)
+        self.group = SupportGroup.objects.create(name="Groupe")
+        self.client.force_login(self.person.role)
+
+    def get_group_routes(self):
+        res = self.client.get("/api/session/")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data["routes"].get("groups__personGroups", [])
+
+    def test_session_context_is_cached(self):
+        self.get_group_routes()
+
+        with mock.patch(
+            "agir.authentication.serializers.SessionSerializer.build_person_context"
+        ) as build_person_context:
+            self.get_group_routes()
+            build_person_context.assert_not_called()
+
+    def test_session_context_invalidated_on_membership_change(self):
+        self.assertEqual(self.get_group_routes(), [])
+
+        membership = Membership.objects.create(
+            supportgroup=self.group, person=self.person
+        )
+        self.assertEqual(
+            [r["label"] for r in self.get_group_routes()], [self.group.name]
+        )
+
+        self.group.name = "Nouveau nom"
+        self.group.save()
+        self.assertEqual([r["label"] for r in self.get_group_routes()], ["Nouveau nom"])
+
+        membership.delete()
+        self.assertEqual(self.get_group_routes(), [])
+
+    def test_session_context_invalidated_on_profile_change(self):
+        self.client.get("/api/session/")
+
+        self.person.first_name = "Marianne"
+        self.person.save()
+
+        res = self.client.get("/api/session/")
+        self.assertEqual(res.data["user"]["firstName"], "Marianne")
@@ -0,0 +1,93 @@
+import hashlib
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from redis.exceptions import LockError
+
+from agir.api.redis import get_auth_redis_client
+
+SNAPSHOT_KEY = "carte:snapshot:{name}"
+SNAPSHOT_LOCK_KEY = "carte:snapshot_lock:{name}"
+# durée maximale de construction d'un instantané avant que le verrou ne soit relâché
+SNAPSHOT_LOCK_TIMEOUT = 120
+
+
+Snapshot = namedtuple("Snapshot", ["content", "etag", "last_modified"])
+
+
+def get_snapshot(name):
+    values = get_auth_redis_client().hgetall(SNAPSHOT_KEY.format(name=name))
+
+    if not values:
+        return None
+
+    return Snapshot(
+        content=values[b"content"],
+        etag=values[b"etag"].decode(),
+        last_modified=int(values[b"last_modified"]),
+    )
+
+
+def store_snapshot(name, content, expiration=None):
+    snapshot = Snapshot(
+        content=content,
+        etag=hashlib.sha1(content).hexdigest(),
+        last_modified=int(time.time()),
+    )
+
+    key = SNAPSHOT_KEY.format(name=name)
+    pipeline = get_auth_redis_client().pipeline()
+    pipeline.hset(key, mapping=snapshot._asdict())
+    pipeline.expire(key, expiration or settings.MAP_SNAPSHOT_EXPIRATION)
+    pipeline.execute()
+
+    return snapshot
+
+
+def get_or_build_snapshot(name, builder, expiration=None):
+    """Renvoie l'instantané demandé, en le construisant s'il n'existe pas encore
+
+    Un verrou garantit qu'un seul processus construit l'instantané. Les requêtes qui
+    arrivent pendant sa construction ne l'attendent pas : la fonction renvoie alors
+    `None`, et c'est à l'appelant de répondre autrement (par exemple en exécutant
+    directement la requête).
+
+    Les instantanés qui ne sont pas reconstruits par `build_map_snapshots` doivent
+    indiquer une durée de validité `expiration` plus courte.
+    """
+    snapshot = get_snapshot(name)
+    if snapshot is not None:
+        return snapshot
+
+    lock = get_auth_redis_client().lock(
+        SNAPSHOT_LOCK_KEY.format(name=name), timeout=SNAPSHOT_LOCK_TIMEOUT
+    )
+    if not lock.acquire(blocking=False):
+        return None
+
+    try:
+        # l'instantané a pu être construit entre-temps par un autre processus
+        return get_snapshot(name) or store_snapshot(name, builder(), expiration)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # le verrou a expiré pendant la construction
+            pass
+
+
+def snapshot_response(request, snapshot, content_type="application/json"):
+    response = HttpResponse(snapshot.content, content_type=content_type)
+    response["ETag"] = quote_etag(snapshot.etag)
+    response["Last-Modified"] = http_date(snapshot.last_modified)
+
+    return get_conditional_response(
+        request,
+        etag=response["ETag"],
+        last_modified=snapshot.last_modified,
+        response=response,
+    )
@@ -0,0 +1,18 @@
+from celery import shared_task
+
+from .snapshots import store_snapshot
+from .views import EventsView, GroupsView, EventsTileView, GroupsTileView
+
+
+@shared_task
+def build_map_snapshots():
+    for view in (EventsView, GroupsView):
+        for variant in (None, *view.snapshot_variants):
+            store_snapshot(
+                view.get_snapshot_name(variant), view.build_snapshot(variant)
+            )
+
+    for view in (EventsTileView, GroupsTileView):
+        for variant in (None, *view.list_view.snapshot_variants):
+            for name, content in view.build_low_zoom_snapshots(variant):
+                store_snapshot(name, content)
@@ -1,14 +1,18 @@
+from django.contrib.gis.geos import Point
 from django.test import TestCase
 from django.urls import reverse
 from django.utils import timezone
 
-from agir.api.redis import using_separate_redis_server
+from agir.api.redis import get_auth_redis_client, using_separate_redis_server
 from agir.lib.tests.mixins import FakeDataMixin
 
 from agir.people.models import Person, PersonValidationSMS, generate_code
 from agir.events.models import Event, EventSubtype
 from agir.groups.models import SupportGroup
 from agir.lib.tests.mixins import create_location
+from agir.carte.snapshots import SNAPSHOT_KEY, SNAPSHOT_LOCK_KEY, get_snapshot
+from agir.carte.tasks import build_map_snapshots
+from agir.carte.tiles import tile_position, cluster_points
 
 
 @using_separate_redis_server
@@ -80,6 +84,39 @@ class EventsMapTestCase(TestCase):
         self.assertNotContains(res, self.event_insoumis.name)
         self.assertContains(res, self.event_2022.name)
 
+    def test_unfiltered_list_is_served_from_snapshot(self):
+        res = self.client.get(reverse("carte:event_list"))
+        self.assertContains(res, self.event_insoumis.name)
+        self.assertIn("ETag", res)
+
+        res = self.client.get(
+            reverse("carte:event_list"), HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+        self.assertEqual(res.status_code, 304)
+
+        self.event_insoumis.name = "Nouveau nom"
+        self.event_insoumis.save()
+
+        res = self.client.get(reverse("carte:event_list"))
+        self.assertNotContains(res, "Nouveau nom")
+
+        build_map_snapshots.delay()
+
+        res = self.client.get(reverse("carte:event_list"))
+        self.assertContains(res, "Nouveau nom")
+
+    def test_list_is_served_live_while_snapshot_is_being_built(self):
+        get_auth_redis_client().delete(SNAPSHOT_KEY.format(name="events"))
+        lock = get_auth_redis_client().lock(
+            SNAPSHOT_LOCK_KEY.format(name="events"), timeout=10
+        )
+        self.assertTrue(lock.acquire(blocking=False))
+        self.addCleanup(lock.release)
+
+        res = self.client.get(reverse("carte:event_list"))
+        self.assertContains(res, self.event_insoumis.name)
+        self.assertIsNone(get_snapshot("events"))
+
 
 @using_separate_redis_server
 class GroupsMapTestCase(TestCase):
@@ -109,3 +146,115 @@ class GroupsMapTestCase(TestCase):
         res = self.client.get(reverse("carte:group_list") + "?var=nsp_only")
         self.assertContains(res, self.group_insoumis.name)
         self.assertContains(res, self.group_2022.name)
+
+
+@using_separate_redis_server
+class TilesTestCase(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.subtype = EventSubtype.objects.create(
+            label="sous-type",
+            visibility=EventSubtype.VISIBILITY_ALL,
+            type=EventSubtype.TYPE_PUBLIC_ACTION,
+        )
+
+        self.paris_events = [
+            Event.objects.create(
+                name=f"Événement parisien {i}",
+                subtype=self.subtype,
+                start_time=now + timezone.timedelta(days=1),
+                end_time=now + timezone.timedelta(days=1, hours=2),
+                coordinates=Point(2.35 + i * 0.01, 48.85),
+            )
+            for i in range(3)
+        ]
+        self.lyon_event = Event.objects.create(
+            name="Événement lyonnais",
+            subtype=self.subtype,
+            start_time=now + timezone.timedelta(days=1),
+            end_time=now + timezone.timedelta(days=1, hours=2),
+            coordinates=Point(4.83, 45.76),
+        )
+
+    def get_tile(self, z, lon, lat):
+        x, y = (int(c) for c in tile_position(lon, lat, z))
+        return self.client.get(reverse("carte:event_tile", args=[z, x, y])).json()
+
+    def test_close_events_are_clustered_at_low_zoom(self):
+        res = self.get_tile(5, 2.35, 48.85)
+
+        self.assertEqual(len(res["clusters"]), 1)
+        self.assertEqual(res["clusters"][0]["count"], 3)
+        self.assertNotIn(str(self.lyon_event.pk), [item["id"] for item in res["items"]])
+
+    def test_events_are_not_clustered_at_high_zoom(self):
+        res = self.get_tile(18, 2.35, 48.85)
+
+        self.assertEqual(res["clusters"], [])
+        self.assertEqual(
+            [item["id"] for item in res["items"]], [str(self.paris_events[0].pk)]
+        )
+
+    def test_invalid_tile_returns_404(self):
+        res = self.client.get(reverse("carte:event_tile", args=[2, 4, 0]))
+        self.assertEqual(res.status_code, 404)
+
+    def test_point_on_tile_edge_belongs_to_a_single_tile(self):
+        # au zoom 1, le point (0, 0) est au coin commun des quatre tuiles
+        point = Point(0, 0)
+
+        self.assertEqual(cluster_points([(1, point)], 1, 0, 0), ([], []))
+        self.assertEqual(cluster_points([(1, point)], 1, 0, 1), ([], []))
+        self.assertEqual(cluster_points([(1, point)], 1, 1, 0), ([], []))
+        self.assertEqual(cluster_points([(1, point)], 1, 1, 1), ([], [1]))
+
+    def test_low_zoom_tiles_are_served_from_snapshots(self):
+        build_map_snapshots.delay()
+        self.lyon_event.coordinates = Point(-70, -30)
+        self.lyon_event.save()
+
+        res = self.client.get(reverse("carte:event_tile", args=[0, 0, 0]))
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("ETag", res)
+        self.assertEqual([cluster["count"] for cluster in res.json()["clusters"]], [4])
+        self.assertEqual(res.json()["items"], [])
+
+        build_map_snapshots.delay()
+
+        res = self.client.get(reverse("carte:event_tile", args=[0, 0, 0]))
+        self.assertEqual([cluster["count"] for cluster in res.json()["clusters"]], [3])
+        self.assertEqual(
+            [item["id"] for item in res.json()["items"]], [str(self.lyon_event.pk)]
+        )
+
+    def test_filtered_low_zoom_tiles_are_served_from_snapshots(self):
+        other_subtype = EventSubtype.objects.create(
+            label="autre-sous-type",
+            visibility=EventSubtype.VISIBILITY_ALL,
+            type=EventSubtype.TYPE_PUBLIC_ACTION,
+        )
+        self.lyon_event.subtype = other_subtype
+        self.lyon_event.save()
+        url = reverse("carte:event_tile", args=[0, 0, 0])
+
+        res = self.client.get(url + "?subtype=autre-sous-type")
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("ETag", res)
+        self.assertEqual(res.json()["clusters"], [])
+        self.assertEqual(
+            [item["id"] for item in res.json()["items"]], [str(self.lyon_event.pk)]
+        )
+
+        # la tuile filtrée est servie depuis son instantané
+        self.lyon_event.subtype = self.subtype
+        self.lyon_event.save()
+        res = self.client.get(url + "?subtype=autre-sous-type")
+        self.assertEqual(
+            [item["id"] for item in res.json()["items"]], [str(self.lyon_event.pk)]
+        )
+
+    def test_invalid_filters_on_low_zoom_tiles_are_rejected(self):
+        res = self.client.get(
+            reverse("carte:event_tile", args=[1, 1, 0]) + "?subtype=inconnu"
+        )
+        self.assertEqual(res.status_code, 400)
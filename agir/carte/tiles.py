@@ -0,0 +1,96 @@
+import math
+
+# nombre de cellules de regroupement par côté de tuile (une tuile fait 256 pixels)
+TILE_GRID_SIZE = 32
+# au-delà de ce niveau de zoom, les points ne sont plus regroupés
+MAX_CLUSTERING_ZOOM = 16
+MAX_ZOOM = 20
+# en dessous de ce niveau de zoom, les tuiles sont trop grandes pour être filtrées
+# par un polygone géographique : elles contiennent alors potentiellement tous les points,
+# et ne sont servies que depuis des instantanés précalculés
+MIN_BBOX_FILTER_ZOOM = 3
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def low_zoom_tiles():
+    """Énumère les tuiles des niveaux de zoom inférieurs à MIN_BBOX_FILTER_ZOOM"""
+    for z in range(MIN_BBOX_FILTER_ZOOM):
+        for x in range(2 ** z):
+            for y in range(2 ** z):
+                yield z, x, y
+
+
+def tile_bbox(z, x, y):
+    """Renvoie les limites de la tuile sous la forme [lon1, lat1, lon2, lat2]"""
+    n = 2 ** z
+
+    def lat(y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+    return [x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)]
+
+
+def tile_position(lon, lat, z):
+    """Renvoie la position (fractionnaire) du point dans la grille des tuiles du zoom z"""
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+
+    return (
+        (lon + 180.0) / 360.0 * n,
+        (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n,
+    )
+
+
+def cluster_points(points, z, x, y, grid_size=TILE_GRID_SIZE):
+    """Regroupe les points d'une tuile selon une grille régulière
+
+    :param points: itérable de couples (identifiant, point)
+    :return: un couple (groupes, identifiants), où groupes est la liste des regroupements
+        d'au moins deux points, et identifiants la liste des points restés seuls
+    """
+    cells = {}
+    seen = set()
+
+    for pk, point in points:
+        # les filtres sur des relations multiples peuvent renvoyer plusieurs fois le même point
+        if pk in seen:
+            continue
+        seen.add(pk)
+
+        tx, ty = tile_position(point.x, point.y, z)
+        # intervalle semi-ouvert : un point sur la limite entre deux tuiles n'appartient
+        # qu'à l'une d'elles, et n'est donc pas compté deux fois
+        if not (x <= tx < x + 1 and y <= ty < y + 1):
+            continue
+
+        if z >= MAX_CLUSTERING_ZOOM:
+            cell = pk
+        else:
+            cell = (int((tx - x) * grid_size), int((ty - y) * grid_size))
+
+        cells.setdefault(cell, []).append((pk, point))
+
+    clusters = []
+    singles = []
+
+    for members in cells.values():
+        if len(members) == 1:
+            singles.append(members[0][0])
+        else:
+            clusters.append(
+                {
+                    "count": len(members),
+                    "coordinates": {
+                        "type": "Point",
+                        "coordinates": [
+                            sum(p.x for _, p in members) / len(members),
+                            sum(p.y for _, p in members) / len(members),
+                        ],
+                    },
+                }
+            )
+
+    return clusters, singles
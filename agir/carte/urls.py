@@ -6,6 +6,16 @@ app_name = "carte"
 urlpatterns = [
     path("liste_evenements/", views.EventsView.as_view(), name="event_list"),
     path("liste_groupes/", views.GroupsView.as_view(), name="group_list"),
+    path(
+        "tuiles_evenements/<int:z>/<int:x>/<int:y>/",
+        views.EventsTileView.as_view(),
+        name="event_tile",
+    ),
+    path(
+        "tuiles_groupes/<int:z>/<int:x>/<int:y>/",
+        views.GroupsTileView.as_view(),
+        name="group_tile",
+    ),
     path("evenements/", views.EventMapView.as_view(), name="events_map"),
     path(
         "evenements_commune/<str:departement>/<slug:nom>/",
@@ -1,10 +1,14 @@
+import hashlib
 import json
 from datetime import timedelta
+from functools import partial
+from urllib.parse import urlencode
 
 import django_filters
 from django.contrib.gis.geos import Polygon
 from django.db.models import Q, Count, Case, BooleanField, When, Value
 from django.http import QueryDict, Http404
+from django.utils.cache import patch_cache_control
 from django.utils.decorators import method_decorator
 from django.utils.html import mark_safe
 from django.utils.timezone import now
@@ -15,11 +19,21 @@ from django.views.generic import TemplateView, DetailView
 from django_filters.rest_framework.backends import DjangoFilterBackend
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.exceptions import ValidationError
-from rest_framework.generics import ListAPIView
+from rest_framework.generics import ListAPIView, GenericAPIView
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
 
 from agir.lib.export import dict_to_camelcase
 from agir.municipales.models import CommunePage
 from . import serializers
+from .snapshots import get_or_build_snapshot, snapshot_response
+from .tiles import (
+    is_valid_tile,
+    tile_bbox,
+    cluster_points,
+    low_zoom_tiles,
+    MIN_BBOX_FILTER_ZOOM,
+)
 from ..events.filters import EventFilter
 from ..events.models import Event, EventSubtype
 from ..groups.models import SupportGroup, SupportGroupSubtype
@@ -86,26 +100,93 @@ class BBoxFilterBackend(object):
         return queryset.filter(coordinates__intersects=bbox)
 
 
-class EventsView(ListAPIView):
+class SnapshotListAPIView(ListAPIView):
+    """Vue de liste qui sert les requêtes sans filtre depuis un instantané précalculé
+
+    Les instantanés sont stockés dans Redis et reconstruits périodiquement par la tâche
+    `build_map_snapshots` : l'expiration d'un cache ne provoque donc plus l'exécution
+    simultanée de la même requête coûteuse par tous les workers.
+    """
+
+    snapshot_name = None
+    # valeurs du paramètre `var` pour lesquelles un instantané est aussi construit
+    snapshot_variants = ()
+
+    @classmethod
+    def get_snapshot_name(cls, variant=None):
+        if variant:
+            return "{}:{}".format(cls.snapshot_name, variant)
+        return cls.snapshot_name
+
+    @classmethod
+    def get_base_queryset(cls, variant=None):
+        raise NotImplementedError()
+
+    @classmethod
+    def build_snapshot(cls, variant=None):
+        queryset = cls.filterset_class(
+            data=QueryDict(), queryset=cls.get_base_queryset(variant)
+        ).qs
+        return JSONRenderer().render(cls.serializer_class(queryset, many=True).data)
+
+    def get_queryset(self):
+        return self.get_base_queryset(self.request.GET.get("var"))
+
+    def get_snapshot_variant(self):
+        """Renvoie la variante d'instantané qui correspond à la requête
+
+        Renvoie `False` si la requête comporte des filtres et ne peut pas être servie
+        depuis un instantané.
+        """
+        params = self.request.GET
+        if any(param != "var" for param in params):
+            return False
+
+        variant = params.get("var") or None
+        if variant is not None and variant not in self.snapshot_variants:
+            return False
+
+        return variant
+
+    @method_decorator(cache.cache_page(300))
+    def get_filtered(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    @method_decorator(dont_vary_on_cookie)
+    @cache.cache_control(public=True)
+    def get(self, request, *args, **kwargs):
+        variant = self.get_snapshot_variant()
+
+        if variant is False:
+            return self.get_filtered(request, *args, **kwargs)
+
+        snapshot = get_or_build_snapshot(
+            self.get_snapshot_name(variant), lambda: self.build_snapshot(variant)
+        )
+        if snapshot is None:
+            # l'instantané est en cours de construction par un autre processus
+            return self.get_filtered(request, *args, **kwargs)
+
+        return snapshot_response(request, snapshot)
+
+
+class EventsView(SnapshotListAPIView):
     permission_classes = ()
     serializer_class = serializers.MapEventSerializer
     filter_backends = (BBoxFilterBackend, DjangoFilterBackend)
     filterset_class = EventFilter
+    snapshot_name = "events"
+    snapshot_variants = ("nsp_only",)
 
-    def get_queryset(self):
+    @classmethod
+    def get_base_queryset(cls, variant=None):
         qs = Event.objects.listed()
 
-        if self.request.GET.get("var") == "nsp_only":
+        if variant == "nsp_only":
             qs = qs.is_2022()
 
         return qs.filter(coordinates__isnull=False).select_related("subtype")
 
-    @method_decorator(cache.cache_page(300))
-    @method_decorator(dont_vary_on_cookie)
-    @cache.cache_control(public=True)
-    def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
-
 
 class GroupFilterSet(django_filters.rest_framework.FilterSet):
     subtype = FixedModelMultipleChoiceFilter(
@@ -119,19 +200,15 @@ class GroupFilterSet(django_filters.rest_framework.FilterSet):
         fields = ("subtype",)
 
 
-class GroupsView(ListAPIView):
+class GroupsView(SnapshotListAPIView):
     permission_classes = ()
     serializer_class = serializers.MapGroupSerializer
     filter_backends = (BBoxFilterBackend, DjangoFilterBackend)
     filterset_class = GroupFilterSet
+    snapshot_name = "groups"
 
-    @method_decorator(cache.cache_page(300))
-    @method_decorator(dont_vary_on_cookie)
-    @cache.cache_control(public=True)
-    def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
-
-    def get_queryset(self):
+    @classmethod
+    def get_base_queryset(cls, variant=None):
         qs = (
             SupportGroup.objects.active()
             .filter(coordinates__isnull=False)
@@ -145,6 +222,181 @@ class GroupsView(ListAPIView):
         )
 
 
+class TileAPIView(GenericAPIView):
+    """Vue qui renvoie les éléments d'une tuile z/x/y, regroupés selon le niveau de zoom
+
+    Les éléments isolés sont sérialisés comme par la vue de liste correspondante, les
+    autres sont seulement comptés : la taille de la réponse dépend de la zone affichée
+    et non plus du nombre total d'éléments.
+
+    Les tuiles de zoom inférieur à `MIN_BBOX_FILTER_ZOOM` ne peuvent pas être filtrées
+    géographiquement et couvrent donc potentiellement tous les éléments : elles ne sont
+    servies que depuis des instantanés. Ceux des tuiles sans filtre sont reconstruits
+    par `build_map_snapshots` ; ceux des tuiles filtrées sont construits à la première
+    requête et expirent après `FILTERED_SNAPSHOT_EXPIRATION` secondes.
+    """
+
+    permission_classes = ()
+    filter_backends = (DjangoFilterBackend,)
+    list_view = None
+
+    FILTERED_SNAPSHOT_EXPIRATION = 300
+    EMPTY_TILE = {"clusters": [], "items": []}
+
+    @classmethod
+    def get_tile_snapshot_name(cls, z, x, y, variant=None, filter_key=None):
+        name = "{}:tuile:{}/{}/{}".format(
+            cls.list_view.get_snapshot_name(variant), z, x, y
+        )
+        if filter_key:
+            return "{}:{}".format(name, filter_key)
+        return name
+
+    @classmethod
+    def get_base_queryset(cls, variant=None):
+        return cls.list_view.get_base_queryset(variant)
+
+    @classmethod
+    def get_items_queryset(cls, pks, variant=None):
+        return cls.get_base_queryset(variant).filter(pk__in=pks)
+
+    @classmethod
+    def get_tile_data(cls, points, z, x, y, variant=None):
+        clusters, singles = cluster_points(points, z, x, y)
+        items = cls.serializer_class(
+            cls.get_items_queryset(singles, variant), many=True
+        ).data
+
+        return {"clusters": clusters, "items": items}
+
+    @classmethod
+    def get_snapshot_points(cls, variant=None):
+        queryset = cls.filterset_class(
+            data=QueryDict(), queryset=cls.get_base_queryset(variant)
+        ).qs
+        return list(queryset.values_list("id", "coordinates"))
+
+    @classmethod
+    def build_tile_snapshot(cls, z, x, y, variant=None, queryset=None):
+        if queryset is None:
+            points = cls.get_snapshot_points(variant)
+        else:
+            points = queryset.values_list("id", "coordinates")
+        return JSONRenderer().render(cls.get_tile_data(points, z, x, y, variant))
+
+    @classmethod
+    def build_low_zoom_snapshots(cls, variant=None):
+        """Renvoie les instantanés de toutes les tuiles de faible zoom
+
+        Les points ne sont chargés qu'une seule fois pour l'ensemble des tuiles.
+        """
+        points = cls.get_snapshot_points(variant)
+
+        for z, x, y in low_zoom_tiles():
+            yield (
+                cls.get_tile_snapshot_name(z, x, y, variant),
+                JSONRenderer().render(cls.get_tile_data(points, z, x, y, variant)),
+            )
+
+    def get_queryset(self):
+        return self.get_base_queryset(self.get_snapshot_variant())
+
+    def get_snapshot_variant(self):
+        # les vues de base ignorent les valeurs de `var` qu'elles ne connaissent pas
+        variant = self.request.GET.get("var")
+        if variant in self.list_view.snapshot_variants:
+            return variant
+        return None
+
+    def get_filter_key(self):
+        """Renvoie une clé qui identifie les filtres de la requête, ou `None` s'il n'y
+        en a pas"""
+        params = sorted(
+            (param, value)
+            for param, values in self.request.GET.lists()
+            if param != "var"
+            for value in values
+        )
+        if not params:
+            return None
+        return hashlib.sha1(urlencode(params).encode()).hexdigest()
+
+    @method_decorator(cache.cache_page(300))
+    def get_filtered(self, request, *args, z, x, y, **kwargs):
+        qs = self.filter_queryset(self.get_queryset()).filter(
+            coordinates__intersects=Polygon.from_bbox(tile_bbox(z, x, y))
+        )
+
+        return Response(
+            self.get_tile_data(
+                qs.values_list("id", "coordinates"),
+                z,
+                x,
+                y,
+                self.get_snapshot_variant(),
+            )
+        )
+
+    def get_from_snapshot(self, request, z, x, y):
+        variant = self.get_snapshot_variant()
+        filter_key = self.get_filter_key()
+
+        if filter_key is None:
+            queryset = expiration = None
+        else:
+            # les filtres sont validés ici, avant la recherche de l'instantané
+            queryset = self.filter_queryset(self.get_queryset())
+            expiration = self.FILTERED_SNAPSHOT_EXPIRATION
+
+        snapshot = get_or_build_snapshot(
+            self.get_tile_snapshot_name(z, x, y, variant, filter_key),
+            partial(self.build_tile_snapshot, z, x, y, variant, queryset),
+            expiration=expiration,
+        )
+
+        if snapshot is None:
+            # l'instantané est en cours de construction par un autre processus : la
+            # tuile est renvoyée vide plutôt que de charger à nouveau tous les éléments,
+            # et ne doit pas être mise en cache
+            response = Response(self.EMPTY_TILE)
+            patch_cache_control(response, no_cache=True)
+            return response
+
+        return snapshot_response(request, snapshot)
+
+    @method_decorator(dont_vary_on_cookie)
+    @cache.cache_control(public=True)
+    def get(self, request, *args, z, x, y, **kwargs):
+        if not is_valid_tile(z, x, y):
+            raise Http404()
+
+        if z >= MIN_BBOX_FILTER_ZOOM:
+            return self.get_filtered(request, *args, z=z, x=x, y=y, **kwargs)
+
+        return self.get_from_snapshot(request, z, x, y)
+
+
+class EventsTileView(TileAPIView):
+    serializer_class = serializers.MapEventSerializer
+    filterset_class = EventFilter
+    list_view = EventsView
+
+
+class GroupsTileView(TileAPIView):
+    serializer_class = serializers.MapGroupSerializer
+    filterset_class = GroupFilterSet
+    list_view = GroupsView
+
+    @classmethod
+    def get_base_queryset(cls, variant=None):
+        # le regroupement n'a pas besoin de l'annotation is_active, coûteuse
+        return SupportGroup.objects.active().filter(coordinates__isnull=False)
+
+    @classmethod
+    def get_items_queryset(cls, pks, variant=None):
+        return GroupsView.get_base_queryset().filter(pk__in=pks)
+
+
 class MapViewMixin:
     @xframe_options_exempt
     def get(self, request, *args, **kwargs):
@@ -1,16 +1,83 @@
 from django.conf import settings
-from django.db.models import Sum
+from django.db.models import Sum, Q
 
 from agir.donations.apps import DonsConfig
-from agir.donations.models import Operation, MonthlyAllocation
+from agir.donations.models import Operation, MonthlyAllocation, GroupBalance
 from agir.payments.actions.subscriptions import create_subscription
 
 
 def get_balance(group):
+    """Renvoie le solde de l'allocation du groupe
+
+    Le solde est lu dans la table tenue à jour à chaque opération : le coût ne dépend
+    pas du nombre d'opérations du groupe.
+    """
     return (
-        Operation.objects.filter(group=group).aggregate(sum=Sum("amount"))["sum"] or 0
+        GroupBalance.objects.filter(group=group)
+        .values_list("balance", flat=True)
+        .first()
+        or 0
+    )
+
+
+def get_balance_history(group, operations):
+    """Renseigne l'attribut `balance` de chaque opération avec le solde du groupe
+    juste après celle-ci
+
+    :param group: le groupe
+    :param operations: une séquence d'opérations du groupe, de la plus récente à la
+        plus ancienne (par exemple une page de résultats)
+    :return: la liste des opérations
+    """
+    operations = list(operations)
+    if not operations:
+        return operations
+
+    # seules les opérations plus récentes que la première de la séquence sont sommées,
+    # ce qui ne coûte presque rien pour la première page de l'historique
+    first = operations[0]
+    more_recent = (
+        Operation.objects.filter(group=group)
+        .filter(
+            Q(created__gt=first.created) | Q(created=first.created, id__gt=first.id)
+        )
+        .aggregate(sum=Sum("amount"))["sum"]
+        or 0
     )
 
+    balance = get_balance(group) - more_recent
+    for operation in operations:
+        operation.balance = balance
+        balance -= operation.amount
+
+    return operations
+
+
+def find_balance_discrepancies(groups=None):
+    """Compare les soldes enregistrés à la somme des opérations de chaque groupe
+
+    :param groups: un queryset de groupes auquel limiter la vérification
+    :return: une liste de triplets (id du groupe, solde enregistré, somme des opérations)
+    """
+    operations = Operation.objects.all()
+    balances = GroupBalance.objects.all()
+    if groups is not None:
+        operations = operations.filter(group__in=groups)
+        balances = balances.filter(group__in=groups)
+
+    totals = dict(
+        operations.values("group_id")
+        .annotate(total=Sum("amount"))
+        .values_list("group_id", "total")
+    )
+    recorded = dict(balances.values_list("group_id", "balance"))
+
+    return [
+        (group_id, recorded.get(group_id, 0), totals.get(group_id, 0))
+        for group_id in totals.keys() | recorded.keys()
+        if recorded.get(group_id, 0) != totals.get(group_id, 0)
+    ]
+
 
 def group_can_handle_allocation(group):
     return group.subtypes.filter(label__in=settings.CERTIFIED_GROUP_SUBTYPES).exists()
@@ -0,0 +1,63 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from agir.donations.allocations import find_balance_discrepancies
+from agir.donations.models import GroupBalance, Operation
+from agir.groups.models import SupportGroup
+from agir.lib.display import display_price
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie que le solde enregistré de chaque groupe correspond à la somme de ses "
+        "opérations, et corrige éventuellement les écarts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "groups",
+            nargs="*",
+            help="Identifiants des groupes à vérifier (par défaut, tous).",
+        )
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            dest="fix",
+            help="Recalcule les soldes erronés à partir des opérations.",
+        )
+
+    def fix_balance(self, group_id):
+        with transaction.atomic():
+            # le verrou sur le solde bloque toute nouvelle opération du groupe pendant
+            # le recalcul
+            balance, _ = GroupBalance.objects.select_for_update().get_or_create(
+                group_id=group_id
+            )
+            balance.balance = (
+                Operation.objects.filter(group_id=group_id).aggregate(
+                    sum=Sum("amount")
+                )["sum"]
+                or 0
+            )
+            balance.save()
+
+    def handle(self, *args, groups, fix, **options):
+        discrepancies = find_balance_discrepancies(
+            SupportGroup.objects.filter(pk__in=groups) if groups else None
+        )
+
+        for group_id, recorded, total in discrepancies:
+            self.stdout.write(
+                f"{group_id} : solde enregistré {display_price(recorded)}, somme des "
+                f"opérations {display_price(total)}"
+            )
+            if fix:
+                self.fix_balance(group_id)
+
+        if not discrepancies:
+            self.stdout.write("Aucun écart.")
+        elif fix:
+            self.stdout.write(f"{len(discrepancies)} solde(s) corrigé(s).")
+        else:
+            raise CommandError(f"{len(discrepancies)} solde(s) erroné(s).")
@@ -17,7 +17,7 @@ from agir.lib.display import display_price
 from agir.lib.model_fields import IBANField
 from agir.lib.models import TimeStampedModel
 
-__all__ = ["Operation", "Spending", "SpendingRequest", "Document"]
+__all__ = ["Operation", "GroupBalance", "Spending", "SpendingRequest", "Document"]
 
 
 class Operation(models.Model):
@@ -77,6 +77,35 @@ class Operation(models.Model):
         verbose_name = "Opération"
         verbose_name_plural = "Opérations"
         unique_together = ("payment", "group")
+        indexes = (
+            models.Index(
+                fields=("group", "-created", "-id"), name="donations_operation_history"
+            ),
+        )
+
+
+class GroupBalance(models.Model):
+    """Solde courant de l'allocation d'un groupe
+
+    Il est tenu à jour par un trigger PostgreSQL à chaque création, modification ou
+    suppression d'une opération, dans la même transaction : il ne doit jamais être
+    modifié directement. La commande `reconcile_group_balances` vérifie qu'il
+    correspond bien à la somme des opérations du groupe.
+    """
+
+    group = models.OneToOneField(
+        to="groups.SupportGroup",
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name="allocation_balance",
+        editable=False,
+    )
+    balance = BalanceField(_("solde"), default=0, editable=False)
+    modified = models.DateTimeField(_("dernière modification"), auto_now=True)
+
+    class Meta:
+        verbose_name = "Solde d'allocation"
+        verbose_name_plural = "Soldes d'allocation"
 
 
 class Spending(Operation):
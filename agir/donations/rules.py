@@ -31,3 +31,7 @@ rules.add_perm(
     & is_authenticated_person
     & has_managing_rights_on_group_of_spending_request,
 )
+rules.add_perm(
+    "donations.view_groupbalance",
+    is_authenticated_person & is_at_least_manager_for_group,
+)
@@ -0,0 +1,23 @@
+from rest_framework import serializers
+
+from agir.donations.models import Operation
+
+
+class OperationHistorySerializer(serializers.ModelSerializer):
+    """Opération de l'historique d'allocation d'un groupe
+
+    L'attribut `balance` doit avoir été renseigné par `get_balance_history`.
+    """
+
+    id = serializers.IntegerField(read_only=True)
+    created = serializers.DateTimeField(read_only=True)
+    amount = serializers.IntegerField(read_only=True)
+    balance = serializers.IntegerField(read_only=True)
+    isDonation = serializers.SerializerMethodField()
+
+    def get_isDonation(self, obj):
+        return obj.payment_id is not None
+
+    class Meta:
+        model = Operation
+        fields = ["id", "created", "amount", "balance", "isDonation"]
@@ -0,0 +1,135 @@
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from agir.donations.allocations import (
+    get_balance,
+    get_balance_history,
+    find_balance_discrepancies,
+)
+from agir.donations.models import Operation, Spending, GroupBalance
+from agir.donations.tests.test_triggers import TriggersTestCaseMixin
+from agir.groups.models import SupportGroup, Membership
+from agir.people.models import Person
+
+
+class GroupBalanceTestCase(TriggersTestCaseMixin, TestCase):
+    def test_balance_is_updated_with_each_operation(self):
+        self.assertEqual(get_balance(self.group1), 0)
+
+        self.create_payment(1000, group=self.group1)
+        self.create_payment(1000, group=self.group1, allocation=600)
+        self.assertEqual(get_balance(self.group1), 1600)
+
+        Spending.objects.create(group=self.group1, amount=-500)
+        self.assertEqual(get_balance(self.group1), 1100)
+        self.assertEqual(get_balance(self.group2), 0)
+
+    def test_balance_is_updated_when_operation_is_modified(self):
+        self.create_payment(1000, group=self.group1)
+        o = Operation.objects.get()
+
+        o.amount = 800
+        o.save()
+        self.assertEqual(get_balance(self.group1), 800)
+
+        o.group = self.group2
+        o.save()
+        self.assertEqual(get_balance(self.group1), 0)
+        self.assertEqual(get_balance(self.group2), 800)
+
+    def test_balance_history(self):
+        self.create_payment(1000, group=self.group1)
+        self.create_payment(1000, group=self.group1, allocation=600)
+        Spending.objects.create(group=self.group1, amount=-500)
+        Operation.objects.create(group=self.group2, amount=300)
+
+        operations = get_balance_history(
+            self.group1,
+            Operation.objects.filter(group=self.group1).order_by("-created", "-id"),
+        )
+        self.assertEqual([o.balance for o in operations], [1100, 1600, 1000])
+
+        # une page qui ne commence pas par l'opération la plus récente
+        operations = get_balance_history(
+            self.group1,
+            Operation.objects.filter(group=self.group1).order_by("-created", "-id")[1:],
+        )
+        self.assertEqual([o.balance for o in operations], [1600, 1000])
+
+    def test_find_discrepancies(self):
+        self.create_payment(1000, group=self.group1)
+        self.create_payment(1000, group=self.group2)
+        self.assertEqual(find_balance_discrepancies(), [])
+
+        GroupBalance.objects.filter(group=self.group1).update(balance=1500)
+        self.assertEqual(
+            find_balance_discrepancies(), [(self.group1.pk, 1500, 1000)],
+        )
+        self.assertEqual(
+            find_balance_discrepancies(SupportGroup.objects.filter(pk=self.group2.pk)),
+            [],
+        )
+
+    def test_reconcile_command(self):
+        self.create_payment(1000, group=self.group1)
+        GroupBalance.objects.filter(group=self.group1).update(balance=1500)
+
+        with self.assertRaises(CommandError):
+            call_command("reconcile_group_balances", stdout=StringIO())
+
+        call_command("reconcile_group_balances", fix=True, stdout=StringIO())
+        self.assertEqual(get_balance(self.group1), 1000)
+        call_command("reconcile_group_balances", stdout=StringIO())
+
+
+class GroupBalanceHistoryAPITestCase(APITestCase):
+    def setUp(self):
+        self.manager = Person.objects.create_insoumise(
+            "manager@example.com", create_role=True
+        )
+        self.member = Person.objects.create_insoumise(
+            "member@example.com", create_role=True
+        )
+        self.group = SupportGroup.objects.create(name="Groupe")
+        Membership.objects.create(
+            person=self.manager,
+            supportgroup=self.group,
+            membership_type=Membership.MEMBERSHIP_TYPE_MANAGER,
+        )
+        Membership.objects.create(person=self.member, supportgroup=self.group)
+
+        Operation.objects.create(group=self.group, amount=1000)
+        Spending.objects.create(group=self.group, amount=-300)
+
+        self.url = reverse(
+            "api_group_balance_history", kwargs={"group_id": self.group.pk}
+        )
+
+    def test_manager_can_see_history(self):
+        self.client.force_login(self.manager.role)
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [(o["amount"], o["balance"]) for o in res.data["results"]],
+            [(-300, 700), (1000, 1000)],
+        )
+
+    def test_history_with_cursor(self):
+        self.client.force_login(self.manager.role)
+        res = self.client.get(self.url, {"cursor": "", "page_size": 1})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["results"][0]["balance"], 700)
+
+        res = self.client.get(res.data["next"])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["results"][0]["balance"], 1000)
+
+    def test_members_cannot_see_history(self):
+        self.client.force_login(self.member.role)
+        res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 403)
@@ -35,6 +35,11 @@ urlpatterns = [
         views.CreateSpendingRequestView.as_view(),
         name="create_spending_request",
     ),
+    path(
+        "api/groupes/<uuid:group_id>/financement/historique/",
+        views.GroupBalanceHistoryAPIView.as_view(),
+        name="api_group_balance_history",
+    ),
     path(
         "financement/requete/<uuid:pk>/",
         views.ManageSpendingRequestView.as_view(),
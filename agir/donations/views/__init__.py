@@ -1,2 +1,3 @@
 from .donations_views import *
 from .spending_requests_views import *
+from .api_views import *
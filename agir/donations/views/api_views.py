@@ -0,0 +1,47 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.generics import ListAPIView
+
+from agir.donations.allocations import get_balance_history
+from agir.donations.models import Operation
+from agir.donations.serializers import OperationHistorySerializer
+from agir.groups.models import SupportGroup
+from agir.lib.pagination import APIPaginator
+from agir.lib.rest_framework_permissions import GlobalOrObjectPermissions
+
+__all__ = ("GroupBalanceHistoryAPIView",)
+
+
+class GroupBalanceHistoryPermissions(GlobalOrObjectPermissions):
+    perms_map = {"GET": []}
+    object_perms_map = {"GET": ["donations.view_groupbalance"]}
+
+
+class GroupBalanceHistoryAPIView(ListAPIView):
+    """Historique des opérations de l'allocation d'un groupe, de la plus récente à la
+    plus ancienne, avec le solde après chacune d'elles"""
+
+    serializer_class = OperationHistorySerializer
+    permission_classes = (GroupBalanceHistoryPermissions,)
+    pagination_class = APIPaginator
+    keyset_ordering = ("-created", "-pk")
+
+    def initial(self, request, *args, **kwargs):
+        try:
+            self.supportgroup = SupportGroup.objects.get(pk=kwargs["group_id"])
+        except SupportGroup.DoesNotExist:
+            raise NotFound()
+
+        self.check_object_permissions(request, self.supportgroup)
+
+        super().initial(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return Operation.objects.filter(group=self.supportgroup).order_by(
+            "-created", "-id"
+        )
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is None:
+            return None
+        return get_balance_history(self.supportgroup, page)
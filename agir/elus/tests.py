@@ -4,6 +4,7 @@ from django.urls import reverse
 from rest_framework import status
 
 from agir.elus.models import MandatMunicipal, MandatDepartemental, MandatRegional
+from agir.lib.geo_index import invalidate_commune_index
 from agir.lib.tests.utils import import_communes_test_data
 from agir.people.models import Person
 
@@ -11,6 +12,7 @@ from agir.people.models import Person
 class ViewsTestCase(TestCase):
     def setUp(self) -> None:
         import_communes_test_data()
+        self.addCleanup(invalidate_commune_index)
         self.person = Person.objects.create_insoumise("a@b.c", create_role=True)
         self.client.force_login(self.person.role)
 
@@ -9,7 +9,7 @@ from django.utils.translation import ugettext as _
 from agir.payments.actions.payments import create_payment, cancel_payment
 
 from ..apps import EventsConfig
-from ..models import RSVP, IdentifiedGuest, JitsiMeeting
+from ..models import Event, RSVP, IdentifiedGuest, JitsiMeeting
 from ..tasks import send_rsvp_notification, send_guest_confirmation
 
 logger = logging.getLogger(__name__)
@@ -39,13 +39,23 @@ MESSAGES = {
 
 
 def _ensure_can_rsvp(event, number=0):
+    """Vérifie que `number` participants peuvent être ajoutés à l'événement
+
+    Doit être appelée dans une transaction : la mise à jour conditionnelle verrouille
+    la ligne de l'événement jusqu'à la fin de celle-ci, ce qui sérialise les inscriptions
+    concurrentes à un même événement. Une inscription en attente du verrou revérifie la
+    condition sur le compteur mis à jour par l'inscription précédente, ce qui garantit
+    que le nombre maximum de participants n'est jamais dépassé.
+    """
     if event.is_past():
         raise RSVPException(MESSAGES["finished"])
 
-    # does not try to prevent race conditions
     if event.max_participants is not None and number:
-        current_participants = event.participants
-        if current_participants + number > event.max_participants:
+        reserved = Event.objects.filter(
+            pk=event.pk, participants_count__lte=F("max_participants") - number
+        ).update(participants_count=F("participants_count"))
+
+        if not reserved:
             raise RSVPException(MESSAGES["full"])
 
 
@@ -61,10 +71,6 @@ def _get_meta(event, form_submission, is_guest):
 
 # idempotent if not confirmed
 def _get_rsvp_for_event(event, person, form_submission, paying):
-    # TODO: add race conditions handling with explicit locking for maximum participants
-    # see https://www.caktusgroup.com/blog/2009/05/26/explicit-table-locking-with-postgresql-and-django/
-    # for potential solution
-
     if (event.subscription_form is None) != (form_submission is None):
         raise RSVPException(MESSAGES["submission_issue"])
 
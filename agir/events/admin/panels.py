@@ -20,6 +20,7 @@ from agir.lib.admin import (
     RegionListFilter,
     CountryListFilter,
 )
+from agir.lib.images import variation_url
 from agir.lib.utils import front_url
 from agir.people.admin.views import FormSubmissionViewsMixin
 from agir.people.models import PersonFormSubmission
@@ -155,7 +156,7 @@ class EventImageInline(admin.TabularInline):
             format_html(
                 '<a href="{}"><img src="{}"></a>',
                 obj.image.url,
-                obj.image.admin_thumbnail.url,
+                variation_url(obj.image, "admin_thumbnail"),
             )
         )
 
@@ -384,9 +385,6 @@ class EventAdmin(FormSubmissionViewsMixin, CenterOnFranceMixin, OSMGeoAdmin):
 
     autocomplete_fields = ("tags", "subscription_form")
 
-    def get_queryset(self, request):
-        return models.Event.objects.with_participants()
-
     def get_search_results(self, request, queryset, search_term):
         if search_term:
             queryset = queryset.search(search_term)
@@ -426,14 +424,14 @@ class EventAdmin(FormSubmissionViewsMixin, CenterOnFranceMixin, OSMGeoAdmin):
 
     def attendee_count(self, object):
         if object.is_free:
-            return str(object.all_attendee_count)
+            return str(object.participants_count)
 
         return _(
-            f"{object.all_attendee_count} (dont {object.confirmed_attendee_count} confirmés)"
+            f"{object.participants_count} (dont {object.confirmed_participants_count} confirmés)"
         )
 
     attendee_count.short_description = _("Nombre de personnes inscrites")
-    attendee_count.admin_order_field = "all_attendee_count"
+    attendee_count.admin_order_field = "participants_count"
 
     def link(self, object):
         if object.pk:
@@ -33,7 +33,6 @@ from .tasks import (
     send_external_rsvp_confirmation,
     send_secretariat_notification,
     notify_on_event_report,
-    geocode_event,
 )
 from ..lib.form_fields import AcceptCreativeCommonsLicenceField
 from ..people.models import Person, PersonFormSubmission
@@ -59,8 +58,6 @@ class AgendaChoiceField(forms.ModelChoiceField):
 
 
 class EventForm(LocationFormMixin, ContactFormMixin, ImageFormMixin, forms.ModelForm):
-    geocoding_task = geocode_event
-
     image_field = "image"
 
     subtype = forms.ModelChoiceField(
@@ -323,7 +320,6 @@ class AddOrganizerForm(forms.Form):
 
 
 class EventGeocodingForm(GeocodingBaseForm):
-    geocoding_task = geocode_event
     messages = {
         "use_geocoding": _(
             "La localisation de votre événement sur la carte va être réinitialisée à partir de son adresse."
@@ -0,0 +1,80 @@
+import timeit
+import uuid
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from agir.events.models import Event
+from agir.events.serializers import EVENT_ROUTES
+from agir.front.serializer_utils import RoutesField
+from agir.lib.utils import front_url
+
+
+def reverse_routes(event):
+    """Ancienne implémentation de `RoutesField.to_representation`, pour comparaison"""
+    return {
+        key: view_name
+        if view_name.startswith("http")
+        else front_url(view_name, args=(event.pk,))
+        for key, view_name in EVENT_ROUTES.items()
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le temps de calcul des liens des événements sérialisés en inversant "
+        "chaque URL et en utilisant les gabarits d'URL précalculés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--events",
+            type=int,
+            dest="events",
+            default=1000,
+            help="Nombre d'événements à sérialiser.",
+        )
+        parser.add_argument(
+            "-r",
+            "--repeat",
+            type=int,
+            dest="repeat",
+            default=5,
+            help="Nombre de répétitions de chaque mesure.",
+        )
+
+    def handle(self, *args, events, repeat, **options):
+        now = timezone.now()
+        objects = [
+            Event(
+                id=uuid.uuid4(),
+                name=f"Événement {i}",
+                start_time=now,
+                end_time=now + timedelta(hours=2),
+            )
+            for i in range(events)
+        ]
+        field = RoutesField(routes=EVENT_ROUTES)
+
+        # les gabarits sont construits lors du premier appel
+        field.to_representation(objects[0])
+
+        before = min(
+            timeit.repeat(
+                lambda: [reverse_routes(e) for e in objects], number=1, repeat=repeat
+            )
+        )
+        after = min(
+            timeit.repeat(
+                lambda: [field.to_representation(e) for e in objects],
+                number=1,
+                repeat=repeat,
+            )
+        )
+
+        self.stdout.write(
+            f"{events} événements : {before * 1000:.1f} ms (inversion des URL) / "
+            f"{after * 1000:.1f} ms (gabarits précalculés), x{before / after:.1f}"
+        )
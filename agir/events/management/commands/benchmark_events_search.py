@@ -0,0 +1,121 @@
+import random
+import timeit
+from datetime import timedelta
+
+from django.contrib.postgres.search import SearchRank, SearchVector
+from django.core.management import BaseCommand
+from django.db import models, transaction
+from django.utils import timezone
+from faker import Faker
+
+from agir.events.models import Event, EventSubtype
+from agir.lib.search import PrefixSearchQuery
+
+fake = Faker("fr_FR")
+
+
+class Rollback(Exception):
+    pass
+
+
+def on_the_fly_search(qs, query):
+    """Ancienne implémentation de `EventQuerySet.search`, pour comparaison"""
+    vector = (
+        SearchVector(models.F("name"), config="french_unaccented", weight="A")
+        + SearchVector(
+            models.F("location_name"), config="french_unaccented", weight="B"
+        )
+        + SearchVector(
+            models.F("location_city"), config="french_unaccented", weight="B"
+        )
+        + SearchVector(models.F("location_zip"), config="french_unaccented", weight="B")
+        + SearchVector(models.F("description"), config="french_unaccented", weight="C")
+        + SearchVector(
+            models.F("report_content"), config="french_unaccented", weight="C"
+        )
+    )
+    query = PrefixSearchQuery(query, config="french_unaccented")
+
+    return (
+        qs.annotate(search_vector=vector)
+        .filter(search_vector=query)
+        .annotate(rank=SearchRank(vector, query))
+        .order_by("-rank")
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le temps de la recherche d'événements avec le vecteur calculé à la volée "
+        "et avec la colonne de recherche indexée. Les événements générés sont supprimés à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-n",
+            "--events",
+            type=int,
+            dest="events",
+            default=100_000,
+            help="Nombre d'événements synthétiques à générer.",
+        )
+        parser.add_argument(
+            "-r",
+            "--repeat",
+            type=int,
+            dest="repeat",
+            default=5,
+            help="Nombre de répétitions de chaque requête.",
+        )
+        parser.add_argument(
+            "-q", "--query", action="append", dest="queries", help="Termes à chercher."
+        )
+
+    def generate_events(self, n):
+        subtype = EventSubtype.objects.create(
+            label="benchmark", type=EventSubtype.TYPE_PUBLIC_ACTION
+        )
+        now = timezone.now()
+        batch_size = 5000
+
+        for i in range(0, n, batch_size):
+            Event.objects.bulk_create(
+                [
+                    Event(
+                        name=fake.sentence(nb_words=5),
+                        subtype=subtype,
+                        start_time=now + timedelta(days=random.randint(-365, 365)),
+                        end_time=now + timedelta(days=random.randint(366, 400)),
+                        location_name=fake.company(),
+                        location_city=fake.city(),
+                        location_zip=fake.postcode(),
+                        description=fake.paragraph(nb_sentences=8),
+                    )
+                    for _ in range(min(batch_size, n - i))
+                ]
+            )
+
+    def time_query(self, qs, repeat):
+        return min(timeit.repeat(lambda: list(qs.all()[:20]), number=1, repeat=repeat))
+
+    def handle(self, *args, events, repeat, queries, **options):
+        queries = queries or [fake.word(), fake.city(), fake.word()[:3]]
+
+        try:
+            with transaction.atomic():
+                self.stdout.write(f"Génération de {events} événements...")
+                self.generate_events(events)
+
+                for query in queries:
+                    before = self.time_query(
+                        on_the_fly_search(Event.objects.all(), query), repeat
+                    )
+                    after = self.time_query(Event.objects.search(query), repeat)
+                    self.stdout.write(
+                        f"« {query} » : {before * 1000:.1f} ms (à la volée) / "
+                        f"{after * 1000:.1f} ms (colonne indexée), x{before / after:.1f}"
+                    )
+
+                raise Rollback()
+        except Rollback:
+            pass
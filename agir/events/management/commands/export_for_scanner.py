@@ -2,9 +2,11 @@ import csv
 import sys
 
 from django.core.management import BaseCommand
+from django.db.models import Prefetch
 
-from agir.events.models import RSVP
+from agir.events.models import RSVP, IdentifiedGuest
 from agir.lib.display import display_price
+from agir.lib.export import iterate_in_chunks
 from agir.lib.management_utils import event_argument
 
 
@@ -32,7 +34,21 @@ class Command(BaseCommand):
             ]
         )
 
-        for i, rsvp in enumerate(event.rsvps.order_by("created")):
+        rsvps = (
+            event.rsvps.select_related("person", "form_submission")
+            .prefetch_related(
+                "person__emails",
+                Prefetch(
+                    "identified_guests",
+                    queryset=IdentifiedGuest.objects.select_related(
+                        "submission"
+                    ).order_by("id"),
+                ),
+            )
+            .order_by("created", "id")
+        )
+
+        for rsvp in iterate_in_chunks(rsvps):
             writer.writerow(
                 [
                     "R" + str(rsvp.pk),
@@ -46,7 +62,7 @@ class Command(BaseCommand):
                     "completed" if rsvp.status == RSVP.STATUS_CONFIRMED else "on-hold",
                 ]
             )
-            for j, guest in enumerate(rsvp.identified_guests.order_by("id")):
+            for guest in rsvp.identified_guests.all():
                 writer.writerow(
                     [
                         "G" + str(rsvp.pk) + "g" + str(guest.pk),
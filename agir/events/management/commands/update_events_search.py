@@ -0,0 +1,48 @@
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from tqdm import tqdm
+
+from agir.events.models import Event
+
+UPDATE_SEARCH_QUERY = """
+UPDATE events_event SET search = get_events_tsvector(events_event)
+WHERE id = ANY(%s::uuid[]);
+"""
+
+
+class Command(BaseCommand):
+    help = "Remplit la colonne de recherche des événements (par lots)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-a",
+            "--all",
+            action="store_true",
+            dest="update_all",
+            default=False,
+            help="Recalcule la colonne pour tous les événements, et pas seulement ceux où elle est vide.",
+        )
+        parser.add_argument(
+            "-b",
+            "--batch-size",
+            type=int,
+            dest="batch_size",
+            default=2000,
+            help="Nombre d'événements mis à jour par transaction.",
+        )
+
+    def handle(self, *args, update_all, batch_size, **options):
+        qs = Event.objects.all()
+        if not update_all:
+            qs = qs.filter(search__isnull=True)
+
+        ids = list(qs.order_by("id").values_list("id", flat=True))
+
+        with tqdm(total=len(ids), disable=options["verbosity"] == 0) as progress:
+            for i in range(0, len(ids), batch_size):
+                batch = [str(id) for id in ids[i : i + batch_size]]
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(UPDATE_SEARCH_QUERY, [batch])
+                progress.update(len(batch))
+
+        self.stdout.write(f"{len(ids)} événements mis à jour.")
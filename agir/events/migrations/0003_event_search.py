@@ -0,0 +1,107 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+ADD_SEARCH_TRIGGER = """
+-- noinspection SqlResolve
+CREATE FUNCTION get_events_tsvector(event events_event) RETURNS tsvector AS $$
+BEGIN
+  RETURN
+    setweight(to_tsvector('french_unaccented', COALESCE(event.name, '')), 'A')
+    || setweight(to_tsvector('french_unaccented', COALESCE(event.location_name, '')), 'B')
+    || setweight(to_tsvector('french_unaccented', COALESCE(event.location_city, '')), 'B')
+    || setweight(to_tsvector('french_unaccented', COALESCE(event.location_zip, '')), 'B')
+    || setweight(to_tsvector('french_unaccented', COALESCE(event.description, '')), 'C')
+    || setweight(to_tsvector('french_unaccented', COALESCE(event.report_content, '')), 'C');
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION process_update_event() RETURNS TRIGGER AS $$
+BEGIN
+    --
+    -- Trigger function to keep the search field of the event up to date
+    -- The search field is only recomputed when one of the indexed fields changed,
+    -- or when it has not been initialized yet.
+    --
+    IF (tg_op = 'INSERT' OR NEW.search IS NULL
+        OR NEW.name IS DISTINCT FROM OLD.name
+        OR NEW.location_name IS DISTINCT FROM OLD.location_name
+        OR NEW.location_city IS DISTINCT FROM OLD.location_city
+        OR NEW.location_zip IS DISTINCT FROM OLD.location_zip
+        OR NEW.description IS DISTINCT FROM OLD.description
+        OR NEW.report_content IS DISTINCT FROM OLD.report_content) THEN
+        NEW.search := get_events_tsvector(NEW);
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_event_search_field_when_modified
+BEFORE INSERT OR UPDATE ON events_event
+  FOR EACH ROW EXECUTE PROCEDURE process_update_event();
+"""
+
+REMOVE_SEARCH_TRIGGER = """
+-- noinspection SqlResolve
+DROP TRIGGER update_event_search_field_when_modified ON events_event;
+DROP FUNCTION process_update_event();
+DROP FUNCTION get_events_tsvector(events_event);
+"""
+
+# la colonne est remplie pour les événements existants avant que l'index sur expression,
+# qu'elle remplace pour la recherche, ne soit supprimé
+FILL_SEARCH_FIELD = """
+-- noinspection SqlResolve
+UPDATE events_event SET search = get_events_tsvector(events_event) WHERE search IS NULL;
+"""
+
+# l'index sur expression est remplacé par l'index GIN sur la colonne search
+DROP_EXPRESSION_INDEX = """
+-- noinspection SqlResolve
+DROP INDEX IF EXISTS events_event_search;
+"""
+
+CREATE_EXPRESSION_INDEX = """
+-- noinspection SqlResolve
+CREATE INDEX events_event_search ON events_event USING GIN ((
+setweight(to_tsvector('french_unaccented', COALESCE("name", '')), 'A')
+|| setweight(to_tsvector('french_unaccented', COALESCE("location_name", '')), 'B')
+|| setweight(to_tsvector('french_unaccented', COALESCE("location_city", '')), 'B')
+|| setweight(to_tsvector('french_unaccented', COALESCE("location_zip", '')), 'B')
+|| setweight(to_tsvector('french_unaccented', COALESCE("description", '')), 'C')
+|| setweight(to_tsvector('french_unaccented', COALESCE("report_content", '')), 'C')
+));
+"""
+
+
+class Migration(migrations.Migration):
+    # chaque opération est validée séparément : le remplissage de la colonne ne prend
+    # ainsi que des verrous de ligne, et non le verrou exclusif sur la table posé par
+    # l'ajout de la colonne
+    atomic = False
+
+    dependencies = [
+        ("events", "0002_objets_initiaux_et_recherche"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="search",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True, verbose_name="Données de recherche"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search"], name="events_search_index"
+            ),
+        ),
+        migrations.RunSQL(sql=ADD_SEARCH_TRIGGER, reverse_sql=REMOVE_SEARCH_TRIGGER),
+        migrations.RunSQL(sql=FILL_SEARCH_FIELD, reverse_sql=migrations.RunSQL.noop),
+        migrations.RunSQL(
+            sql=DROP_EXPRESSION_INDEX, reverse_sql=CREATE_EXPRESSION_INDEX
+        ),
+    ]
@@ -0,0 +1,207 @@
+from django.db import migrations, models
+
+# La règle de décompte est celle de l'ancienne propriété Event.participants : chaque
+# inscription compte pour une personne, à laquelle s'ajoutent ses invités, comptés avec
+# le champ guests pour les événements sans formulaire d'inscription, et avec les invités
+# identifiés (un par ligne) pour les événements avec formulaire.
+ADD_PARTICIPANTS_TRIGGERS = """
+-- noinspection SqlResolve
+CREATE FUNCTION event_participants_increments(
+  target_event_id events_event.id%TYPE, guests integer, status events_rsvp.status%TYPE,
+  is_identified_guest boolean, OUT participants integer, OUT confirmed integer
+) AS $$
+DECLARE
+  with_identified_guests boolean;
+BEGIN
+  SELECT subscription_form_id IS NOT NULL INTO with_identified_guests
+  FROM events_event WHERE id = target_event_id;
+
+  IF is_identified_guest THEN
+    participants := CASE WHEN with_identified_guests THEN 1 ELSE 0 END;
+  ELSE
+    participants := 1 + CASE WHEN with_identified_guests THEN 0 ELSE guests END;
+  END IF;
+  confirmed := CASE WHEN status = 'CO' THEN participants ELSE 0 END;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE FUNCTION count_event_participants(
+  target_event_id events_event.id%TYPE, with_identified_guests boolean,
+  OUT participants integer, OUT confirmed integer
+) AS $$
+BEGIN
+  SELECT
+    COALESCE(SUM(1 + CASE WHEN with_identified_guests THEN 0 ELSE r.guests END), 0),
+    COALESCE(SUM(1 + CASE WHEN with_identified_guests THEN 0 ELSE r.guests END)
+      FILTER (WHERE r.status = 'CO'), 0)
+  INTO participants, confirmed
+  FROM events_rsvp r WHERE r.event_id = target_event_id;
+
+  IF with_identified_guests THEN
+    participants := participants + (
+      SELECT COUNT(*) FROM events_rsvp_guests_form_submissions g
+      JOIN events_rsvp r ON r.id = g.rsvp_id WHERE r.event_id = target_event_id
+    );
+    confirmed := confirmed + (
+      SELECT COUNT(*) FROM events_rsvp_guests_form_submissions g
+      JOIN events_rsvp r ON r.id = g.rsvp_id
+      WHERE r.event_id = target_event_id AND g.status = 'CO'
+    );
+  END IF;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE FUNCTION add_event_participants(
+  target_event_id events_event.id%TYPE, participants integer, confirmed integer
+) RETURNS void AS $$
+BEGIN
+  IF (participants <> 0 OR confirmed <> 0) THEN
+    UPDATE events_event
+    SET participants_count = GREATEST(participants_count + participants, 0),
+        confirmed_participants_count = GREATEST(confirmed_participants_count + confirmed, 0)
+    WHERE id = target_event_id;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION process_update_rsvp() RETURNS TRIGGER AS $$
+DECLARE
+  increments RECORD;
+BEGIN
+  --
+  -- Trigger function to keep the participants counters of the event up to date
+  --
+  IF (tg_op = 'UPDATE' OR tg_op = 'DELETE') THEN
+    SELECT * INTO increments
+    FROM event_participants_increments(OLD.event_id, OLD.guests, OLD.status, false);
+    PERFORM add_event_participants(OLD.event_id, -increments.participants, -increments.confirmed);
+  END IF;
+
+  IF (tg_op = 'UPDATE' OR tg_op = 'INSERT') THEN
+    SELECT * INTO increments
+    FROM event_participants_increments(NEW.event_id, NEW.guests, NEW.status, false);
+    PERFORM add_event_participants(NEW.event_id, increments.participants, increments.confirmed);
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_event_participants_when_rsvp_modified
+AFTER INSERT OR DELETE OR UPDATE OF event_id, guests, status ON events_rsvp
+  FOR EACH ROW EXECUTE PROCEDURE process_update_rsvp();
+
+CREATE FUNCTION process_update_identified_guest() RETURNS TRIGGER AS $$
+DECLARE
+  target_event_id events_event.id%TYPE;
+  increments RECORD;
+BEGIN
+  --
+  -- Trigger function to keep the participants counters of the event up to date
+  --
+  IF (tg_op = 'UPDATE' OR tg_op = 'DELETE') THEN
+    SELECT event_id INTO target_event_id FROM events_rsvp WHERE id = OLD.rsvp_id;
+    SELECT * INTO increments
+    FROM event_participants_increments(target_event_id, 0, OLD.status, true);
+    PERFORM add_event_participants(target_event_id, -increments.participants, -increments.confirmed);
+  END IF;
+
+  IF (tg_op = 'UPDATE' OR tg_op = 'INSERT') THEN
+    SELECT event_id INTO target_event_id FROM events_rsvp WHERE id = NEW.rsvp_id;
+    SELECT * INTO increments
+    FROM event_participants_increments(target_event_id, 0, NEW.status, true);
+    PERFORM add_event_participants(target_event_id, increments.participants, increments.confirmed);
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER update_event_participants_when_guest_modified
+AFTER INSERT OR DELETE OR UPDATE OF rsvp_id, status ON events_rsvp_guests_form_submissions
+  FOR EACH ROW EXECUTE PROCEDURE process_update_identified_guest();
+
+UPDATE events_event e
+SET (participants_count, confirmed_participants_count) = (
+  SELECT c.participants, c.confirmed
+  FROM count_event_participants(e.id, e.subscription_form_id IS NOT NULL) c
+)
+WHERE EXISTS (SELECT 1 FROM events_rsvp r WHERE r.event_id = e.id);
+
+CREATE FUNCTION protect_event_participants() RETURNS TRIGGER AS $$
+DECLARE
+  counts RECORD;
+BEGIN
+  --
+  -- Trigger function preventing direct modifications of the participants counters :
+  -- only the updates made by the triggers above (nested triggers) are kept, and the
+  -- counters are recomputed when the counting rule of the event changes.
+  --
+  IF (tg_op = 'INSERT') THEN
+    NEW.participants_count := 0;
+    NEW.confirmed_participants_count := 0;
+    RETURN NEW;
+  END IF;
+
+  IF (pg_trigger_depth() = 1) THEN
+    NEW.participants_count := OLD.participants_count;
+    NEW.confirmed_participants_count := OLD.confirmed_participants_count;
+  END IF;
+
+  IF ((NEW.subscription_form_id IS NULL) <> (OLD.subscription_form_id IS NULL)) THEN
+    SELECT * INTO counts
+    FROM count_event_participants(NEW.id, NEW.subscription_form_id IS NOT NULL);
+    NEW.participants_count := counts.participants;
+    NEW.confirmed_participants_count := counts.confirmed;
+  END IF;
+
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER protect_event_participants_counters
+BEFORE INSERT OR UPDATE ON events_event
+  FOR EACH ROW EXECUTE PROCEDURE protect_event_participants();
+"""
+
+REMOVE_PARTICIPANTS_TRIGGERS = """
+-- noinspection SqlResolve
+DROP TRIGGER protect_event_participants_counters ON events_event;
+DROP FUNCTION protect_event_participants();
+DROP TRIGGER update_event_participants_when_guest_modified ON events_rsvp_guests_form_submissions;
+DROP FUNCTION process_update_identified_guest();
+DROP TRIGGER update_event_participants_when_rsvp_modified ON events_rsvp;
+DROP FUNCTION process_update_rsvp();
+DROP FUNCTION add_event_participants(events_event.id%TYPE, integer, integer);
+DROP FUNCTION count_event_participants(events_event.id%TYPE, boolean);
+DROP FUNCTION event_participants_increments(events_event.id%TYPE, integer, events_rsvp.status%TYPE, boolean);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0003_event_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="participants_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Nombre de participants"
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="confirmed_participants_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                verbose_name="Nombre de participants confirmés",
+            ),
+        ),
+        migrations.RunSQL(
+            sql=ADD_PARTICIPANTS_TRIGGERS, reverse_sql=REMOVE_PARTICIPANTS_TRIGGERS
+        ),
+    ]
@@ -5,12 +5,11 @@ import random
 import re
 from django.conf import settings
 from django.db.models import JSONField, Prefetch
-from django.contrib.postgres.search import SearchVector, SearchRank
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchRank, SearchVectorField
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 from django.db import models, transaction
-from django.db.models import Case, Sum, Count, When, CharField, F, Q
-from django.db.models.functions import Coalesce
 from django.template.defaultfilters import floatformat
 from django.utils import formats, timezone
 from django.utils.http import urlencode
@@ -37,7 +36,8 @@ from agir.lib.models import (
     banner_path,
 )
 from agir.lib.search import PrefixSearchQuery
-from agir.lib.utils import front_url, resize_and_autorotate
+from agir.lib.images import render_variations_async
+from agir.lib.utils import front_url
 
 __all__ = [
     "Event",
@@ -102,64 +102,12 @@ class EventQuerySet(models.QuerySet):
     def with_serializer_prefetch(self, person):
         return self.with_person_rsvps(person).with_person_organizer_configs(person)
 
-    def with_participants(self):
-        confirmed_guests = Q(rsvps__identified_guests__status=RSVP.STATUS_CONFIRMED)
-        confirmed_rsvps = Q(rsvps__status=RSVP.STATUS_CONFIRMED)
-
-        return self.annotate(
-            all_attendee_count=Case(
-                When(
-                    subscription_form=None,
-                    then=Coalesce(Sum("rsvps__guests") + Count("rsvps"), 0),
-                ),
-                default=Coalesce(Count("rsvps__identified_guests") + Count("rsvps"), 0),
-                output_field=CharField(),
-            )
-        ).annotate(
-            confirmed_attendee_count=Case(
-                When(payment_parameters=None, then=F("all_attendee_count")),
-                When(
-                    subscription_form=None,
-                    then=Coalesce(
-                        Sum("rsvps__guests", filter=confirmed_rsvps)
-                        + Count("rsvps", filter=confirmed_rsvps),
-                        0,
-                    ),
-                ),
-                default=Coalesce(
-                    Count("rsvps__identified_guests", filter=confirmed_guests)
-                    + Count("rsvps", filter=confirmed_rsvps),
-                    0,
-                ),
-                output_field=CharField(),
-            )
-        )
-
     def search(self, query):
-        vector = (
-            SearchVector(models.F("name"), config="french_unaccented", weight="A")
-            + SearchVector(
-                models.F("location_name"), config="french_unaccented", weight="B"
-            )
-            + SearchVector(
-                models.F("location_city"), config="french_unaccented", weight="B"
-            )
-            + SearchVector(
-                models.F("location_zip"), config="french_unaccented", weight="B"
-            )
-            + SearchVector(
-                models.F("description"), config="french_unaccented", weight="C"
-            )
-            + SearchVector(
-                models.F("report_content"), config="french_unaccented", weight="C"
-            )
-        )
         query = PrefixSearchQuery(query, config="french_unaccented")
 
         return (
-            self.annotate(search=vector)
-            .filter(search=query)
-            .annotate(rank=SearchRank(vector, query))
+            self.filter(search=query)
+            .annotate(rank=SearchRank(models.F("search"), query))
             .order_by("-rank")
         )
 
@@ -286,6 +234,14 @@ class Event(
     max_participants = models.IntegerField(
         "Nombre maximum de participants", blank=True, null=True
     )
+    # ces deux compteurs sont maintenus par des triggers PostgreSQL (voir la migration
+    # 0004_participants_count) et ne doivent jamais être modifiés directement
+    participants_count = models.PositiveIntegerField(
+        "Nombre de participants", default=0, editable=False
+    )
+    confirmed_participants_count = models.PositiveIntegerField(
+        "Nombre de participants confirmés", default=0, editable=False
+    )
     allow_guests = models.BooleanField(
         "Autoriser les participant⋅e⋅s à inscrire des invité⋅e⋅s", default=False
     )
@@ -308,6 +264,7 @@ class Event(
         verbose_name=_("image de couverture"),
         blank=True,
         variations={"thumbnail": (400, 250), "banner": (1200, 400)},
+        render_variations=render_variations_async,
         upload_to=report_image_path,
         help_text=_(
             "Cette image apparaîtra en tête de votre compte-rendu, et dans les partages que vous ferez du"
@@ -377,6 +334,8 @@ class Event(
         choices=FOR_USERS_CHOICES,
     )
 
+    search = SearchVectorField("Données de recherche", editable=False, null=True)
+
     class Meta:
         verbose_name = _("événement")
         verbose_name_plural = _("événements")
@@ -393,6 +352,7 @@ class Event(
                 fields=["start_time", "end_time"], name="events_datetime_index"
             ),
             models.Index(fields=["end_time"], name="events_end_time_index"),
+            GinIndex(fields=["search"], name="events_search_index"),
         )
 
     def __str__(self):
@@ -415,24 +375,15 @@ class Event(
 
     @property
     def participants(self):
-        try:
-            return self.all_attendee_count
-        except AttributeError:
-            if self.subscription_form:
-                return (
-                    self.rsvps.annotate(
-                        identified_guests_count=Count("identified_guests")
-                    ).aggregate(participants=Sum(F("identified_guests_count") + 1))[
-                        "participants"
-                    ]
-                    or 0
-                )
-            return (
-                self.rsvps.aggregate(participants=Sum(models.F("guests") + 1))[
-                    "participants"
-                ]
-                or 0
-            )
+        # les compteurs sont tenus à jour par la base de données à chaque modification
+        # des inscriptions : après une inscription, l'instance en a une valeur périmée
+        # tant que `refresh_participants` n'a pas été appelée
+        return self.participants_count
+
+    def refresh_participants(self):
+        self.refresh_from_db(
+            fields=["participants_count", "confirmed_participants_count"]
+        )
 
     @property
     def type(self):
@@ -899,7 +850,7 @@ class EventImage(ExportModelOperationsMixin("event_image"), TimeStampedModel):
     image = StdImageField(
         _("Fichier"),
         variations={"thumbnail": (200, 200, True), "admin_thumbnail": (100, 100, True)},
-        render_variations=resize_and_autorotate,
+        render_variations=render_variations_async,
         upload_to=event_image_path,
         null=False,
         blank=False,
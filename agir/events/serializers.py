@@ -1,5 +1,6 @@
 from datetime import timedelta
 
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 
 from agir.front.serializer_utils import MediaURLField, RoutesField
@@ -17,12 +18,13 @@ from .models import OrganizerConfig, RSVP
 from .tasks import (
     send_event_creation_notification,
     send_secretariat_notification,
-    geocode_event,
 )
 from ..groups.models import Membership, SupportGroup
 from ..groups.serializers import SupportGroupDetailSerializer
 from ..groups.serializers import SupportGroupSerializer
 from ..groups.tasks import notify_new_group_event
+from ..lib.images import prefetch_pending_images, variation_url
+from ..lib.tasks import schedule_geocoding
 from ..lib.utils import admin_url
 
 
@@ -79,13 +81,15 @@ class EventOptionsSerializer(serializers.Serializer):
 
 
 class EventListSerializer(serializers.ListSerializer):
-    def get_groups(self, obj):
-        return SupportGroupSerializer(
-            obj.organizers_groups.distinct(),
-            context=self.context,
-            many=True,
-            fields=["name", "isMember"],
-        ).data
+    """Sérialise une liste d'événements en préchargeant les groupes organisateurs de
+    toute la page
+    """
+
+    def to_representation(self, data):
+        events = list(data.all() if hasattr(data, "all") else data)
+        if "groups" in self.child.fields:
+            self.child.preload_groups(events)
+        return [self.child.to_representation(event) for event in events]
 
 
 class EventSerializer(FlexibleFieldsMixin, serializers.Serializer):
@@ -94,7 +98,7 @@ class EventSerializer(FlexibleFieldsMixin, serializers.Serializer):
         "name",
         "startTime",
         "endTime",
-        # "participantCount",
+        "participantCount",
         "illustration",
         "schedule",
         "location",
@@ -120,7 +124,7 @@ class EventSerializer(FlexibleFieldsMixin, serializers.Serializer):
 
     isOrganizer = serializers.SerializerMethodField()
     rsvp = serializers.SerializerMethodField()
-    # participantCount = serializers.IntegerField(source="participants")
+    participantCount = serializers.IntegerField(source="participants_count")
 
     options = EventOptionsSerializer(source="*")
 
@@ -140,6 +144,20 @@ class EventSerializer(FlexibleFieldsMixin, serializers.Serializer):
 
     subtype = EventSubtypeSerializer()
 
+    GROUP_FIELDS = [
+        "id",
+        "name",
+        "description",
+        "eventCount",
+        "membersCount",
+        "isMember",
+        "isManager",
+        "typeLabel",
+        "labels",
+        "routes",
+        "is2022",
+    ]
+
     def to_representation(self, instance):
         user = self.context["request"].user
 
@@ -186,13 +204,15 @@ class EventSerializer(FlexibleFieldsMixin, serializers.Serializer):
         return None
 
     def get_compteRenduPhotos(self, obj):
+        images = obj.images.all()
+        prefetch_pending_images([instance.image for instance in images])
         return [
             {
                 "image": instance.image.url,
-                "thumbnail": instance.image.thumbnail.url,
+                "thumbnail": variation_url(instance.image, "thumbnail"),
                 "legend": instance.legend,
             }
-            for instance in obj.images.all()
+            for instance in images
         ]
 
     def get_routes(self, obj):
@@ -216,24 +236,40 @@ class EventSerializer(FlexibleFieldsMixin, serializers.Serializer):
     def get_is2022(self, obj):
         return obj.is_2022
 
+    def get_groups_serializer(self):
+        if not hasattr(self, "_groups_serializer"):
+            self._groups_serializer = SupportGroupSerializer(
+                context=self.context, many=True, fields=self.GROUP_FIELDS
+            )
+        return self._groups_serializer
+
+    def preload_groups(self, events):
+        """Charge les groupes organisateurs de tous les événements, et les données
+        nécessaires à leur sérialisation, en un nombre constant de requêtes
+        """
+        prefetch_related_objects(
+            [e for e in events if not hasattr(e, "_pf_organizers_groups")],
+            Prefetch(
+                "organizers_groups",
+                queryset=SupportGroup.objects.distinct(),
+                to_attr="_pf_organizers_groups",
+            ),
+        )
+        self.get_groups_serializer().child.preload(
+            [g for e in events for g in e._pf_organizers_groups]
+        )
+
     def get_groups(self, obj):
+        if hasattr(obj, "_pf_organizers_groups"):
+            return self.get_groups_serializer().to_representation(
+                obj._pf_organizers_groups
+            )
+
         return SupportGroupSerializer(
             obj.organizers_groups.distinct(),
             context=self.context,
             many=True,
-            fields=[
-                "id",
-                "name",
-                "description",
-                "eventCount",
-                "membersCount",
-                "isMember",
-                "isManager",
-                "typeLabel",
-                "labels",
-                "routes",
-                "is2022",
-            ],
+            fields=self.GROUP_FIELDS,
         ).data
 
     class Meta:
@@ -368,7 +404,7 @@ class CreateEventSerializer(serializers.Serializer):
         organizer_config = OrganizerConfig.objects.filter(event=event).first()
         # Send the confirmation notification and geolocate the event
         send_event_creation_notification.delay(organizer_config.pk)
-        geocode_event.delay(event.pk)
+        schedule_geocoding(event)
         if event.visibility == Event.VISIBILITY_ORGANIZER:
             send_secretariat_notification.delay(
                 organizer_config.event.pk, organizer_config.person.pk, complete=False,
@@ -503,9 +503,13 @@ def geocode_event(event_pk):
         event.coordinates_type is not None
         and event.coordinates_type >= Event.COORDINATES_NO_POSITION
     ):
-        Activity.objects.bulk_create(
-            Activity(
-                type=Activity.TYPE_WAITING_LOCATION_EVENT, recipient=r, event=event
-            )
-            for r in event.organizers.all()
-        )
+        create_waiting_location_activities([event])
+
+
+def create_waiting_location_activities(events):
+    """Prévient les organisateurs des événements qui n'ont pas pu être localisés"""
+    Activity.objects.bulk_create(
+        Activity(type=Activity.TYPE_WAITING_LOCATION_EVENT, recipient=r, event=event)
+        for event in events
+        for r in event.organizers.all()
+    )
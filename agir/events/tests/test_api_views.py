@@ -113,14 +113,14 @@ class CreateEventAPITestCase(APITestCase):
         self.assertIn("id", res.data)
         send_event_creation_notification.assert_called_once()
 
-    @patch("agir.events.tasks.geocode_event.delay")
-    def test_geocoding_task_is_created_upon_posting_valid_data(self, geocode_event):
-        geocode_event.assert_not_called()
+    @patch("agir.events.serializers.schedule_geocoding")
+    def test_geocoding_is_scheduled_upon_posting_valid_data(self, schedule_geocoding):
+        schedule_geocoding.assert_not_called()
         self.client.force_login(self.person.role)
         res = self.client.post("/api/evenements/creer/", data=self.valid_data)
         self.assertEqual(res.status_code, 201)
         self.assertIn("id", res.data)
-        geocode_event.assert_called_once()
+        schedule_geocoding.assert_called_once()
 
     @patch("agir.groups.tasks.notify_new_group_event.delay")
     def test_notify_new_group_event_task_is_created_upon_posting_valid_data_with_organizer_group(
@@ -4,6 +4,7 @@ from django.utils import timezone
 
 from agir.people.models import Person
 
+from ..actions.rsvps import _ensure_can_rsvp, RSVPException
 from ..models import Event, Calendar, RSVP
 
 
@@ -31,6 +32,24 @@ class BasicEventTestCase(TestCase):
             with self.assertRaises(IntegrityError):
                 Event.objects.create(name="Event test 2", end_time=self.end_time)
 
+    def test_search_field_is_kept_up_to_date(self):
+        event = Event.objects.create(
+            name="Réunion publique",
+            location_city="Montpellier",
+            start_time=self.start_time,
+            end_time=self.end_time,
+        )
+
+        self.assertIn(event, Event.objects.search("reunion"))
+        self.assertIn(event, Event.objects.search("montpel"))
+        self.assertNotIn(event, Event.objects.search("porte-à-porte"))
+
+        event.name = "Porte-à-porte"
+        event.save()
+
+        self.assertIn(event, Event.objects.search("porte"))
+        self.assertNotIn(event, Event.objects.search("reunion"))
+
 
 class RSVPTestCase(TestCase):
     @classmethod
@@ -68,6 +87,7 @@ class RSVPTestCase(TestCase):
     def test_participants_count(self):
         RSVP.objects.create(person=self.person, event=self.event, guests=10)
 
+        self.event.refresh_participants()
         self.assertEqual(self.event.participants, 11)
 
         RSVP.objects.create(
@@ -75,4 +95,50 @@ class RSVPTestCase(TestCase):
             event=self.event,
         )
 
+        self.event.refresh_participants()
         self.assertEqual(self.event.participants, 12)
+
+    def test_confirmed_participants_count(self):
+        rsvp = RSVP.objects.create(
+            person=self.person,
+            event=self.event,
+            guests=2,
+            status=RSVP.STATUS_AWAITING_PAYMENT,
+        )
+
+        self.event.refresh_participants()
+        self.assertEqual(self.event.participants, 3)
+        self.assertEqual(self.event.confirmed_participants_count, 0)
+
+        rsvp.status = RSVP.STATUS_CONFIRMED
+        rsvp.save()
+
+        self.event.refresh_participants()
+        self.assertEqual(self.event.participants, 3)
+        self.assertEqual(self.event.confirmed_participants_count, 3)
+
+        rsvp.delete()
+
+        self.event.refresh_participants()
+        self.assertEqual(self.event.participants, 0)
+        self.assertEqual(self.event.confirmed_participants_count, 0)
+
+    def test_participants_count_cannot_be_overwritten(self):
+        RSVP.objects.create(person=self.person, event=self.event)
+
+        self.event.participants_count = 100
+        self.event.save()
+
+        self.event.refresh_participants()
+        self.assertEqual(self.event.participants, 1)
+
+    def test_cannot_reserve_more_than_max_participants(self):
+        self.event.max_participants = 2
+        self.event.save()
+        RSVP.objects.create(person=self.person, event=self.event)
+
+        with transaction.atomic():
+            _ensure_can_rsvp(self.event, 1)
+
+        with transaction.atomic(), self.assertRaises(RSVPException):
+            _ensure_can_rsvp(self.event, 2)
@@ -28,7 +28,6 @@ from agir.payments.actions.payments import complete_payment
 from agir.payments.models import Payment
 from agir.people.models import Person, PersonForm, PersonFormSubmission, PersonTag
 
-from ..forms import EventForm
 from ..models import (
     Event,
     Calendar,
@@ -297,7 +296,7 @@ class EventPagesTestCase(TestCase):
             res, self.organized_event.name, status_code=status.HTTP_410_GONE
         )
 
-    @mock.patch.object(EventForm, "geocoding_task")
+    @mock.patch("agir.lib.form_mixins.schedule_geocoding")
     @mock.patch("agir.events.forms.send_event_changed_notification")
     def test_can_modify_organized_event(
         self, patched_send_notification, patched_geocode
@@ -368,10 +367,10 @@ class EventPagesTestCase(TestCase):
             ],
         )
 
-        patched_geocode.delay.assert_called_once()
-        args = patched_geocode.delay.call_args[0]
+        patched_geocode.assert_called_once()
+        args = patched_geocode.call_args[0]
 
-        self.assertEqual(args[0], self.organized_event.pk)
+        self.assertEqual(args[0].pk, self.organized_event.pk)
         self.assertIn(self.group, self.organized_event.organizers_groups.all())
 
     def test_cannot_modify_rsvp_event(self):
@@ -737,6 +736,7 @@ class RSVPTestCase(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual("CO", response.json()["rsvp"])
+        self.simple_event.refresh_participants()
         self.assertEqual(1, self.simple_event.participants)
 
     def test_cannot_rsvp_if_max_participants_reached(self):
@@ -761,6 +761,7 @@ class RSVPTestCase(TestCase):
         self.assertEqual(msgs[0].level, messages.ERROR)
         self.assertIn("complet.", msgs[0].message)
 
+        self.simple_event.refresh_participants()
         self.assertEqual(1, self.simple_event.participants)
 
     @mock.patch("agir.events.actions.rsvps.send_guest_confirmation")
@@ -776,6 +777,7 @@ class RSVPTestCase(TestCase):
         self.assertRedirects(
             response, reverse("view_event", kwargs={"pk": self.simple_event.pk})
         )
+        self.simple_event.refresh_participants()
         self.assertEqual(2, self.simple_event.participants)
 
         msgs = list(messages.get_messages(response.wsgi_request))
@@ -797,6 +799,7 @@ class RSVPTestCase(TestCase):
         self.assertRedirects(
             response, reverse("view_event", kwargs={"pk": self.simple_event.pk})
         )
+        self.simple_event.refresh_participants()
         self.assertEqual(1, self.simple_event.participants)
 
         msgs = list(messages.get_messages(response.wsgi_request))
@@ -817,6 +820,7 @@ class RSVPTestCase(TestCase):
         self.assertRedirects(
             response, reverse("view_event", kwargs={"pk": self.simple_event.pk})
         )
+        self.simple_event.refresh_participants()
         self.assertEqual(1, self.simple_event.participants)
 
         msgs = list(messages.get_messages(response.wsgi_request))
@@ -842,6 +846,7 @@ class RSVPTestCase(TestCase):
         self.person.refresh_from_db()
         self.assertIn(self.person, self.form_event.attendees.all())
         self.assertEqual(self.person.meta["custom-field"], "another custom value")
+        self.form_event.refresh_participants()
         self.assertEqual(2, self.form_event.participants)
 
         rsvp_notification.delay.assert_called_once()
@@ -886,6 +891,7 @@ class RSVPTestCase(TestCase):
         msgs = list(messages.get_messages(response.wsgi_request))
         self.assertEqual(msgs[0].level, messages.SUCCESS)
 
+        self.form_event.refresh_participants()
         self.assertEqual(2, self.form_event.participants)
 
         guest_confirmation.delay.assert_called_once()
@@ -909,6 +915,7 @@ class RSVPTestCase(TestCase):
         msgs = list(messages.get_messages(response.wsgi_request))
         self.assertEqual(msgs[0].level, messages.ERROR)
 
+        self.form_event.refresh_participants()
         self.assertEqual(1, self.form_event.participants)
 
     @mock.patch("django.db.transaction.on_commit")
@@ -1111,6 +1118,7 @@ class RSVPTestCase(TestCase):
         complete_payment(payment)
         event_notification_listener(payment)
 
+        self.form_paying_event.refresh_participants()
         self.assertEqual(2, self.form_paying_event.participants)
 
         on_commit.assert_called_once()
@@ -1197,6 +1205,7 @@ class RSVPTestCase(TestCase):
         self.person.refresh_from_db()
         self.assertIn(self.person, self.form_event.attendees.all())
         self.assertEqual(self.person.meta["custom-field"], "another custom value")
+        self.form_event.refresh_participants()
         self.assertEqual(2, self.form_event.participants)
 
         rsvp_notification.delay.assert_called_once()
@@ -1274,6 +1283,7 @@ class RSVPTestCase(TestCase):
         self.person.refresh_from_db()
         self.assertIn(self.person, self.form_event.attendees.all())
         self.assertEqual(self.person.meta["custom-field"], "another custom value")
+        self.form_event.refresh_participants()
         self.assertEqual(2, self.form_event.participants)
 
         rsvp_notification.delay.assert_called_once()
@@ -1,5 +1,5 @@
 import PropTypes from "prop-types";
-import React, { useContext, useEffect, useMemo } from "react";
+import React, { useContext, useEffect, useMemo, useState } from "react";
 import { StateInspector, useReducer } from "reinspect";
 import { ThemeProvider } from "styled-components";
 
@@ -11,12 +11,14 @@ import createDispatch, {
   setSessionContext,
 } from "@agir/front/globalContext/actions";
 import Toasts from "@agir/front/globalContext/Toast";
-import useSWR from "swr";
+import useSWR, { mutate } from "swr";
 
 import logger from "@agir/lib/utils/logger";
 const log = logger(__filename);
 
 const GlobalContext = React.createContext({});
+// flux d'événements en temps réel, ou null s'il n'est pas ouvert
+const PushContext = React.createContext(null);
 
 const ProdProvider = ({ hasToasts = false, children }) => {
   const [state, dispatch] = useReducer(
@@ -41,12 +43,37 @@ const ProdProvider = ({ hasToasts = false, children }) => {
     log.debug("Update session context", sessionContext);
   }, [doDispatch, sessionContext]);
 
+  const isConnected = !!(sessionContext && sessionContext.user);
+  const pushURL = state.routes && state.routes.push;
+  const [pushSource, setPushSource] = useState(null);
+  useEffect(() => {
+    // flux d'événements en temps réel, uniquement si le serveur le propose : le
+    // contexte de session est alors rechargé lorsqu'une nouvelle activité est reçue,
+    // et les composants peuvent s'abonner aux autres événements avec usePushEvent
+    if (!isConnected || !pushURL || typeof window.EventSource === "undefined")
+      return;
+
+    const source = new window.EventSource(pushURL);
+    const handleActivity = () => mutate("/api/session/");
+    source.addEventListener("activity", handleActivity);
+    setPushSource(source);
+    log.debug("Connected to push events");
+
+    return () => {
+      source.removeEventListener("activity", handleActivity);
+      source.close();
+      setPushSource(null);
+    };
+  }, [isConnected, pushURL]);
+
   return (
     <GlobalContext.Provider value={{ state, dispatch: doDispatch }}>
-      <ThemeProvider theme={style}>
-        {children}
-        {hasToasts ? <Toasts /> : null}
-      </ThemeProvider>
+      <PushContext.Provider value={pushSource}>
+        <ThemeProvider theme={style}>
+          {children}
+          {hasToasts ? <Toasts /> : null}
+        </ThemeProvider>
+      </PushContext.Provider>
     </GlobalContext.Provider>
   );
 };
@@ -99,3 +126,28 @@ export const useDispatch = () => {
   const { dispatch } = useContext(GlobalContext);
   return dispatch;
 };
+
+export const useHasPush = () => !!useContext(PushContext);
+export const usePushEvent = (type, handler) => {
+  const source = useContext(PushContext);
+
+  useEffect(() => {
+    if (!source || !handler) return;
+
+    const handleEvent = (event) => {
+      let data;
+      try {
+        data = JSON.parse(event.data);
+      } catch (e) {
+        log.error("Invalid push event", type, event.data);
+        return;
+      }
+      handler(data);
+    };
+    source.addEventListener(type, handleEvent);
+
+    return () => {
+      source.removeEventListener(type, handleEvent);
+    };
+  }, [source, type, handler]);
+};
@@ -1,5 +1,23 @@
+import random
+
 from locust import TaskSet, task
 
+# emprise approximative de la France métropolitaine, en tuiles de niveau 8
+FRANCE_TILES_Z8 = (124, 132, 84, 93)
+
+SEARCH_TERMS = ["réunion", "porte-à-porte", "marché", "paris", "lyon", "tractage"]
+
+
+def random_tile():
+    x1, x2, y1, y2 = FRANCE_TILES_Z8
+    z = random.randint(6, 12)
+    factor = 2 ** (z - 8)
+    return (
+        z,
+        random.randint(x1 * factor, (x2 + 1) * factor - 1),
+        random.randint(y1 * factor, (y2 + 1) * factor - 1),
+    )
+
 
 class FrontTaskSet(TaskSet):
     @task
@@ -19,3 +37,114 @@ class FrontTaskSet(TaskSet):
         self.client.get("/api/groupes/")
         self.client.get("/api/session/")
         self.client.get("/carte/groupes")
+
+
+class MapTaskSet(TaskSet):
+    @task
+    def interrompre(self):
+        self.interrupt()
+
+    @task(2)
+    def carte_evenements(self):
+        self.client.get("/carte/evenements/")
+        for _ in range(4):
+            z, x, y = random_tile()
+            self.client.get(
+                f"/carte/tuiles_evenements/{z}/{x}/{y}/",
+                name="/carte/tuiles_evenements/[z]/[x]/[y]/",
+            )
+
+    @task(2)
+    def carte_groupes(self):
+        self.client.get("/carte/groupes/")
+        for _ in range(4):
+            z, x, y = random_tile()
+            self.client.get(
+                f"/carte/tuiles_groupes/{z}/{x}/{y}/",
+                name="/carte/tuiles_groupes/[z]/[x]/[y]/",
+            )
+
+    @task
+    def listes(self):
+        self.client.get("/carte/liste_evenements/")
+        self.client.get("/carte/liste_groupes/")
+
+
+class SearchTaskSet(TaskSet):
+    @task
+    def interrompre(self):
+        self.interrupt()
+
+    @task(3)
+    def recherche_evenements(self):
+        self.client.get(
+            "/evenements/liste/",
+            params={"q": random.choice(SEARCH_TERMS)},
+            name="/evenements/liste/?q=[terme]",
+        )
+
+
+class RSVPTaskSet(TaskSet):
+    @task
+    def interrompre(self):
+        self.interrupt()
+
+    @task(3)
+    def inscription(self):
+        with self.client.get(
+            "/api/evenements/suggestions/", catch_response=True
+        ) as res:
+            try:
+                events = res.json()
+            except ValueError:
+                return res.failure("Réponse invalide")
+
+        if not events:
+            return
+
+        event_id = random.choice(events)["id"]
+        self.client.get(
+            f"/api/evenements/{event_id}/", name="/api/evenements/[id]/",
+        )
+        self.client.post(
+            f"/api/evenements/{event_id}/inscription/",
+            headers={"X-CSRFToken": self.user.get_cookie("csrftoken") or ""},
+            name="/api/evenements/[id]/inscription/",
+        )
+
+
+class GroupMessagesTaskSet(TaskSet):
+    @task
+    def interrompre(self):
+        self.interrupt()
+
+    @task(3)
+    def messages(self):
+        with self.client.get("/api/groupes/", catch_response=True) as res:
+            try:
+                groups = res.json()
+            except ValueError:
+                return res.failure("Réponse invalide")
+
+        if not groups:
+            return
+
+        group_id = random.choice(groups)["id"]
+        self.client.get(
+            f"/api/groupes/{group_id}/messages/", name="/api/groupes/[id]/messages/",
+        )
+        self.client.get(
+            f"/api/groupes/{group_id}/evenements/passes/",
+            name="/api/groupes/[id]/evenements/passes/",
+        )
+
+
+class DonationsTaskSet(TaskSet):
+    @task
+    def interrompre(self):
+        self.interrupt()
+
+    @task(2)
+    def dons(self):
+        self.client.get("/dons/")
+        self.client.get("/api/session/")
@@ -1,7 +1,7 @@
 from django.conf import settings
 from rest_framework import serializers
 
-from agir.lib.utils import front_url
+from agir.lib.utils import front_url_with_pk
 
 
 class MediaURLField(serializers.URLField):
@@ -30,7 +30,7 @@ class RoutesField(serializers.SerializerMethodField):
         routes = {
             key: view_name
             if view_name.startswith("http")
-            else front_url(view_name, args=(value.pk,))
+            else front_url_with_pk(view_name, value.pk)
             for key, view_name in self.routes.items()
         }
 
@@ -7,7 +7,10 @@ from django.utils import timezone
 from rest_framework import status
 
 from ..events.models import Event, OrganizerConfig, EventSubtype
+from ..events.serializers import EVENT_ROUTES
 from ..groups.models import SupportGroup, Membership
+from ..groups.serializers import GROUP_ROUTES
+from ..lib.utils import front_url, front_url_with_pk
 from ..people.models import Person, PersonTag
 from ..polls.models import Poll, PollOption, PollChoice
 
@@ -96,6 +99,32 @@ class NBUrlsTestCase(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+class RouteTemplatesTestCase(TestCase):
+    def test_route_templates_give_same_urls_as_reverse(self):
+        event = Event(
+            name="Événement",
+            start_time=timezone.now(),
+            end_time=timezone.now() + timedelta(hours=2),
+        )
+        group = SupportGroup(name="Groupe")
+
+        for obj, routes in [(event, EVENT_ROUTES), (group, GROUP_ROUTES)]:
+            for view_name in routes.values():
+                if view_name.startswith("http"):
+                    continue
+                with self.subTest(view_name=view_name):
+                    self.assertEqual(
+                        front_url_with_pk(view_name, obj.pk),
+                        front_url(view_name, args=(obj.pk,)),
+                    )
+
+    def test_route_templates_with_integer_pk(self):
+        self.assertEqual(
+            front_url_with_pk("api_activity", 42),
+            front_url("api_activity", args=(42,)),
+        )
+
+
 class PollTestCase(TestCase):
     def setUp(self):
         self.person = Person.objects.create_insoumise(
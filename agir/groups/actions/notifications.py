@@ -8,7 +8,9 @@ from agir.groups.tasks import (
     send_joined_notification_email,
     send_alert_capacity_email,
     send_message_notification_email,
+    create_message_notifications,
 )
+from agir.lib.push import EVENT_NEW_COMMENT, EVENT_NEW_MESSAGE, publish_to_group
 
 
 @transaction.atomic()
@@ -69,29 +71,29 @@ def someone_joined_notification(membership, membership_count=1):
     transaction.on_commit(partial(send_joined_notification_email.delay, membership.pk))
 
 
-@transaction.atomic()
 def new_message_notifications(message):
-    recipients = message.supportgroup.members.filter(group_notifications=True)
-    Activity.objects.bulk_create(
-        [
-            Activity(
-                individual=message.author,
-                supportgroup=message.supportgroup,
-                type=Activity.TYPE_NEW_MESSAGE,
-                recipient=r,
-                status=Activity.STATUS_UNDISPLAYED,
-                meta={"message": str(message.pk),},
-            )
-            for r in recipients
-            if r.pk != message.author.pk
-        ]
+    # la création des activités pour chacun des membres est faite de façon asynchrone,
+    # par lots, pour ne pas bloquer la publication du message dans les grands groupes
+    transaction.on_commit(partial(create_message_notifications.delay, message.pk))
+    transaction.on_commit(partial(send_message_notification_email.delay, message.pk))
+    publish_to_group(
+        message.supportgroup_id,
+        EVENT_NEW_MESSAGE,
+        group=message.supportgroup_id,
+        message=message.pk,
     )
 
-    send_message_notification_email.delay(message.pk)
-
 
 @transaction.atomic()
 def new_comment_notifications(comment):
+    publish_to_group(
+        comment.message.supportgroup_id,
+        EVENT_NEW_COMMENT,
+        group=comment.message.supportgroup_id,
+        message=comment.message_id,
+        comment=comment.pk,
+    )
+
     recipients = [comment.message.author] + [
         comment.author for comment in comment.message.comments.all()
     ]
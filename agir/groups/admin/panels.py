@@ -293,7 +293,7 @@ class SupportGroupAdmin(CenterOnFranceMixin, OSMGeoAdmin):
                 (),
             ),
             allocation=RawSQL(
-                'SELECT SUM(amount) FROM "donations_operation" WHERE "group_id" = "groups_supportgroup"."id"',
+                'SELECT "balance" FROM "donations_groupbalance" WHERE "group_id" = "groups_supportgroup"."id"',
                 (),
             ),
         )
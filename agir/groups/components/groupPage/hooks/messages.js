@@ -11,6 +11,8 @@ import * as api from "@agir/groups/groupPage/api";
 
 import {
   useDispatch,
+  useHasPush,
+  usePushEvent,
   useSelector,
 } from "@agir/front/globalContext/GlobalContext";
 
@@ -46,10 +48,23 @@ export const useMessages = (group) => {
     [hasMessages, group]
   );
 
-  const { data, size, setSize } = useSWRInfinite(getMessagesEndpoint, {
+  // les nouveaux messages et commentaires sont signalés par le flux d'événements
+  // en temps réel : il n'est alors plus nécessaire de recharger la liste au focus
+  const hasPush = useHasPush();
+  const { data, size, setSize, mutate } = useSWRInfinite(getMessagesEndpoint, {
     revalidateAll: true,
+    revalidateOnFocus: !hasPush,
   });
 
+  const handlePushEvent = useCallback(
+    (event) => {
+      hasMessages && event.group === group.id && mutate();
+    },
+    [hasMessages, group, mutate]
+  );
+  usePushEvent("new-message", handlePushEvent);
+  usePushEvent("new-comment", handlePushEvent);
+
   const messagesCount = useMemo(
     () =>
       !hasMessages || !Array.isArray(data) || !data[0] ? 0 : data[0].count,
@@ -127,7 +142,18 @@ export const useMessage = (group, messagePk) => {
     [hasMessage, messagePk]
   );
 
-  const { data } = useSWR(getMessageEndpoint);
+  const hasPush = useHasPush();
+  const { data, mutate } = useSWR(getMessageEndpoint, {
+    revalidateOnFocus: !hasPush,
+  });
+
+  const handleNewComment = useCallback(
+    (event) => {
+      hasMessage && event.message === messagePk && mutate();
+    },
+    [hasMessage, messagePk, mutate]
+  );
+  usePushEvent("new-comment", handleNewComment);
 
   useEffect(() => {
     !isLoading &&
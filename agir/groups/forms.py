@@ -23,7 +23,6 @@ from agir.groups.tasks import (
     invite_to_group,
     create_group_creation_confirmation_activity,
     create_accepted_invitation_member_activity,
-    geocode_support_group,
 )
 from agir.groups.actions.transfer import (
     send_membership_transfer_email_notifications,
@@ -54,8 +53,6 @@ __all__ = [
 class SupportGroupForm(
     LocationFormMixin, ContactFormMixin, ImageFormMixin, forms.ModelForm
 ):
-    geocoding_task = geocode_support_group
-
     image_field = "image"
 
     subtypes = forms.ModelMultipleChoiceField(
@@ -330,7 +327,6 @@ class InvitationForm(forms.Form):
 
 
 class GroupGeocodingForm(GeocodingBaseForm):
-    geocoding_task = geocode_support_group
     messages = {
         "use_geocoding": _(
             "La localisation de votre groupe sur la carte va être réinitialisée à partir de son adresse."
@@ -0,0 +1,14 @@
+from prometheus_client import Counter, Histogram
+
+message_notifications_created = Counter(
+    "agir_groups_message_notifications_created",
+    "Notifications de nouveau message créées",
+)
+message_notifications_skipped = Counter(
+    "agir_groups_message_notifications_skipped",
+    "Notifications de nouveau message ignorées car déjà existantes",
+)
+message_notifications_chunk_duration = Histogram(
+    "agir_groups_message_notifications_chunk_duration_seconds",
+    "Durée de traitement d'un lot de destinataires d'un message de groupe",
+)
@@ -1,4 +1,8 @@
+from dataclasses import dataclass
+from typing import Optional
+
 from django.conf import settings
+from django.db.models import Count, prefetch_related_objects
 from django_countries.serializers import CountryFieldMixin
 from rest_framework import serializers
 
@@ -52,7 +56,138 @@ class SupportGroupSubtypeSerializer(serializers.ModelSerializer):
         fields = ("label", "description", "color", "icon", "type")
 
 
-class SupportGroupSerializer(FlexibleFieldsMixin, serializers.Serializer):
+@dataclass
+class PreloadedGroupData:
+    membership: Optional[Membership]
+    members_count: Optional[int]
+    events_count: Optional[int]
+    has_promo_code_tag: Optional[bool]
+
+
+class SupportGroupListSerializer(serializers.ListSerializer):
+    """Sérialise une liste de groupes en préchargeant les données de toute la page
+
+    Le nombre de requêtes ne dépend ainsi pas du nombre de groupes.
+    """
+
+    def to_representation(self, data):
+        groups = list(data.all() if hasattr(data, "all") else data)
+        self.child.preload(groups)
+        return [self.child.to_representation(group) for group in groups]
+
+
+class PreloadedGroupDataMixin:
+    """Précharge en un nombre constant de requêtes les données nécessaires à la
+    sérialisation d'un ensemble de groupes : adhésion de la personne connectée,
+    nombres de membres et d'événements, types et tags
+
+    Seules les données nécessaires aux champs sélectionnés sont chargées.
+    """
+
+    MEMBERS_COUNT_FIELDS = {"membersCount", "isFull", "facts"}
+    EVENTS_COUNT_FIELDS = {"eventCount", "facts"}
+    PROMO_CODE_TAG_FIELDS = {"discountCodes", "routes"}
+    SUBTYPES_FIELDS = {"labels", "routes", "facts"}
+
+    def needs(self, fields):
+        return not fields.isdisjoint(self.fields)
+
+    def get_person(self):
+        user = self.context["request"].user
+        if not user.is_anonymous and user.person:
+            return user.person
+        return None
+
+    def preload(self, groups):
+        if not hasattr(self, "_preloaded"):
+            self._preloaded = {}
+
+        ids = [g.pk for g in groups if g.pk not in self._preloaded]
+        if not ids:
+            return
+
+        person = self.get_person()
+        memberships = (
+            {
+                m.supportgroup_id: m
+                for m in Membership.objects.filter(
+                    person=person, supportgroup_id__in=ids
+                )
+            }
+            if person is not None
+            else {}
+        )
+
+        members_counts = None
+        if self.needs(self.MEMBERS_COUNT_FIELDS):
+            members_counts = dict(
+                Membership.objects.filter(supportgroup_id__in=ids)
+                .order_by()
+                .values("supportgroup_id")
+                .annotate(count=Count("id"))
+                .values_list("supportgroup_id", "count")
+            )
+
+        events_counts = None
+        if self.needs(self.EVENTS_COUNT_FIELDS):
+            from agir.events.models import Event, OrganizerConfig
+
+            events_counts = dict(
+                OrganizerConfig.objects.filter(
+                    as_group_id__in=ids, event__visibility=Event.VISIBILITY_PUBLIC
+                )
+                .order_by()
+                .values("as_group_id")
+                .annotate(count=Count("id"))
+                .values_list("as_group_id", "count")
+            )
+
+        promo_code_groups = None
+        if self.needs(self.PROMO_CODE_TAG_FIELDS):
+            promo_code_groups = set(
+                models.SupportGroup.tags.through.objects.filter(
+                    supportgroup_id__in=ids,
+                    supportgrouptag__label=settings.PROMO_CODE_TAG,
+                ).values_list("supportgroup_id", flat=True)
+            )
+
+        if self.needs(self.SUBTYPES_FIELDS):
+            prefetch_related_objects([g for g in groups if g.pk in ids], "subtypes")
+
+        for pk in ids:
+            self._preloaded[pk] = PreloadedGroupData(
+                membership=memberships.get(pk),
+                members_count=members_counts.get(pk, 0)
+                if members_counts is not None
+                else None,
+                events_count=events_counts.get(pk, 0)
+                if events_counts is not None
+                else None,
+                has_promo_code_tag=pk in promo_code_groups
+                if promo_code_groups is not None
+                else None,
+            )
+
+    def get_preloaded(self, obj):
+        if obj.pk not in getattr(self, "_preloaded", {}):
+            self.preload([obj])
+        return self._preloaded[obj.pk]
+
+    def is_certified(self, obj):
+        return any(
+            s.label in settings.CERTIFIED_GROUP_SUBTYPES for s in obj.subtypes.all()
+        )
+
+    def is_full(self, obj):
+        return (
+            obj.is_2022
+            and self.get_preloaded(obj).members_count >= obj.MEMBERSHIP_LIMIT
+        )
+
+
+class SupportGroupSerializer(
+    PreloadedGroupDataMixin, FlexibleFieldsMixin, serializers.Serializer
+):
     id = serializers.UUIDField()
     name = serializers.CharField()
     description = serializers.CharField(source="html_description")
@@ -61,7 +196,6 @@ class SupportGroupSerializer(FlexibleFieldsMixin, serializers.Serializer):
 
     url = serializers.HyperlinkedIdentityField(view_name="view_group")
 
-    eventCount = serializers.ReadOnlyField(source="events_count")
     membersCount = serializers.SerializerMethodField(source="members_count")
     isMember = serializers.SerializerMethodField()
     isManager = serializers.SerializerMethodField()
@@ -71,19 +205,22 @@ class SupportGroupSerializer(FlexibleFieldsMixin, serializers.Serializer):
     is2022 = serializers.SerializerMethodField()
     isFull = serializers.SerializerMethodField()
 
+    eventCount = serializers.SerializerMethodField()
+
     routes = RoutesField(routes=GROUP_ROUTES)
 
+    class Meta:
+        list_serializer_class = SupportGroupListSerializer
+
     def to_representation(self, instance):
-        user = self.context["request"].user
-        self.membership = None
-        if not user.is_anonymous and user.person:
-            self.membership = Membership.objects.filter(
-                person=user.person, supportgroup=instance
-            ).first()
+        self.membership = self.get_preloaded(instance).membership
         return super().to_representation(instance)
 
+    def get_eventCount(self, obj):
+        return self.get_preloaded(obj).events_count
+
     def get_membersCount(self, obj):
-        return obj.members_count
+        return self.get_preloaded(obj).members_count
 
     def get_isMember(self, obj):
         return self.membership is not None
@@ -106,7 +243,7 @@ class SupportGroupSerializer(FlexibleFieldsMixin, serializers.Serializer):
 
     def get_routes(self, obj):
         additional_routes = {}
-        if obj.is_certified:
+        if self.is_certified(obj):
             additional_routes["fund"] = front_url(
                 "donation_amount", query={"group": obj.pk}
             )
@@ -116,7 +253,7 @@ class SupportGroupSerializer(FlexibleFieldsMixin, serializers.Serializer):
         if (
             self.membership is not None
             and self.membership.membership_type >= Membership.MEMBERSHIP_TYPE_MANAGER
-            and obj.tags.filter(label=settings.PROMO_CODE_TAG).exists()
+            and self.get_preloaded(obj).has_promo_code_tag
         ):
             return [
                 {"code": code, "expirationDate": date}
@@ -128,10 +265,12 @@ class SupportGroupSerializer(FlexibleFieldsMixin, serializers.Serializer):
         return obj.is_2022
 
     def get_isFull(self, obj):
-        return obj.is_full
+        return self.is_full(obj)
 
 
-class SupportGroupDetailSerializer(FlexibleFieldsMixin, serializers.Serializer):
+class SupportGroupDetailSerializer(
+    PreloadedGroupDataMixin, FlexibleFieldsMixin, serializers.Serializer
+):
     id = serializers.UUIDField()
 
     isMember = serializers.SerializerMethodField()
@@ -162,14 +301,12 @@ class SupportGroupDetailSerializer(FlexibleFieldsMixin, serializers.Serializer):
     hasPastEventReports = serializers.SerializerMethodField()
     hasMessages = serializers.SerializerMethodField()
 
+    class Meta:
+        list_serializer_class = SupportGroupListSerializer
+
     def to_representation(self, instance):
-        user = self.context["request"].user
-        self.membership = None
-        self.user = user
-        if not user.is_anonymous and user.person:
-            self.membership = Membership.objects.filter(
-                person=user.person, supportgroup=instance
-            ).first()
+        self.user = self.context["request"].user
+        self.membership = self.get_preloaded(instance).membership
         return super().to_representation(instance)
 
     def get_isMember(self, obj):
@@ -188,7 +325,7 @@ class SupportGroupDetailSerializer(FlexibleFieldsMixin, serializers.Serializer):
         return obj.is_2022
 
     def get_isFull(self, obj):
-        return obj.is_full
+        return self.is_full(obj)
 
     def get_referents(self, obj):
         return PersonSerializer(
@@ -200,10 +337,10 @@ class SupportGroupDetailSerializer(FlexibleFieldsMixin, serializers.Serializer):
 
     def get_facts(self, obj):
         facts = {
-            "memberCount": obj.members_count,
-            "eventCount": obj.events_count,
+            "memberCount": self.get_preloaded(obj).members_count,
+            "eventCount": self.get_preloaded(obj).events_count,
             "creationDate": obj.created,
-            "isCertified": obj.is_certified,
+            "isCertified": self.is_certified(obj),
             # TODO: define what "last activity" means for a group
             "lastActivityDate": None,
         }
@@ -219,7 +356,7 @@ class SupportGroupDetailSerializer(FlexibleFieldsMixin, serializers.Serializer):
 
     def get_routes(self, obj):
         routes = {}
-        if obj.is_certified:
+        if self.is_certified(obj):
             routes["donations"] = front_url("donation_amount", query={"group": obj.pk})
         if self.membership is not None:
             routes["quit"] = front_url("quit_group", kwargs={"pk": obj.pk})
@@ -239,7 +376,7 @@ class SupportGroupDetailSerializer(FlexibleFieldsMixin, serializers.Serializer):
             routes["membershipTransfer"] = front_url(
                 "transfer_group_members", kwargs={"pk": obj.pk}
             )
-            if obj.tags.filter(label=settings.PROMO_CODE_TAG).exists():
+            if self.get_preloaded(obj).has_promo_code_tag:
                 routes["materiel"] = front_url(
                     "manage_group", query={"active": "materiel"}, kwargs={"pk": obj.pk}
                 )
@@ -253,17 +390,15 @@ class SupportGroupDetailSerializer(FlexibleFieldsMixin, serializers.Serializer):
             else:
                 routes["orders"] = "https://noussommespour.fr/boutique/"
 
-            if obj.is_certified:
+            if self.is_certified(obj):
                 routes["financement"] = front_url(
                     "manage_group",
                     query={"active": "financement"},
                     kwargs={"pk": obj.pk},
                 )
-            elif (
-                obj.type in settings.CERTIFIABLE_GROUP_TYPES
-                or obj.subtypes.filter(
-                    label__in=settings.CERTIFIABLE_GROUP_SUBTYPES
-                ).exists()
+            elif obj.type in settings.CERTIFIABLE_GROUP_TYPES or any(
+                s.label in settings.CERTIFIABLE_GROUP_SUBTYPES
+                for s in obj.subtypes.all()
             ):
                 routes["certification"] = front_url(
                     "manage_group",
@@ -284,7 +419,7 @@ class SupportGroupDetailSerializer(FlexibleFieldsMixin, serializers.Serializer):
         if (
             self.membership is not None
             and self.membership.membership_type >= Membership.MEMBERSHIP_TYPE_MANAGER
-            and obj.tags.filter(label=settings.PROMO_CODE_TAG).exists()
+            and self.get_preloaded(obj).has_promo_code_tag
         ):
             return [
                 {"code": code, "expirationDate": date}
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from agir.lib.push import EVENT_SUBSCRIPTIONS, publish_to_person
+from .models import Membership
+
+
+@receiver(post_save, sender=Membership, dispatch_uid="push_membership_created")
+@receiver(post_delete, sender=Membership, dispatch_uid="push_membership_deleted")
+def refresh_push_subscriptions(sender, instance, created=True, raw=False, **kwargs):
+    # les canaux de groupe des connexions ouvertes sont recalculés lorsque la personne
+    # rejoint ou quitte un groupe
+    if created and not raw:
+        publish_to_person(instance.person_id, EVENT_SUBSCRIPTIONS)
@@ -1,7 +1,10 @@
+import logging
+import time
 from collections import OrderedDict
 
 from celery import shared_task
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from django.template.loader import render_to_string
 from django.utils.html import format_html_join, format_html
@@ -16,12 +19,15 @@ from agir.lib.mailing import send_mosaico_email
 from agir.lib.utils import front_url
 from agir.people.actions.subscription import make_subscription_token
 from agir.people.models import Person
+from . import metrics
 from .actions.invitation import make_abusive_invitation_report_link
 from .models import SupportGroup, Membership
 from ..activity.models import Activity
 from ..lib.display import genrer
 from ..msgs.models import SupportGroupMessage
 
+logger = logging.getLogger(__name__)
+
 NOTIFIED_CHANGES = {
     "name": "information",
     "contact_name": "contact",
@@ -401,23 +407,26 @@ def geocode_support_group(supportgroup_pk):
         supportgroup.coordinates_type is not None
         and supportgroup.coordinates_type >= SupportGroup.COORDINATES_NO_POSITION
     ):
-        managers_filter = (
-            Q(membership_type__gte=Membership.MEMBERSHIP_TYPE_MANAGER)
-        ) & Q(notifications_enabled=True)
-        managing_membership = supportgroup.memberships.filter(managers_filter)
-        managing_membership_recipients = [
-            membership.person for membership in managing_membership
+        create_waiting_location_activities([supportgroup])
+
+
+def create_waiting_location_activities(supportgroups):
+    """Prévient les gestionnaires des groupes qui n'ont pas pu être localisés"""
+    managing_memberships = Membership.objects.filter(
+        supportgroup__in=supportgroups,
+        membership_type__gte=Membership.MEMBERSHIP_TYPE_MANAGER,
+        notifications_enabled=True,
+    )
+    Activity.objects.bulk_create(
+        [
+            Activity(
+                type=Activity.TYPE_WAITING_LOCATION_GROUP,
+                recipient_id=membership.person_id,
+                supportgroup_id=membership.supportgroup_id,
+            )
+            for membership in managing_memberships
         ]
-        Activity.objects.bulk_create(
-            [
-                Activity(
-                    type=Activity.TYPE_WAITING_LOCATION_GROUP,
-                    recipient=r,
-                    supportgroup=supportgroup,
-                )
-                for r in managing_membership_recipients
-            ]
-        )
+    )
 
 
 @shared_task
@@ -448,6 +457,80 @@ def create_accepted_invitation_member_activity(new_membership_pk):
     )
 
 
+@shared_task
+def create_message_notifications(message_pk, after=None):
+    """Crée les activités de notification d'un nouveau message pour un lot de membres
+
+    Les membres sont parcourus par ordre d'identifiant : chaque tâche traite au plus
+    `MESSAGE_NOTIFICATIONS_CHUNK_SIZE` membres situés après `after`, puis programme la
+    tâche suivante. La contrainte d'unicité sur (message, destinataire) rend la tâche
+    idempotente : elle peut être relancée sans créer de doublons. Les exécutions
+    concurrentes d'un même lot sont sérialisées par un verrou sur le message.
+    """
+    try:
+        message = SupportGroupMessage.objects.select_related("author").get(
+            pk=message_pk
+        )
+    except SupportGroupMessage.DoesNotExist:
+        return
+
+    start = time.monotonic()
+    chunk_size = settings.MESSAGE_NOTIFICATIONS_CHUNK_SIZE
+
+    recipients = message.supportgroup.members.filter(group_notifications=True).exclude(
+        pk=message.author_id
+    )
+    if after is not None:
+        recipients = recipients.filter(pk__gt=after)
+    recipient_ids = list(
+        recipients.order_by("pk").values_list("pk", flat=True)[:chunk_size]
+    )
+
+    if not recipient_ids:
+        return
+
+    with transaction.atomic():
+        # le verrou sur le message sérialise les exécutions concurrentes d'un même lot :
+        # les activités insérées sont exactement celles qui manquaient, et peuvent être
+        # publiées sur le canal en temps réel de leurs destinataires
+        SupportGroupMessage.objects.select_for_update().get(pk=message.pk)
+        already_notified = set(
+            Activity.objects.filter(
+                type=Activity.TYPE_NEW_MESSAGE,
+                meta__message=str(message.pk),
+                recipient_id__in=recipient_ids,
+            ).values_list("recipient_id", flat=True)
+        )
+        new_recipient_ids = [r for r in recipient_ids if r not in already_notified]
+
+        Activity.objects.bulk_create(
+            [
+                Activity(
+                    individual_id=message.author_id,
+                    supportgroup_id=message.supportgroup_id,
+                    type=Activity.TYPE_NEW_MESSAGE,
+                    recipient_id=recipient_id,
+                    status=Activity.STATUS_UNDISPLAYED,
+                    meta={"message": str(message.pk)},
+                )
+                for recipient_id in new_recipient_ids
+            ],
+            batch_size=settings.MESSAGE_NOTIFICATIONS_BATCH_SIZE,
+        )
+    duration = time.monotonic() - start
+
+    metrics.message_notifications_chunk_duration.observe(duration)
+    metrics.message_notifications_created.inc(len(new_recipient_ids))
+    metrics.message_notifications_skipped.inc(len(already_notified))
+    logger.info(
+        f"Message {message.pk} : {len(recipient_ids)} destinataires traités en "
+        f"{duration:.2f}s"
+    )
+
+    if len(recipient_ids) == chunk_size:
+        create_message_notifications.delay(message_pk, str(recipient_ids[-1]))
+
+
 @emailing_task
 def send_message_notification_email(message_pk):
     try:
@@ -1,8 +1,10 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework.test import APITestCase
 from unittest.mock import patch
 
-from agir.groups.models import SupportGroup, Membership
+from agir.groups.models import SupportGroup, Membership, SupportGroupSubtype
 from agir.people.models import Person
 
 
@@ -104,3 +106,49 @@ class GroupJoinAPITestCase(APITestCase):
         res = self.client.post(f"/api/groupes/{group.pk}/rejoindre/")
         self.assertEqual(res.status_code, 201)
         someone_joined_notification.assert_called()
+
+
+class UserGroupsAPIQueryCountTestCase(APITestCase):
+    def setUp(self):
+        self.person = Person.objects.create_insoumise(
+            email="person@example.com", create_role=True
+        )
+        self.subtype = SupportGroupSubtype.objects.create(
+            label="certifié",
+            description="Groupe certifié",
+            type=SupportGroup.TYPE_LOCAL_GROUP,
+        )
+        self.client.force_login(self.person.role)
+
+    def add_groups(self, n):
+        for i in range(n):
+            group = SupportGroup.objects.create(name=f"Groupe {i}")
+            group.subtypes.add(self.subtype)
+            Membership.objects.create(
+                supportgroup=group,
+                person=self.person,
+                membership_type=Membership.MEMBERSHIP_TYPE_MANAGER,
+            )
+            Membership.objects.create(
+                supportgroup=group,
+                person=Person.objects.create_insoumise(
+                    email=f"membre-{group.pk}@example.com"
+                ),
+            )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get("/api/groupes/")
+        self.assertEqual(res.status_code, 200)
+        return len(res.data), len(context.captured_queries)
+
+    def test_number_of_queries_does_not_depend_on_number_of_groups(self):
+        self.add_groups(2)
+        groups_count, queries_count = self.count_queries()
+        self.assertEqual(groups_count, 2)
+
+        self.add_groups(5)
+        groups_count, more_queries_count = self.count_queries()
+        self.assertEqual(groups_count, 7)
+
+        self.assertEqual(queries_count, more_queries_count)
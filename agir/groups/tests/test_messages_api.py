@@ -1,3 +1,5 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework.test import APITestCase
 
@@ -70,6 +72,60 @@ class GroupMessagesTestAPICase(APITestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(res.data["results"], [])
 
+    def test_recent_comments_and_comment_count(self):
+        message = SupportGroupMessage.objects.create(
+            supportgroup=self.group, author=self.manager, text="Lorem"
+        )
+        comments = [
+            SupportGroupMessageComment.objects.create(
+                message=message, author=self.member, text=f"Commentaire {i}"
+            )
+            for i in range(6)
+        ]
+        comments[-1].deleted = True
+        comments[-1].save()
+
+        self.client.force_login(self.member.role)
+        res = self.client.get(f"/api/groupes/{self.group.pk}/messages/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [c["text"] for c in res.data["results"][0]["recentComments"]],
+            [f"Commentaire {i}" for i in range(1, 5)],
+        )
+        self.assertEqual(res.data["results"][0]["commentCount"], 5)
+
+    def test_number_of_queries_does_not_depend_on_messages_and_comments(self):
+        def add_messages(n):
+            for i in range(n):
+                message = SupportGroupMessage.objects.create(
+                    supportgroup=self.group,
+                    author=self.manager,
+                    text="Lorem",
+                    linked_event=self.event if i % 2 else None,
+                )
+                for j in range(i):
+                    SupportGroupMessageComment.objects.create(
+                        message=message, author=self.member, text="Ipsum"
+                    )
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                res = self.client.get(f"/api/groupes/{self.group.pk}/messages/")
+            self.assertEqual(res.status_code, 200)
+            return len(res.data["results"]), len(context.captured_queries)
+
+        self.client.force_login(self.member.role)
+
+        add_messages(2)
+        messages_count, queries_count = count_queries()
+        self.assertEqual(messages_count, 2)
+
+        add_messages(6)
+        messages_count, more_queries_count = count_queries()
+        self.assertEqual(messages_count, 8)
+
+        self.assertEqual(queries_count, more_queries_count)
+
     def create_other_manager(self):
         self.other_manager = Person.objects.create(
             first_name="Mathilde",
@@ -5,7 +5,7 @@ from django.db.models import Q
 from django.core import mail
 from django.db.models import Q
 from django.shortcuts import reverse as dj_reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from agir.lib.tests.mixins import create_group, create_location
@@ -16,6 +16,7 @@ from ..actions.transfer import create_transfer_membership_activities
 from ..models import SupportGroup, Membership
 from ..tasks import send_joined_notification_email
 from ...activity.models import Activity
+from ...msgs.models import SupportGroupMessage
 
 fake = Faker("fr_FR")
 
@@ -448,3 +449,55 @@ class NotificationTasksTestCase(TestCase):
         self.assertEqual(
             new_activity_count, old_activity_count + managing_membership.count()
         )
+
+
+class MessageNotificationsTestCase(TestCase):
+    def setUp(self):
+        self.group = SupportGroup.objects.create(name="Groupe")
+        self.author = Person.objects.create_insoumise("auteur@groupe.fr")
+        Membership.objects.create(
+            supportgroup=self.group,
+            person=self.author,
+            membership_type=Membership.MEMBERSHIP_TYPE_REFERENT,
+        )
+
+        self.members = [
+            Person.objects.create_insoumise(f"membre{i}@groupe.fr") for i in range(7)
+        ]
+        for member in self.members:
+            Membership.objects.create(supportgroup=self.group, person=member)
+
+        self.no_notifications = Person.objects.create_insoumise(
+            "sans-notification@groupe.fr"
+        )
+        self.no_notifications.group_notifications = False
+        self.no_notifications.save()
+        Membership.objects.create(supportgroup=self.group, person=self.no_notifications)
+
+        self.message = SupportGroupMessage.objects.create(
+            supportgroup=self.group, author=self.author, text="Message"
+        )
+
+    def get_notifications(self):
+        return Activity.objects.filter(
+            type=Activity.TYPE_NEW_MESSAGE, meta__message=str(self.message.pk)
+        )
+
+    @override_settings(
+        MESSAGE_NOTIFICATIONS_CHUNK_SIZE=3, MESSAGE_NOTIFICATIONS_BATCH_SIZE=2
+    )
+    def test_notifications_are_created_for_all_members_by_chunks(self):
+        tasks.create_message_notifications(self.message.pk)
+
+        self.assertCountEqual(
+            [a.recipient for a in self.get_notifications()], self.members
+        )
+
+    @override_settings(MESSAGE_NOTIFICATIONS_CHUNK_SIZE=3)
+    def test_notifications_are_idempotent(self):
+        tasks.create_message_notifications(self.message.pk)
+        self.get_notifications().filter(recipient=self.members[0]).delete()
+
+        tasks.create_message_notifications(self.message.pk)
+
+        self.assertEqual(self.get_notifications().count(), len(self.members))
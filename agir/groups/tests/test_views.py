@@ -13,7 +13,6 @@ from agir.authentication.tokens import subscription_confirmation_token_generator
 from agir.events.models import Event, OrganizerConfig
 from agir.groups.tasks import invite_to_group
 from agir.people.models import Person
-from ..forms import SupportGroupForm
 from ..models import SupportGroup, Membership, SupportGroupSubtype
 from ...activity.models import Activity
 
@@ -108,7 +107,7 @@ class SupportGroupPageTestCase(SupportGroupMixin, TestCase):
 
 
 class ManageSupportGroupTestCase(SupportGroupMixin, TestCase):
-    @mock.patch.object(SupportGroupForm, "geocoding_task")
+    @mock.patch("agir.lib.form_mixins.schedule_geocoding")
     @mock.patch("agir.groups.forms.send_support_group_changed_notification")
     def test_can_modify_managed_group(self, patched_send_notification, patched_geocode):
         response = self.client.get(
@@ -154,12 +153,12 @@ class ManageSupportGroupTestCase(SupportGroupMixin, TestCase):
             args[1], ["contact_name", "contact_email", "contact_phone", "location_city"]
         )
 
-        patched_geocode.delay.assert_called_once()
-        args = patched_geocode.delay.call_args[0]
+        patched_geocode.assert_called_once()
+        args = patched_geocode.call_args[0]
 
-        self.assertEqual(args[0], self.manager_group.pk)
+        self.assertEqual(args[0].pk, self.manager_group.pk)
 
-    @mock.patch("agir.groups.forms.geocode_support_group")
+    @mock.patch("agir.lib.form_mixins.schedule_geocoding")
     def test_do_not_geocode_if_address_did_not_change(self, patched_geocode):
         response = self.client.post(
             reverse("edit_group", kwargs={"pk": self.manager_group.pk}),
@@ -180,7 +179,7 @@ class ManageSupportGroupTestCase(SupportGroupMixin, TestCase):
         self.assertRedirects(
             response, reverse("manage_group", kwargs={"pk": self.manager_group.pk})
         )
-        patched_geocode.delay.assert_not_called()
+        patched_geocode.assert_not_called()
 
     def test_cannot_modify_group_as_basic_member(self):
         response = self.client.get(
@@ -189,7 +188,7 @@ class ManageSupportGroupTestCase(SupportGroupMixin, TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
-    @mock.patch.object(SupportGroupForm, "geocoding_task")
+    @mock.patch("agir.lib.form_mixins.schedule_geocoding")
     @mock.patch("agir.groups.forms.send_support_group_creation_notification")
     def test_can_create_group(
         self,
@@ -238,11 +237,7 @@ class ManageSupportGroupTestCase(SupportGroupMixin, TestCase):
             (membership.pk,),
         )
 
-        patched_geocode_support_group.delay.assert_called_once()
-        self.assertEqual(
-            patched_geocode_support_group.delay.call_args[0],
-            (membership.supportgroup.pk,),
-        )
+        patched_geocode_support_group.assert_called_once_with(membership.supportgroup)
 
         group = SupportGroup.objects.first()
         self.assertEqual(group.name, "New name")
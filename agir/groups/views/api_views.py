@@ -198,6 +198,7 @@ class GroupPastEventsAPIView(ListAPIView):
     serializer_class = EventSerializer
     queryset = Event.objects.listed().past()
     pagination_class = APIPaginator
+    keyset_ordering = ("-start_time", "-pk")
 
     def get_queryset(self):
         events = (
@@ -253,6 +254,7 @@ class GroupMessagesAPIView(ListCreateAPIView):
     serializer_class = SupportGroupMessageSerializer
     permission_classes = (GroupMessagesPermissions,)
     pagination_class = APIPaginator
+    keyset_ordering = ("-created", "-pk")
 
     def initial(self, request, *args, **kwargs):
         try:
@@ -265,7 +267,11 @@ class GroupMessagesAPIView(ListCreateAPIView):
         super().initial(request, *args, **kwargs)
 
     def get_queryset(self):
-        return self.supportgroup.messages.filter(deleted=False).order_by("-created")
+        return (
+            self.supportgroup.messages.filter(deleted=False)
+            .select_related("author")
+            .order_by("-created")
+        )
 
     def get_serializer(self, *args, **kwargs):
         return super().get_serializer(
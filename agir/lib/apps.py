@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class LibConfig(AppConfig):
     name = "agir.lib"
+
+    def ready(self):
+        from .profiling import install_serializer_profiling
+
+        install_serializer_profiling()
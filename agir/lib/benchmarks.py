@@ -0,0 +1,128 @@
+"""Micro-benchmarks des chemins critiques
+
+Chaque benchmark est une fonction enregistrée avec le décorateur `benchmark`, qui
+prépare ses données et renvoie la fonction à chronométrer. Ils sont lancés avec la
+commande `run_benchmarks`, qui peut comparer les résultats à ceux d'une exécution
+précédente.
+
+Les benchmarks qui utilisent la base de données sont plus représentatifs une fois
+celle-ci remplie avec la commande `generate_load_test_data`.
+"""
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.gis.geos import Point
+from django.test import RequestFactory
+from django.utils import timezone
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def decorator(f):
+        BENCHMARKS[name] = f
+        return f
+
+    return decorator
+
+
+def anonymous_request():
+    request = RequestFactory().get("/")
+    request.user = AnonymousUser()
+    return request
+
+
+@benchmark("serializers.event_routes")
+def event_routes():
+    from agir.events.models import Event
+    from agir.events.serializers import EVENT_ROUTES
+    from agir.front.serializer_utils import RoutesField
+
+    now = timezone.now()
+    events = [
+        Event(id=uuid.uuid4(), name="Événement", start_time=now, end_time=now)
+        for _ in range(1000)
+    ]
+    field = RoutesField(routes=EVENT_ROUTES)
+
+    return lambda: [field.to_representation(e) for e in events]
+
+
+@benchmark("serializers.event_cards")
+def event_cards():
+    from agir.events.models import Event
+    from agir.events.serializers import EventSerializer
+
+    request = anonymous_request()
+    queryset = Event.objects.public().select_related("subtype")
+
+    return lambda: EventSerializer(
+        queryset[:50],
+        many=True,
+        fields=EventSerializer.EVENT_CARD_FIELDS,
+        context={"request": request},
+    ).data
+
+
+@benchmark("serializers.groups")
+def groups():
+    from agir.groups.models import SupportGroup
+    from agir.groups.serializers import SupportGroupSerializer
+
+    request = anonymous_request()
+    queryset = SupportGroup.objects.active()
+
+    return lambda: SupportGroupSerializer(
+        queryset[:50], many=True, context={"request": request}
+    ).data
+
+
+@benchmark("geo.cluster_points")
+def cluster_points():
+    from agir.carte.tiles import cluster_points, tile_bbox
+
+    rng = random.Random(0)
+    lon1, lat1, lon2, lat2 = tile_bbox(6, 32, 22)
+    points = [
+        (i, Point(rng.uniform(lon1, lon2), rng.uniform(lat1, lat2)))
+        for i in range(10_000)
+    ]
+
+    return lambda: cluster_points(points, 6, 32, 22)
+
+
+@benchmark("geo.events_near")
+def events_near():
+    from django.contrib.gis.db.models.functions import Distance
+    from django.contrib.gis.measure import D
+
+    from agir.events.models import Event
+
+    paris = Point(2.35, 48.85, srid=4326)
+
+    return lambda: list(
+        Event.objects.upcoming()
+        .filter(coordinates__dwithin=(paris, D(km=30)))
+        .annotate(distance=Distance("coordinates", paris))
+        .order_by("distance")[:20]
+    )
+
+
+@benchmark("search.events")
+def search_events():
+    from agir.events.models import Event
+
+    return lambda: list(Event.objects.search("réunion publique")[:20])
+
+
+@benchmark("people.keyset_page")
+def people_keyset_page():
+    from agir.people.models import Person
+
+    middle = timezone.now() - timedelta(days=365)
+
+    return lambda: list(
+        Person.objects.filter(created__gte=middle).order_by("created", "id")[:100]
+    )
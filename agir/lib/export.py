@@ -1,6 +1,101 @@
-from io import StringIO
-from itertools import chain
+"""Outils d'export de données
+
+Les exports volumineux sont faits en flux : `iterate_in_chunks` parcourt le queryset
+par lots à l'aide d'un curseur côté serveur (en appliquant les `prefetch_related` à
+chaque lot), `spec_to_dicts` applique à chaque objet une spécification glom qui décrit
+les colonnes, et les lignes obtenues sont écrites au fur et à mesure avec
+`write_csv`, `write_xls` ou `dicts_to_csv_lines` (pour une `StreamingHttpResponse`).
+La mémoire utilisée ne dépend ainsi pas du nombre de lignes exportées.
+"""
 import csv
+import datetime
+from io import StringIO, TextIOWrapper
+from itertools import chain, islice
+
+from django.db.models import prefetch_related_objects
+from glom import glom
+
+EXPORT_FORMATS = ("csv", "xls")
+
+
+def iterate_in_chunks(queryset, chunk_size=2000):
+    """Parcourt un queryset par lots, avec un curseur côté serveur
+
+    Contrairement à `QuerySet.iterator`, qui les ignore, les `prefetch_related` du
+    queryset sont appliqués à chaque lot.
+    """
+    lookups = queryset._prefetch_related_lookups
+    iterator = queryset.prefetch_related(None).iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        if lookups:
+            prefetch_related_objects(chunk, *lookups)
+        yield from chunk
+
+
+def spec_to_dicts(objects, spec):
+    """Applique une spécification glom (un dictionnaire colonne -> chemin) à chaque objet"""
+    for obj in objects:
+        yield glom(obj, spec)
+
+
+def write_csv(dicts, fieldnames, output):
+    w = csv.DictWriter(output, fieldnames=fieldnames)
+    w.writeheader()
+    for d in dicts:
+        w.writerow(d)
+
+
+def xls_value(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, datetime.datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, datetime.date):
+        return value
+    return str(value)
+
+
+def write_xls(dicts, fieldnames, output, sheet_name="Export", flush_every=1000):
+    """Écrit les lignes dans un classeur Excel (format XLS)
+
+    Les lignes sont sérialisées tous les `flush_every` éléments : seule leur
+    représentation binaire, bien plus compacte, reste en mémoire jusqu'à l'écriture
+    du fichier.
+    """
+    import xlwt
+
+    workbook = xlwt.Workbook(encoding="utf-8")
+    sheet = workbook.add_sheet(sheet_name)
+
+    for j, name in enumerate(fieldnames):
+        sheet.write(0, j, name)
+
+    for i, d in enumerate(dicts, start=1):
+        for j, name in enumerate(fieldnames):
+            value = xls_value(d.get(name))
+            if value is not None:
+                sheet.write(i, j, value)
+        if i % flush_every == 0:
+            sheet.flush_row_data()
+
+    workbook.save(output)
+
+
+def write_export(dicts, fieldnames, output, format="csv"):
+    """Écrit les lignes au format demandé dans `output`, un fichier ouvert en mode binaire"""
+    if format == "xls":
+        write_xls(dicts, fieldnames, output)
+    elif format == "csv":
+        text_output = TextIOWrapper(output, encoding="utf-8", newline="")
+        write_csv(dicts, fieldnames, text_output)
+        # détache le wrapper, pour qu'il ne ferme pas le fichier sous-jacent
+        text_output.detach()
+    else:
+        raise ValueError(f"Format d'export inconnu : {format}")
 
 
 def dicts_to_csv_lines(iterator, fieldnames):
@@ -25,6 +25,7 @@ from phonenumbers import NumberParseException
 from agir.lib.form_components import *
 from agir.lib.form_fields import AcceptCreativeCommonsLicenceField
 from agir.lib.models import LocationMixin
+from agir.lib.tasks import schedule_geocoding
 
 from django.utils.translation import ugettext as _
 from django_countries import countries
@@ -103,8 +104,6 @@ class TagMixin:
 
 
 class LocationFormMixin:
-    geocoding_task = None
-
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -148,7 +147,7 @@ class LocationFormMixin:
 
     def schedule_tasks(self):
         if self.must_geolocate():
-            self.geocoding_task.delay(self.instance.pk)
+            schedule_geocoding(self.instance)
 
 
 LocationFormMixin.declared_fields = fields_for_model(
@@ -173,7 +172,6 @@ class ContactFormMixin:
 
 
 class GeocodingBaseForm(forms.ModelForm):
-    geocoding_task = None
     messages = {"use_geocoding": None, "coordinates_updated": None}
 
     def __init__(self, *args, **kwargs):
@@ -229,7 +227,7 @@ class GeocodingBaseForm(forms.ModelForm):
             self.instance.coordinates_type = None
             self.instance.coordinates = None
             super().save(commit=commit)
-            self.geocoding_task.delay(self.instance.pk)
+            schedule_geocoding(self.instance)
         else:
             if "coordinates" in self.changed_data:
                 self.instance.coordinates_type = self.instance.COORDINATES_MANUAL
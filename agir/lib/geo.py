@@ -1,24 +1,31 @@
+import csv
+import hashlib
+import io
+import json
 import logging
 
-import re
 import requests
-from data_france.models import CodePostal, Commune
+from django.conf import settings
+from data_france.models import Commune
 from django.contrib.gis.geos import Point
-from unidecode import unidecode
 
+from agir.api.redis import get_auth_redis_client
+from .geo_index import CommuneLookup, get_commune_index, normaliser_nom_ville
 from .models import LocationMixin
 
 logger = logging.getLogger(__name__)
 
-NON_WORD = re.compile("[^\w]+")
-MULTIPLE_SPACES = re.compile("\s\s+")
-
 BAN_ENDPOINT = "https://api-adresse.data.gouv.fr/search"
+BAN_CSV_ENDPOINT = "https://api-adresse.data.gouv.fr/search/csv/"
 NOMINATIM_ENDPOINT = "https://nominatim.openstreetmap.org/"
 
+BAN_RESULT_TYPES = {
+    "housenumber": LocationMixin.COORDINATES_EXACT,
+    "street": LocationMixin.COORDINATES_STREET,
+    "city": LocationMixin.COORDINATES_CITY,
+}
 
-def normaliser_nom_ville(s):
-    return MULTIPLE_SPACES.sub(" ", NON_WORD.sub(" ", unidecode(s.strip()))).lower()
+GEOCODING_CACHE_KEY = "geocoding:ban:{hash}"
 
 
 def geocode_element(item):
@@ -61,126 +68,97 @@ def get_results_from_ban(query):
     return results
 
 
-def geocode_data_france(item):
+def _set_commune_location(item, commune):
+    item.coordinates = commune.centroid
+    item.coordinates_type = (
+        LocationMixin.COORDINATES_CITY
+        if commune.type == Commune.TYPE_COMMUNE
+        else LocationMixin.COORDINATES_DISTRICT
+    )
+    item.location_citycode = commune.code
+
+
+def geocode_data_france(item, index=None):
+    """Géocode l'item à partir de son code commune, de son code postal ou de sa ville
+
+    Les recherches sont faites en base de données, ou dans l'index en mémoire des
+    communes s'il est fourni (voir `geocode_data_france_batch`).
+    """
+    if index is None:
+        index = CommuneLookup()
+
     if item.location_citycode:
-        try:
-            commune = Commune.objects.get(code=item.location_citycode)
-        except Commune.MultipleObjectsReturned:
-            commune = Commune.objects.get(
-                code=item.location_citycode, type=Commune.TYPE_COMMUNE
-            )
-        except Commune.DoesNotExist:
-            commune = None
+        commune = index.get_commune_by_code(item.location_citycode)
 
         if commune is not None:
-            item.coordinates = commune.geometry.centroid
-            item.coordinates_type = (
-                LocationMixin.COORDINATES_CITY
-                if commune.type == Commune.TYPE_COMMUNE
-                else LocationMixin.COORDINATES_DISTRICT
-            )
+            _set_commune_location(item, commune)
             item.location_city = commune.nom_complet
-            item.location_citycode = commune.code
             return
 
     if item.location_zip:
-        try:
-            code_postal = CodePostal.objects.get(code=item.location_zip)
-        except CodePostal.DoesNotExist:
-            pass
-        else:
-            nb_communes = code_postal.communes.count()
+        code_postal = index.get_code_postal(item.location_zip)
+
+        if code_postal is not None:
+            nb_communes = len(code_postal.communes)
 
             if nb_communes == 1:
-                commune = code_postal.communes.get()
-                item.coordinates = commune.geometry.centroid
-                item.coordinates_type = (
-                    LocationMixin.COORDINATES_CITY
-                    if commune.type == Commune.TYPE_COMMUNE
-                    else LocationMixin.COORDINATES_DISTRICT
-                )
+                commune = code_postal.communes[0]
+                _set_commune_location(item, commune)
                 item.location_city = commune.nom_complet
-                item.location_citycode = commune.code
                 return
 
             if nb_communes > 1 and item.location_city:
                 nom_normalise = normaliser_nom_ville(item.location_city)
-                try:
-                    commune = next(
-                        v
-                        for v in code_postal.communes.all()
-                        if normaliser_nom_ville(v.nom) == nom_normalise
-                    )
-                    if commune.geometry:
-                        item.coordinates = commune.geometry.centroid
-                        item.location_citycode = commune.code
-                        item.coordinates_type = (
-                            LocationMixin.COORDINATES_CITY
-                            if commune.type == Commune.TYPE_COMMUNE
-                            else LocationMixin.COORDINATES_DISTRICT
-                        )
-                        return
-                except StopIteration:
-                    pass
+                commune = next(
+                    (
+                        c
+                        for c in code_postal.communes
+                        if c.nom_normalise == nom_normalise
+                    ),
+                    None,
+                )
+                if commune is not None and commune.centroid is not None:
+                    _set_commune_location(item, commune)
+                    return
 
             if nb_communes > 1:
-                code_postal = CodePostal.objects.raw(
-                    """
-                    SELECT cp.*, ST_CENTROID(ST_UNION(c.geometry :: geometry)) centroid
-                    FROM data_france_codepostal cp
-                    JOIN data_france_codepostal_communes cc ON cp.id = cc.codepostal_id
-                    JOIN data_france_commune c on cc.commune_id = c.id
-                    WHERE cp.id = %(cp_id)s
-                    GROUP BY cp.id; 
-                """,
-                    {"cp_id": code_postal.id},
-                )[0]
                 item.coordinates = code_postal.centroid
                 item.coordinates_type = LocationMixin.COORDINATES_UNKNOWN_PRECISION
                 return
 
     # pas de code postal
     if item.location_city:
-        nom_normalise = normaliser_nom_ville(item.location_city)
-        communes = [
-            c
-            for c in Commune.objects.search(item.location_city)
-            if normaliser_nom_ville(c.nom_complet) == nom_normalise
-        ]
+        communes = index.get_communes_by_nom_complet(item.location_city)
 
         if len(communes) == 1:
             commune = communes[0]
-            if commune.geometry is not None:
-                item.coordinates = commune.geometry.centroid
-                item.coordinates_type = (
-                    LocationMixin.COORDINATES_CITY
-                    if commune.type == Commune.TYPE_COMMUNE
-                    else LocationMixin.COORDINATES_DISTRICT
-                )
+            if commune.centroid is not None:
+                _set_commune_location(item, commune)
                 item.location_city = commune.nom_complet
-                item.location_citycode = commune.code
                 return
 
     item.coordinates = None
     item.coordinates_type = LocationMixin.COORDINATES_NOT_FOUND
 
 
-def geocode_france(item):
-    """Trouver la localisation géographique d'un item
-
-    Si on a juste un code postal ou une ville, on utilise les coordonnées données
-    par data_france.
+def geocode_data_france_batch(items):
+    """Géocode une liste d'items à partir de data_france, en une seule passe
 
-    Dans le cas où on a une adresse plus précise, on peut aller interroger la BAN.
+    Les items ne sont pas sauvegardés.
     """
+    if not items:
+        return items
 
-    has_precise_address = item.location_address1 or item.location_address2
+    index = get_commune_index()
 
-    if not has_precise_address:
-        geocode_data_france(item)
-        return
+    for item in items:
+        geocode_data_france(item, index=index)
 
-    q = " ".join(
+    return items
+
+
+def get_ban_query(item):
+    return " ".join(
         l
         for l in [
             item.location_address1,
@@ -191,24 +169,34 @@ def geocode_france(item):
         if l
     )
 
-    query = {"q": q, "postcode": item.location_zip, "limit": 5}
+
+def geocode_france(item):
+    """Trouver la localisation géographique d'un item
+
+    Si on a juste un code postal ou une ville, on utilise les coordonnées données
+    par data_france.
+
+    Dans le cas où on a une adresse plus précise, on peut aller interroger la BAN.
+    """
+
+    has_precise_address = item.location_address1 or item.location_address2
+
+    if not has_precise_address:
+        geocode_data_france(item)
+        return
+
+    query = {"q": get_ban_query(item), "postcode": item.location_zip, "limit": 5}
     results = get_results_from_ban(query)
     if results is None:
         # there has been a network error
         return
 
-    types = {
-        "housenumber": LocationMixin.COORDINATES_EXACT,
-        "street": LocationMixin.COORDINATES_STREET,
-        "city": LocationMixin.COORDINATES_CITY,
-    }
-
     for feature in results["features"]:
         if feature["geometry"]["type"] != "Point":
             continue
-        if feature["properties"]["type"] in types:
+        if feature["properties"]["type"] in BAN_RESULT_TYPES:
             item.coordinates = Point(*feature["geometry"]["coordinates"])
-            item.coordinates_type = types[feature["properties"]["type"]]
+            item.coordinates_type = BAN_RESULT_TYPES[feature["properties"]["type"]]
             item.location_citycode = feature["properties"]["citycode"]
             return
 
@@ -216,6 +204,135 @@ def geocode_france(item):
     item.coordinates_type = LocationMixin.COORDINATES_NOT_FOUND
 
 
+def _get_cache_key(item):
+    normalized = normaliser_nom_ville(f"{get_ban_query(item)}|{item.location_zip}")
+    return GEOCODING_CACHE_KEY.format(
+        hash=hashlib.sha1(normalized.encode()).hexdigest()
+    )
+
+
+def _apply_ban_result(item, result):
+    if result is None:
+        item.coordinates = None
+        item.coordinates_type = LocationMixin.COORDINATES_NOT_FOUND
+    else:
+        lon, lat, result_type, citycode = result
+        item.coordinates = Point(lon, lat)
+        item.coordinates_type = BAN_RESULT_TYPES[result_type]
+        item.location_citycode = citycode
+
+
+def get_results_from_ban_csv(items):
+    """Géocode une liste d'items en une seule requête à l'interface CSV de la BAN
+
+    :return: une liste de résultats (lon, lat, type, code commune) ou None, dans
+        l'ordre des items
+    """
+    content = io.StringIO()
+    writer = csv.writer(content)
+    writer.writerow(["q", "postcode"])
+    writer.writerows([get_ban_query(item), item.location_zip] for item in items)
+
+    try:
+        res = requests.post(
+            BAN_CSV_ENDPOINT,
+            data={"columns": "q", "postcode": "postcode"},
+            files={"data": ("adresses.csv", content.getvalue().encode(), "text/csv")},
+            timeout=60,
+        )
+        res.raise_for_status()
+    except requests.RequestException:
+        logger.warning(
+            f"Network error while geocoding {len(items)} items with BAN", exc_info=True,
+        )
+        raise
+
+    results = []
+    for row in csv.DictReader(io.StringIO(res.content.decode("utf-8-sig"))):
+        if row.get("result_type") in BAN_RESULT_TYPES and row.get("longitude"):
+            results.append(
+                (
+                    float(row["longitude"]),
+                    float(row["latitude"]),
+                    row["result_type"],
+                    row["result_citycode"],
+                )
+            )
+        else:
+            results.append(None)
+
+    if len(results) != len(items):
+        raise ValueError("La BAN n'a pas renvoyé autant de résultats que d'adresses")
+
+    return results
+
+
+def geocode_france_batch(items):
+    """Géocode une liste d'items français
+
+    Les items sans adresse précise sont géocodés à partir de data_france. Les autres
+    sont d'abord cherchés dans le cache des adresses trouvées par la BAN, puis envoyés
+    en une seule requête à l'interface CSV de la BAN. Les items ne sont pas
+    sauvegardés.
+    """
+    precise_items = [i for i in items if i.location_address1 or i.location_address2]
+    geocode_data_france_batch(
+        [i for i in items if not (i.location_address1 or i.location_address2)]
+    )
+
+    if not precise_items:
+        return items
+
+    client = get_auth_redis_client()
+    cache_keys = [_get_cache_key(item) for item in precise_items]
+
+    missing = []
+    for item, key, cached in zip(precise_items, cache_keys, client.mget(cache_keys)):
+        if cached is None:
+            missing.append((item, key))
+        else:
+            _apply_ban_result(item, json.loads(cached))
+
+    if missing:
+        results = get_results_from_ban_csv([item for item, _ in missing])
+
+        pipeline = client.pipeline(transaction=False)
+        for (item, key), result in zip(missing, results):
+            _apply_ban_result(item, result)
+            # une adresse introuvable peut l'être à cause d'une erreur temporaire, ou
+            # devenir trouvable après une mise à jour de la BAN : elle n'est pas
+            # mise en cache
+            if result is not None:
+                pipeline.set(key, json.dumps(result), ex=settings.GEOCODING_CACHE_TTL)
+        pipeline.execute()
+
+    return items
+
+
+def geocode_batch(items):
+    """Géocode une liste d'items, en regroupant autant que possible les requêtes
+
+    Les items ne sont pas sauvegardés.
+    """
+    to_geocode = []
+
+    for item in items:
+        # même condition que pour geocode_element
+        if item.location_country and (item.location_city or item.location_zip):
+            to_geocode.append(item)
+        else:
+            item.coordinates = None
+            item.coordinates_type = LocationMixin.COORDINATES_NO_POSITION
+
+    geocode_france_batch([i for i in to_geocode if i.location_country == "FR"])
+
+    for item in to_geocode:
+        if item.location_country != "FR":
+            geocode_internationally(item)
+
+    return items
+
+
 def geocode_internationally(item):
     """Find location of an item with its address for non French addresses
 
@@ -274,43 +391,33 @@ def geocode_internationally(item):
         return
 
 
-def get_commune(item):
+def get_commune(item, index=None):
+    """Renvoie la commune de l'item, recherchée en base de données ou dans l'index
+    en mémoire des communes s'il est fourni"""
+    if index is None:
+        index = CommuneLookup()
+
     commune = None
     if item.location_citycode:
-        try:
-            commune = Commune.objects.get(code=item.location_citycode)
-        except Commune.MultipleObjectsReturned:
-            commune = Commune.objects.get(
-                code=item.location_citycode, type=Commune.TYPE_COMMUNE
-            )
-        except Commune.DoesNotExist:
-            commune = None
+        commune = index.get_commune_by_code(item.location_citycode)
     if item.location_zip:
-        try:
-            code_postal = CodePostal.objects.get(code=item.location_zip)
-        except CodePostal.DoesNotExist:
-            pass
-        else:
-            nb_communes = code_postal.communes.count()
+        code_postal = index.get_code_postal(item.location_zip)
+        if code_postal is not None:
+            nb_communes = len(code_postal.communes)
             if nb_communes == 1:
-                commune = code_postal.communes.get()
+                commune = code_postal.communes[0]
             if nb_communes > 1 and item.location_city:
                 nom_normalise = normaliser_nom_ville(item.location_city)
-                try:
-                    commune = next(
-                        v
-                        for v in code_postal.communes.all()
-                        if normaliser_nom_ville(v.nom) == nom_normalise
-                    )
-                except StopIteration:
-                    pass
+                commune = next(
+                    (
+                        c
+                        for c in code_postal.communes
+                        if c.nom_normalise == nom_normalise
+                    ),
+                    commune,
+                )
     if item.location_city:
-        nom_normalise = normaliser_nom_ville(item.location_city)
-        communes = [
-            c
-            for c in Commune.objects.search(item.location_city)
-            if normaliser_nom_ville(c.nom_complet) == nom_normalise
-        ]
+        communes = index.get_communes_by_nom_complet(item.location_city)
         if len(communes) == 1:
             commune = communes[0]
 
@@ -0,0 +1,186 @@
+"""Index en mémoire des communes et codes postaux de data_france
+
+L'index est construit paresseusement, une fois par processus, et permet de géocoder
+les éléments à partir de leur code commune, code postal ou nom de ville sans aucune
+requête à la base de données. Sa construction prenant plusieurs secondes, il n'est
+utilisé que par le géocodage par lots, dans les workers Celery : ailleurs (dans les
+requêtes web notamment), `CommuneLookup` fait les mêmes recherches en base.
+
+Il est reconstruit dès que sa version, stockée dans Redis, change : il suffit d'appeler
+`invalidate_commune_index` après une mise à jour des données de data_france.
+"""
+import re
+import uuid
+from collections import namedtuple, defaultdict
+
+from data_france.models import CodePostal, Commune
+from django.contrib.gis.geos import Point
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+from unidecode import unidecode
+
+from agir.api.redis import get_auth_redis_client
+
+NON_WORD = re.compile("[^\w]+")
+MULTIPLE_SPACES = re.compile("\s\s+")
+
+COMMUNE_INDEX_VERSION_KEY = "geo:commune_index_version"
+
+CodePostalEntry = namedtuple("CodePostalEntry", ["code", "communes", "centroid"])
+
+
+def normaliser_nom_ville(s):
+    return MULTIPLE_SPACES.sub(" ", NON_WORD.sub(" ", unidecode(s.strip()))).lower()
+
+
+class CommuneIndex:
+    def __init__(self, version=None):
+        self.version = version
+
+        communes = list(
+            Commune.objects.defer("geometry").annotate(
+                _centroid_x=RawSQL("ST_X(ST_Centroid(geometry::geometry))", ()),
+                _centroid_y=RawSQL("ST_Y(ST_Centroid(geometry::geometry))", ()),
+                _area=RawSQL("ST_Area(geometry::geometry)", ()),
+            )
+        )
+
+        self._by_id = {}
+        self._by_code = defaultdict(list)
+        self._by_nom_complet = defaultdict(list)
+
+        for commune in communes:
+            if commune._centroid_x is not None:
+                commune.centroid = Point(commune._centroid_x, commune._centroid_y)
+            else:
+                commune.centroid = None
+            commune.nom_normalise = normaliser_nom_ville(commune.nom)
+
+            self._by_id[commune.id] = commune
+            self._by_code[commune.code].append(commune)
+            self._by_nom_complet[normaliser_nom_ville(commune.nom_complet)].append(
+                commune
+            )
+
+        communes_par_code_postal = defaultdict(list)
+        for code, commune_id in CodePostal.communes.through.objects.values_list(
+            "codepostal__code", "commune_id"
+        ):
+            communes_par_code_postal[code].append(self._by_id[commune_id])
+
+        self._by_code_postal = {
+            code: CodePostalEntry(
+                code=code,
+                communes=communes,
+                centroid=self._get_union_centroid(communes),
+            )
+            for code, communes in communes_par_code_postal.items()
+        }
+
+    @staticmethod
+    def _get_union_centroid(communes):
+        # les communes ne se recouvrant pas, le centroïde de leur union est la moyenne de
+        # leurs centroïdes pondérée par leurs surfaces
+        communes = [c for c in communes if c.centroid is not None and c._area]
+        total_area = sum(c._area for c in communes)
+
+        if not total_area:
+            return None
+
+        return Point(
+            sum(c.centroid.x * c._area for c in communes) / total_area,
+            sum(c.centroid.y * c._area for c in communes) / total_area,
+        )
+
+    def get_commune_by_code(self, code):
+        communes = self._by_code.get(code, [])
+
+        if len(communes) > 1:
+            communes = [c for c in communes if c.type == Commune.TYPE_COMMUNE]
+
+        return communes[0] if communes else None
+
+    def get_code_postal(self, code):
+        return self._by_code_postal.get(code)
+
+    def get_communes_by_nom_complet(self, nom):
+        return self._by_nom_complet.get(normaliser_nom_ville(nom), [])
+
+
+class CodePostalLookup:
+    def __init__(self, code_postal, communes):
+        self.code_postal = code_postal
+        self.code = code_postal.code
+        self.communes = communes
+
+    @cached_property
+    def centroid(self):
+        return (
+            CodePostal.objects.raw(
+                """
+                SELECT cp.*, ST_CENTROID(ST_UNION(c.geometry :: geometry)) centroid
+                FROM data_france_codepostal cp
+                JOIN data_france_codepostal_communes cc ON cp.id = cc.codepostal_id
+                JOIN data_france_commune c on cc.commune_id = c.id
+                WHERE cp.id = %(cp_id)s
+                GROUP BY cp.id;
+                """,
+                {"cp_id": self.code_postal.id},
+            )[0]
+        ).centroid
+
+
+class CommuneLookup:
+    """Mêmes recherches que `CommuneIndex`, faites directement en base de données"""
+
+    @staticmethod
+    def _prepare(commune):
+        commune.centroid = commune.geometry.centroid if commune.geometry else None
+        commune.nom_normalise = normaliser_nom_ville(commune.nom)
+        return commune
+
+    def get_commune_by_code(self, code):
+        try:
+            commune = Commune.objects.get(code=code)
+        except Commune.MultipleObjectsReturned:
+            commune = Commune.objects.get(code=code, type=Commune.TYPE_COMMUNE)
+        except Commune.DoesNotExist:
+            return None
+
+        return self._prepare(commune)
+
+    def get_code_postal(self, code):
+        try:
+            code_postal = CodePostal.objects.get(code=code)
+        except CodePostal.DoesNotExist:
+            return None
+
+        return CodePostalLookup(
+            code_postal, [self._prepare(c) for c in code_postal.communes.all()]
+        )
+
+    def get_communes_by_nom_complet(self, nom):
+        nom_normalise = normaliser_nom_ville(nom)
+        return [
+            self._prepare(c)
+            for c in Commune.objects.search(nom)
+            if normaliser_nom_ville(c.nom_complet) == nom_normalise
+        ]
+
+
+_commune_index = None
+
+
+def get_commune_index():
+    global _commune_index
+
+    version = get_auth_redis_client().get(COMMUNE_INDEX_VERSION_KEY)
+
+    if _commune_index is None or _commune_index.version != version:
+        _commune_index = CommuneIndex(version)
+
+    return _commune_index
+
+
+def invalidate_commune_index():
+    get_auth_redis_client().set(COMMUNE_INDEX_VERSION_KEY, uuid.uuid4().hex)
@@ -0,0 +1,166 @@
+"""Traitement des images téléversées
+
+La rotation selon les données EXIF, le réencodage et le rendu des variations des images
+sont faits par une tâche Celery plutôt que pendant la requête de téléversement. Tant que
+ce traitement n'est pas terminé, l'image est marquée comme en attente dans Redis, et
+`variation_url` renvoie l'URL de l'image originale à la place de celle de la variation.
+"""
+import logging
+from datetime import timedelta
+from io import BytesIO
+
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from stdimage.utils import render_variations
+
+from agir.api.redis import get_auth_redis_client
+
+logger = logging.getLogger(__name__)
+
+PENDING_IMAGE_KEY = "images:pending:{file_name}"
+# durée au-delà de laquelle une image est considérée comme traitée, même si la tâche
+# n'a pas pu retirer le marqueur (par exemple en cas d'arrêt du worker)
+PENDING_IMAGE_EXPIRATION = 3600
+
+# champs d'images dont les variations sont rendues par la tâche Celery
+ASYNC_IMAGE_FIELDS = [
+    ("events.Event", "image"),
+    ("events.Event", "report_image"),
+    ("events.EventImage", "image"),
+    ("events.Calendar", "image"),
+    ("groups.SupportGroup", "image"),
+    ("activity.Announcement", "image"),
+]
+
+EXIF_ORIENTATION_KEY = 274  # cf ExifTags
+EXIF_ROTATIONS = {
+    3: Image.ROTATE_180,
+    6: Image.ROTATE_270,
+    8: Image.ROTATE_90,
+}
+
+
+def autorotate(file_name, storage=default_storage):
+    """Applique la rotation indiquée dans les données EXIF de l'image et la réenregistre
+
+    Une image qui comporte des données EXIF est toujours réencodée sans celles-ci, car
+    elles peuvent contenir la position GPS de la prise de vue. Les autres ne sont pas
+    modifiées : chaque réencodage dégrade un peu plus les images JPEG.
+    """
+    with storage.open(file_name) as f:
+        with Image.open(f) as image:
+            if not image.info.get("exif"):
+                return
+
+            file_format = image.format
+            try:
+                exif = image._getexif()
+            except AttributeError:
+                exif = None
+
+            if exif and exif.get(EXIF_ORIENTATION_KEY) in EXIF_ROTATIONS:
+                image = image.transpose(EXIF_ROTATIONS[exif[EXIF_ORIENTATION_KEY]])
+
+            with BytesIO() as file_buffer:
+                # sans ce paramètre, Pillow recopie les données EXIF des images PNG
+                image.save(file_buffer, file_format, exif=b"")
+                content = ContentFile(file_buffer.getvalue())
+
+    storage.delete(file_name)
+    storage.save(file_name, content)
+
+
+def process_image(file_name, variations, replace=False, storage=default_storage):
+    autorotate(file_name, storage=storage)
+    render_variations(file_name, variations, replace=replace, storage=storage)
+
+
+def resize_and_autorotate(
+    file_name, variations, replace=False, storage=default_storage
+):
+    """Traite l'image de façon synchrone, dans la requête de téléversement
+
+    À utiliser comme paramètre `render_variations` d'un `StdImageField`.
+    """
+    process_image(file_name, variations, replace=replace, storage=storage)
+    return False
+
+
+def render_variations_async(file_name, variations, storage=default_storage):
+    """Confie le traitement de l'image à une tâche Celery
+
+    À utiliser comme paramètre `render_variations` d'un `StdImageField`. La tâche ne
+    connaît que le stockage par défaut : les images des autres stockages sont traitées
+    immédiatement.
+    """
+    from agir.lib.tasks import process_uploaded_image
+
+    if storage is not default_storage:
+        return resize_and_autorotate(file_name, variations, storage=storage)
+
+    get_auth_redis_client().set(
+        PENDING_IMAGE_KEY.format(file_name=file_name), "1", ex=PENDING_IMAGE_EXPIRATION,
+    )
+    process_uploaded_image.delay(file_name, variations)
+
+    return False
+
+
+def clear_pending_image(file_name):
+    get_auth_redis_client().delete(PENDING_IMAGE_KEY.format(file_name=file_name))
+
+
+def is_pending_image(file_name):
+    return bool(
+        get_auth_redis_client().exists(PENDING_IMAGE_KEY.format(file_name=file_name))
+    )
+
+
+def may_be_pending(image):
+    """Indique si l'image peut encore être en attente de traitement
+
+    Le marqueur expire au bout de `PENDING_IMAGE_EXPIRATION` : les images d'objets
+    modifiés avant ce délai ont forcément été traitées, sans qu'il soit nécessaire
+    d'interroger Redis.
+    """
+    modified = getattr(image.instance, "modified", None)
+    return modified is None or timezone.now() - modified < timedelta(
+        seconds=PENDING_IMAGE_EXPIRATION
+    )
+
+
+def prefetch_pending_images(images):
+    """Récupère en une seule requête Redis l'état de traitement d'une liste d'images
+
+    Le résultat est conservé sur chaque image, et utilisé ensuite par `variation_url`.
+    """
+    images = [image for image in images if image]
+    candidates = [image for image in images if may_be_pending(image)]
+
+    pending = []
+    if candidates:
+        pending = get_auth_redis_client().mget(
+            [PENDING_IMAGE_KEY.format(file_name=image.name) for image in candidates]
+        )
+
+    for image in images:
+        image._is_pending = False
+    for image, value in zip(candidates, pending):
+        image._is_pending = value is not None
+
+
+def variation_url(image, variation):
+    """Renvoie l'URL de la variation de l'image, ou celle de l'image originale tant que
+    la variation n'a pas été rendue"""
+    if not image:
+        return None
+
+    if not hasattr(image, "_is_pending"):
+        image._is_pending = may_be_pending(image) and is_pending_image(image.name)
+
+    if image._is_pending:
+        return image.url
+
+    return getattr(image, variation).url
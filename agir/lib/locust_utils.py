@@ -26,3 +26,9 @@ class AgirHttpUser(FastHttpUser):
             return orig_request(*args, **kwargs)
 
         self.client.request = request
+
+    def get_cookie(self, name):
+        for cookie in self.client.cookiejar:
+            if cookie.name == name:
+                return cookie.value
+        return None
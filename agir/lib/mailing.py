@@ -1,3 +1,5 @@
+import logging
+import time
 from email.mime.base import MIMEBase
 from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
@@ -9,19 +11,47 @@ from django.core.exceptions import ImproperlyConfigured
 from django.core.mail import EmailMultiAlternatives, get_connection
 from django.http import QueryDict
 from django.template import loader, TemplateDoesNotExist
+from django.utils.html import conditional_escape
 from django.utils.safestring import mark_safe
 
+from agir.lib import metrics
 from agir.lib.utils import generate_token_params, front_url, is_front_url, AutoLoginUrl
 from agir.people.models import Person
 
 __all__ = [
     "send_mosaico_email",
+    "MosaicoRenderer",
     "generate_plain_text",
     "fetch_mosaico_template",
 ]
 
+logger = logging.getLogger(__name__)
+
 MOSAICO_VAR_REGEX = re.compile(r"\[([-A-Z_]+)\]")
 
+# variables dont la valeur dépend du destinataire
+RECIPIENT_VARIABLES = [
+    "email",
+    "EMAIL",
+    "greetings",
+    "formule_adresse",
+    "GREETINGS",
+    "greetings_insoumise",
+    "formule_adresse_insoumise",
+    "LINK_BROWSER",
+    "MERGE_LOGIN",
+]
+
+# marqueurs insérés à la place des variables propres à chaque destinataire lors du rendu
+# unique du gabarit ; uniquement alphanumériques pour ne pas être modifiés par
+# l'échappement HTML ou par html2text
+PLACEHOLDER_FORMAT = "AGIRVAR{}RAVRIGA"
+PLACEHOLDER_REGEX = re.compile(r"AGIRVAR(\d+)RAVRIGA")
+TEMPLATE_TAG_REGEX = re.compile(r"{[{%](.*?)[}%]}", re.DOTALL)
+SIMPLE_VARIABLE_REGEX = re.compile(r"^{{\s*([\w]+)\s*}}$")
+
+EMAIL_BATCH_SIZE = 100
+
 _h = html2text.HTML2Text(bodywidth=0)
 _h.ignore_images = True
 _h.ignore_tables = True
@@ -87,6 +117,149 @@ def get_context_from_bindings(code, recipient: Person, bindings):
     return res
 
 
+def _uses_only_simple_variables(template, names):
+    """Checks that the given variables are only used as plain `{{ VARIABLE }}` tags in
+    the template, and never with filters or inside block tags"""
+    source = getattr(getattr(template, "template", None), "source", None)
+    if source is None:
+        return False
+
+    for match in TEMPLATE_TAG_REGEX.finditer(source):
+        words = set(re.findall(r"\w+", match.group(1)))
+        if words & names and not SIMPLE_VARIABLE_REGEX.match(match.group(0)):
+            return False
+
+    return True
+
+
+class MosaicoRenderer:
+    """Renders a Mosaico template for many recipients
+
+    When possible, the template is rendered only once, with placeholders in lieu of
+    the variables specific to each recipient, that are then substituted for each of them.
+    If the template uses these variables in more complex ways (filters, conditions...),
+    it falls back to rendering the template for each recipient.
+    """
+
+    def __init__(self, code, bindings, batch=True):
+        self.code = code
+        self.bindings = bindings
+        self.auto_login_bindings = {
+            key: value
+            for key, value in bindings.items()
+            if is_front_url(value) and isinstance(value, AutoLoginUrl)
+        }
+
+        self.html_template = loader.get_template(f"mail_templates/{code}.html")
+        try:
+            self.text_template = loader.get_template(f"mail_templates/{code}.txt")
+        except TemplateDoesNotExist:
+            self.text_template = None
+
+        self.recipient_variables = RECIPIENT_VARIABLES + list(self.auto_login_bindings)
+
+        self.batch = batch and all(
+            _uses_only_simple_variables(t, set(self.recipient_variables))
+            for t in (self.html_template, self.text_template)
+            if t is not None
+        )
+
+        if self.batch:
+            self._prepare_skeletons()
+
+    def _prepare_skeletons(self):
+        context = {
+            **self.bindings,
+            **{
+                name: PLACEHOLDER_FORMAT.format(i)
+                for i, name in enumerate(self.recipient_variables)
+            },
+        }
+
+        self.html_skeleton = self.html_template.render(context=context)
+        self.text_skeleton = self._render_text(context, self.html_skeleton)
+
+        self.link_browser_prefix = None
+        if code_url := settings.EMAIL_TEMPLATES.get(self.code):
+            # la partie commune du lien vers la version navigateur
+            qs = QueryDict(mutable=True)
+            qs.update(
+                {
+                    k: v
+                    for k, v in self.bindings.items()
+                    if k not in self.recipient_variables
+                }
+            )
+            qs["LINK_BROWSER"] = "#"
+            self.link_browser_prefix = f"{code_url}?{qs.urlencode()}"
+
+    def _render_text(self, context, html_message):
+        if self.text_template:
+            return self.text_template.render(
+                context={k: conditional_html_to_text(v) for k, v in context.items()}
+            )
+        return generate_plain_text(html_message)
+
+    def get_recipient_values(self, recipient):
+        if not isinstance(recipient, Person):
+            # comme pour un rendu individuel, les liens de connexion automatique restent
+            # de simples liens, sans paramètres de connexion
+            return {
+                name: self.bindings[name]
+                for name in self.recipient_variables
+                if name in self.bindings
+            }
+
+        connection_params = generate_token_params(recipient)
+        values = {
+            key: add_params_to_urls(value, connection_params)
+            for key, value in self.auto_login_bindings.items()
+        }
+        values["MERGE_LOGIN"] = urlencode(connection_params)
+        values["email"] = values["EMAIL"] = recipient.email
+        values["greetings"] = values["formule_adresse"] = values[
+            "GREETINGS"
+        ] = recipient.formule_adresse
+        values["greetings_insoumise"] = values[
+            "formule_adresse_insoumise"
+        ] = recipient.formule_adresse_insoumise
+
+        return values
+
+    def render(self, recipient):
+        """Returns the HTML and plain text messages for the given recipient"""
+        values = self.get_recipient_values(recipient)
+
+        if not self.batch:
+            if isinstance(recipient, Person):
+                context = get_context_from_bindings(
+                    self.code, recipient, {**self.bindings, **values}
+                )
+            else:
+                context = dict(self.bindings)
+
+            html_message = self.html_template.render(context=context)
+            return html_message, self._render_text(context, html_message)
+
+        if isinstance(recipient, Person):
+            if self.link_browser_prefix is None:
+                raise ImproperlyConfigured(f"Mail '{self.code}' cannot be found")
+            values["LINK_BROWSER"] = (
+                f"{self.link_browser_prefix}&"
+                f"{urlencode({k: v for k, v in values.items() if k != 'LINK_BROWSER'})}"
+            )
+
+        values = [values.get(name, "") for name in self.recipient_variables]
+
+        html_message = PLACEHOLDER_REGEX.sub(
+            lambda m: conditional_escape(values[int(m.group(1))]), self.html_skeleton
+        )
+        text_message = PLACEHOLDER_REGEX.sub(
+            lambda m: str(values[int(m.group(1))]), self.text_skeleton
+        )
+        return html_message, text_message
+
+
 def send_mosaico_email(
     code,
     subject,
@@ -100,6 +273,8 @@ def send_mosaico_email(
     preferences_link=True,
     reply_to=None,
     attachments=None,
+    batch_size=EMAIL_BATCH_SIZE,
+    batch_render=True,
 ):
     """Send an email from a Mosaico template
 
@@ -111,11 +286,10 @@ def send_mosaico_email(
     :param connection: an optional email server connection to use to send the emails
     :param backend: if no connection is given, an optional mail backend to use to send the emails
     :param fail_silently: whether any error should be raised, or just be ignored; by default it will raise
-    :param gen_connection_params_function: a function that takes a recipient and generates connection params
+    :param batch_size: the number of emails handed over at once to the connection
+    :param batch_render: whether the template should be rendered only once for all recipients
     """
-    try:
-        iter(recipients)
-    except TypeError:
+    if isinstance(recipients, str) or not hasattr(recipients, "__iter__"):
         recipients = [recipients]
 
     if recipient_type not in ["to", "cc", "bcc"]:
@@ -135,39 +309,15 @@ def send_mosaico_email(
             "unsubscribe"
         )
 
-    link_bindings = {
-        key: value for key, value in bindings.items() if is_front_url(value)
-    }
-
-    html_template = loader.get_template(f"mail_templates/{code}.html")
-    try:
-        text_template = loader.get_template(f"mail_templates/{code}.txt")
-    except TemplateDoesNotExist:
-        text_template = None
+    start = time.monotonic()
+    renderer = MosaicoRenderer(code, bindings, batch=batch_render)
+    sent = 0
 
     with connection:
-        for recipient in recipients:
-            # recipient can be either a Person or an email address
-            if isinstance(recipient, Person):
-                connection_params = generate_token_params(recipient)
-                for key, value in link_bindings.items():
-                    if isinstance(value, AutoLoginUrl):
-                        bindings[key] = add_params_to_urls(value, connection_params)
-                bindings["MERGE_LOGIN"] = urlencode(connection_params)
-
-            if isinstance(recipient, Person):
-                context = get_context_from_bindings(code, recipient, bindings)
-            else:
-                context = dict(bindings)
+        messages = []
 
-            html_message = html_template.render(context=context)
-            text_message = (
-                text_template.render(
-                    context={k: conditional_html_to_text(v) for k, v in context.items()}
-                )
-                if text_template
-                else generate_plain_text(html_message)
-            )
+        for recipient in recipients:
+            html_message, text_message = renderer.render(recipient)
 
             email = EmailMultiAlternatives(
                 subject=subject,
@@ -190,7 +340,24 @@ def send_mosaico_email(
                         email.attach(**attachment)
                     else:
                         email.attach(*attachment)
-            email.send(fail_silently=fail_silently)
+            messages.append(email)
+
+            if len(messages) >= batch_size:
+                connection.send_messages(messages)
+                sent += len(messages)
+                messages = []
+
+        if messages:
+            connection.send_messages(messages)
+            sent += len(messages)
+
+    duration = time.monotonic() - start
+    metrics.mosaico_emails_sent.labels(code).inc(sent)
+    metrics.mosaico_emails_duration.labels(code).inc(duration)
+    if sent and duration:
+        logger.debug(
+            f"{code} : {sent} emails envoyés en {duration:.2f}s ({sent / duration:.0f}/s)"
+        )
 
 
 def fetch_mosaico_template(url):
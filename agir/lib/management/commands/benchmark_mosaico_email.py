@@ -0,0 +1,95 @@
+import timeit
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from faker import Faker
+
+from agir.lib.mailing import send_mosaico_email
+from agir.lib.utils import front_url
+from agir.people.models import Person
+
+fake = Faker("fr_FR")
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit d'envoi des emails Mosaico avec et sans rendu unique du "
+        "gabarit, avec le backend email en mémoire. Les personnes générées sont "
+        "supprimées à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-c",
+            "--code",
+            dest="code",
+            default="GROUP_SOMEONE_JOINED_NOTIFICATION",
+            help="Code du gabarit Mosaico à utiliser.",
+        )
+        parser.add_argument(
+            "-n",
+            "--recipients",
+            type=int,
+            dest="recipients",
+            default=1000,
+            help="Nombre de destinataires.",
+        )
+        parser.add_argument(
+            "-r",
+            "--repeat",
+            type=int,
+            dest="repeat",
+            default=3,
+            help="Nombre de répétitions de chaque envoi.",
+        )
+
+    def send(self, code, recipients, batch_render):
+        connection = get_connection("django.core.mail.backends.locmem.EmailBackend")
+        send_mosaico_email(
+            code=code,
+            subject="Test de débit",
+            from_email=settings.EMAIL_FROM,
+            recipients=recipients,
+            bindings={
+                "GROUP_NAME": "Groupe de test",
+                "PERSON_INFORMATION": "Une personne",
+                "MANAGE_GROUP_LINK": front_url("dashboard"),
+            },
+            connection=connection,
+            batch_render=batch_render,
+        )
+
+    def handle(self, *args, code, recipients, repeat, **options):
+        if code not in settings.EMAIL_TEMPLATES:
+            raise CommandError(f"Gabarit inconnu : {code}")
+
+        try:
+            with transaction.atomic():
+                people = [
+                    Person.objects.create_person(email=f"{i}-{fake.email()}")
+                    for i in range(recipients)
+                ]
+
+                for batch_render in (False, True):
+                    duration = min(
+                        timeit.repeat(
+                            lambda: self.send(code, people, batch_render),
+                            number=1,
+                            repeat=repeat,
+                        )
+                    )
+                    self.stdout.write(
+                        f"{'Rendu unique' if batch_render else 'Rendu individuel'} : "
+                        f"{recipients} emails en {duration:.2f}s, "
+                        f"soit {recipients / duration:.0f} emails/s"
+                    )
+
+                raise Rollback()
+        except Rollback:
+            pass
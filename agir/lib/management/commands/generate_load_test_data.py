@@ -0,0 +1,297 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.gis.geos import Point
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from agir.activity.models import Activity
+from agir.events.models import Event, EventSubtype, OrganizerConfig, RSVP
+from agir.groups.models import SupportGroup, Membership
+from agir.lib.bulk_copy import copy_instances
+from agir.lib.models import LocationMixin
+from agir.people.models import Person, PersonEmail
+
+fake = Faker("fr_FR")
+
+# emprise approximative de la France métropolitaine
+FRANCE_BBOX = (-4.8, 42.3, 8.2, 51.1)
+
+# comptes utilisés par les scénarios locust (voir locustfile.py)
+LOCUST_ACCOUNT_EMAIL = "locust{i}@loadtest.com"
+
+ACTIVITY_TYPES = [
+    t for t in Activity.DISPLAYED_TYPES if t != Activity.TYPE_NEW_MESSAGE
+] + list(Activity.REQUIRED_ACTION_ACTIVITY_TYPES)
+
+
+def random_location():
+    return {
+        "coordinates": Point(
+            random.uniform(FRANCE_BBOX[0], FRANCE_BBOX[2]),
+            random.uniform(FRANCE_BBOX[1], FRANCE_BBOX[3]),
+            srid=4326,
+        ),
+        "coordinates_type": LocationMixin.COORDINATES_EXACT,
+        "location_zip": fake.postcode(),
+        "location_city": fake.city(),
+        "location_country": "FR",
+    }
+
+
+def random_uuid():
+    # contrairement à uuid.uuid4, dépend de la graine de `random` : les identifiants
+    # sont les mêmes d'une exécution à l'autre
+    return uuid.UUID(int=random.getrandbits(128), version=4)
+
+
+def random_past_datetime(now, days):
+    return now - timedelta(seconds=random.randrange(days * 24 * 3600))
+
+
+class Command(BaseCommand):
+    help = (
+        "Remplit la base avec un jeu de données volumineux pour les tests de charge "
+        "(personnes, groupes, événements, adhésions, inscriptions et activités). Les "
+        "lignes sont insérées avec COPY, sans passer par les méthodes save des modèles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--people", type=int, dest="people", default=1_000_000,
+        )
+        parser.add_argument(
+            "--groups", type=int, dest="groups", default=20_000,
+        )
+        parser.add_argument(
+            "--events", type=int, dest="events", default=50_000,
+        )
+        parser.add_argument(
+            "--members-per-group",
+            type=int,
+            dest="members_per_group",
+            default=30,
+            help="Nombre maximum de membres par groupe.",
+        )
+        parser.add_argument(
+            "--rsvps-per-event",
+            type=int,
+            dest="rsvps_per_event",
+            default=30,
+            help="Nombre maximum d'inscriptions par événement.",
+        )
+        parser.add_argument(
+            "--activities", type=int, dest="activities", default=2_000_000,
+        )
+        parser.add_argument(
+            "--accounts",
+            type=int,
+            dest="accounts",
+            default=1000,
+            help="Nombre de comptes utilisés par les scénarios locust.",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            dest="seed",
+            default=0,
+            help="Graine du générateur aléatoire, pour obtenir des jeux de données reproductibles.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, dest="batch_size", default=10_000,
+        )
+
+    def log_copy(self, model, instances):
+        start = time.perf_counter()
+        count = copy_instances(model, instances, batch_size=self.batch_size)
+        self.stdout.write(
+            f"{model._meta.verbose_name_plural} : {count} lignes insérées en "
+            f"{time.perf_counter() - start:.1f} s"
+        )
+
+    def create_accounts(self, accounts):
+        pks = []
+        for i in range(accounts):
+            email = LOCUST_ACCOUNT_EMAIL.format(i=i)
+            try:
+                person = Person.objects.get_by_natural_key(email)
+            except Person.DoesNotExist:
+                person = Person.objects.create_insoumise(
+                    email, create_role=True, id=random_uuid(), **random_location()
+                )
+            pks.append(person.pk)
+        return pks
+
+    def generate_people(self, pks):
+        for pk in pks:
+            first_name, last_name = fake.first_name(), fake.last_name()
+            yield Person(
+                id=pk,
+                first_name=first_name,
+                last_name=last_name,
+                display_name=f"{first_name} {last_name[0]}.",
+                is_insoumise=True,
+                created=random_past_datetime(self.now, 5 * 365),
+                **random_location(),
+            )
+
+    def generate_emails(self, pks, offset):
+        for i, pk in enumerate(pks):
+            yield PersonEmail(
+                person_id=pk, address=f"loadtest{offset + i}@loadtest.com", _order=0
+            )
+
+    def generate_groups(self, pks):
+        for pk in pks:
+            yield SupportGroup(
+                id=pk,
+                name=fake.company(),
+                type=SupportGroup.TYPE_LOCAL_GROUP,
+                description=fake.paragraph(),
+                published=True,
+                created=random_past_datetime(self.now, 3 * 365),
+                **random_location(),
+            )
+
+    def generate_memberships(self, group_pks, people_pks, accounts_pks, max_members):
+        # chaque compte locust est membre de quelques groupes
+        extra_members = {}
+        for pk in accounts_pks:
+            for group_pk in random.sample(group_pks, min(3, len(group_pks))):
+                extra_members.setdefault(group_pk, set()).add(pk)
+
+        for group_pk in group_pks:
+            members = set(random.sample(people_pks, random.randint(1, max_members)))
+            members |= extra_members.get(group_pk, set())
+
+            for i, person_pk in enumerate(members):
+                yield Membership(
+                    supportgroup_id=group_pk,
+                    person_id=person_pk,
+                    membership_type=Membership.MEMBERSHIP_TYPE_REFERENT
+                    if i == 0
+                    else Membership.MEMBERSHIP_TYPE_MEMBER,
+                )
+
+    def generate_events(self, pks, subtype_id):
+        for pk in pks:
+            start_time = self.now + timedelta(
+                minutes=random.randint(-365 * 24 * 60, 90 * 24 * 60)
+            )
+            yield Event(
+                id=pk,
+                name=fake.sentence(nb_words=5),
+                subtype_id=subtype_id,
+                visibility=Event.VISIBILITY_PUBLIC,
+                start_time=start_time,
+                end_time=start_time + timedelta(hours=random.randint(1, 4)),
+                description=fake.paragraph(),
+                location_name=fake.company(),
+                **random_location(),
+            )
+
+    def generate_organizer_configs(self, event_pks, people_pks, group_pks):
+        for event_pk in event_pks:
+            yield OrganizerConfig(
+                event_id=event_pk,
+                person_id=random.choice(people_pks),
+                is_creator=True,
+                as_group_id=random.choice(group_pks)
+                if group_pks and random.random() < 0.5
+                else None,
+            )
+
+    def generate_rsvps(self, event_pks, people_pks, max_rsvps):
+        for event_pk in event_pks:
+            for person_pk in random.sample(people_pks, random.randint(0, max_rsvps)):
+                yield RSVP(
+                    event_id=event_pk,
+                    person_id=person_pk,
+                    guests=random.choice([0, 0, 0, 1, 2]),
+                    status=RSVP.STATUS_CONFIRMED,
+                )
+
+    def generate_activities(self, n, people_pks, event_pks, group_pks):
+        for _ in range(n):
+            yield Activity(
+                type=random.choice(ACTIVITY_TYPES),
+                recipient_id=random.choice(people_pks),
+                status=random.choice(
+                    [
+                        Activity.STATUS_UNDISPLAYED,
+                        Activity.STATUS_DISPLAYED,
+                        Activity.STATUS_INTERACTED,
+                    ]
+                ),
+                timestamp=random_past_datetime(self.now, 365),
+                event_id=random.choice(event_pks) if event_pks else None,
+                supportgroup_id=random.choice(group_pks) if group_pks else None,
+            )
+
+    def handle(
+        self,
+        *args,
+        people,
+        groups,
+        events,
+        members_per_group,
+        rsvps_per_event,
+        activities,
+        accounts,
+        seed,
+        batch_size,
+        **options,
+    ):
+        random.seed(seed)
+        Faker.seed(seed)
+        self.batch_size = batch_size
+        self.now = timezone.now()
+
+        subtype, _ = EventSubtype.objects.get_or_create(
+            label="test-de-charge",
+            defaults={
+                "type": EventSubtype.TYPE_PUBLIC_ACTION,
+                "description": "Test de charge",
+            },
+        )
+
+        accounts_pks = self.create_accounts(accounts)
+        new_people_pks = [random_uuid() for _ in range(people)]
+        people_pks = accounts_pks + new_people_pks
+        group_pks = [random_uuid() for _ in range(groups)]
+        event_pks = [random_uuid() for _ in range(events)]
+
+        offset = Person.objects.count()
+
+        with transaction.atomic():
+            self.log_copy(Person, self.generate_people(new_people_pks))
+            self.log_copy(PersonEmail, self.generate_emails(new_people_pks, offset))
+            self.log_copy(SupportGroup, self.generate_groups(group_pks))
+            self.log_copy(
+                Membership,
+                self.generate_memberships(
+                    group_pks,
+                    people_pks,
+                    accounts_pks,
+                    min(members_per_group, len(people_pks)),
+                ),
+            )
+            self.log_copy(Event, self.generate_events(event_pks, subtype.id))
+            self.log_copy(
+                OrganizerConfig,
+                self.generate_organizer_configs(event_pks, people_pks, group_pks),
+            )
+            self.log_copy(
+                RSVP,
+                self.generate_rsvps(
+                    event_pks, people_pks, min(rsvps_per_event, len(people_pks))
+                ),
+            )
+            self.log_copy(
+                Activity,
+                self.generate_activities(activities, people_pks, event_pks, group_pks),
+            )
@@ -0,0 +1,52 @@
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Q
+
+from agir.lib.models import LocationMixin
+from agir.lib.tasks import schedule_batch_geocoding
+
+
+class Command(BaseCommand):
+    help = "Géocode par lots les éléments d'un modèle (par exemple people.Person)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", help="Le modèle, au format app_label.Model")
+        parser.add_argument(
+            "-n",
+            "--not-found",
+            action="store_true",
+            dest="not_found",
+            default=False,
+            help="Réessaye aussi les éléments dont la position n'avait pas été trouvée.",
+        )
+        parser.add_argument(
+            "-a",
+            "--all",
+            action="store_true",
+            dest="geocode_all",
+            default=False,
+            help="Géocode à nouveau tous les éléments qui n'ont pas été positionnés manuellement.",
+        )
+        parser.add_argument(
+            "-b", "--batch-size", type=int, dest="batch_size", default=None
+        )
+
+    def handle(self, *args, model, not_found, geocode_all, batch_size, **options):
+        try:
+            model = apps.get_model(model)
+        except (LookupError, ValueError):
+            raise CommandError(f"Modèle inconnu : {model}")
+
+        if not issubclass(model, LocationMixin):
+            raise CommandError("Ce modèle n'a pas de localisation.")
+
+        qs = model.objects.exclude(coordinates_type=LocationMixin.COORDINATES_MANUAL)
+
+        if not geocode_all:
+            condition = Q(coordinates_type__isnull=True)
+            if not_found:
+                condition |= Q(coordinates_type=LocationMixin.COORDINATES_NOT_FOUND)
+            qs = qs.filter(condition)
+
+        tasks = schedule_batch_geocoding(qs, batch_size=batch_size)
+        self.stdout.write(f"{tasks} lots de géocodage lancés.")
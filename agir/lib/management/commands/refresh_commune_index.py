@@ -0,0 +1,13 @@
+from django.core.management import BaseCommand
+
+from agir.lib.geo_index import invalidate_commune_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Force la reconstruction de l'index des communes dans tous les processus "
+        "(à lancer après une mise à jour de data_france)"
+    )
+
+    def handle(self, *args, **options):
+        invalidate_commune_index()
@@ -0,0 +1,98 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.core.management import BaseCommand, CommandError
+from django.db import connections
+from stdimage.utils import render_variations
+from tqdm import tqdm
+
+from agir.lib.images import ASYNC_IMAGE_FIELDS
+
+
+def render_image(args):
+    file_name, variations, replace = args
+    try:
+        # l'image originale n'est pas réencodée : la rotation et le retrait des
+        # données EXIF sont faits lors du téléversement
+        render_variations(file_name, variations, replace=replace)
+    except Exception as e:
+        return f"{file_name} : {e}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Rend les variations des images existantes, en répartissant le travail sur "
+        "plusieurs processus."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-f",
+            "--field",
+            action="append",
+            dest="fields",
+            help="Champ à traiter, sous la forme app_label.Model.champ (par défaut, "
+            "tous les champs dont les variations sont rendues de façon asynchrone).",
+        )
+        parser.add_argument(
+            "-p",
+            "--processes",
+            type=int,
+            dest="processes",
+            default=os.cpu_count(),
+            help="Nombre de processus à utiliser.",
+        )
+        parser.add_argument(
+            "-r",
+            "--replace",
+            action="store_true",
+            dest="replace",
+            help="Rendre à nouveau les variations qui existent déjà.",
+        )
+
+    def get_fields(self, fields):
+        if not fields:
+            return ASYNC_IMAGE_FIELDS
+
+        fields = [tuple(f.rsplit(".", 1)) for f in fields]
+        if any(len(f) != 2 or "." not in f[0] for f in fields):
+            raise CommandError(
+                "Les champs doivent être de la forme app_label.Model.champ"
+            )
+
+        return fields
+
+    def handle(self, *args, fields, processes, replace, **options):
+        images = []
+
+        for model_label, field_name in self.get_fields(fields):
+            model = apps.get_model(model_label)
+            variations = model._meta.get_field(field_name).variations
+            images.extend(
+                (file_name, variations, replace)
+                for file_name in model.objects.exclude(**{field_name: ""})
+                .exclude(**{f"{field_name}__isnull": True})
+                .values_list(field_name, flat=True)
+                .iterator()
+            )
+
+        # les processus fils ne doivent pas hériter des connexions à la base de données
+        connections.close_all()
+
+        errors = []
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for error in tqdm(
+                executor.map(render_image, images, chunksize=16),
+                total=len(images),
+                disable=options["verbosity"] == 0,
+            ):
+                if error is not None:
+                    errors.append(error)
+
+        for error in errors:
+            self.stderr.write(error)
+
+        self.stdout.write(
+            f"{len(images) - len(errors)} images traitées, {len(errors)} erreurs."
+        )
@@ -0,0 +1,102 @@
+import json
+import statistics
+import timeit
+
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+
+from agir.lib.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = (
+        "Lance les micro-benchmarks des chemins critiques (sérialiseurs, géographie, "
+        "recherche), et compare éventuellement les résultats à ceux d'une exécution "
+        "précédente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "names",
+            nargs="*",
+            help="Préfixes des benchmarks à lancer (par défaut, tous).",
+        )
+        parser.add_argument(
+            "-r",
+            "--repeat",
+            type=int,
+            dest="repeat",
+            default=7,
+            help="Nombre de mesures par benchmark.",
+        )
+        parser.add_argument(
+            "-o",
+            "--output",
+            dest="output",
+            help="Fichier JSON dans lequel enregistrer les résultats.",
+        )
+        parser.add_argument(
+            "-c",
+            "--compare",
+            dest="compare",
+            help="Fichier JSON des résultats d'une exécution précédente.",
+        )
+        parser.add_argument(
+            "-t",
+            "--threshold",
+            type=float,
+            dest="threshold",
+            default=0.2,
+            help="Ralentissement relatif au-delà duquel un benchmark est considéré "
+            "comme une régression (0.2 pour 20 %%).",
+        )
+
+    def run_benchmark(self, name, repeat):
+        f = BENCHMARKS[name]()
+        # une première exécution pour remplir les caches
+        f()
+        timings = timeit.repeat(f, number=1, repeat=repeat)
+
+        return {"min": min(timings), "median": statistics.median(timings)}
+
+    def handle(self, *args, names, repeat, output, compare, threshold, **options):
+        selected = [
+            name
+            for name in BENCHMARKS
+            if not names or any(name.startswith(prefix) for prefix in names)
+        ]
+        if not selected:
+            raise CommandError("Aucun benchmark ne correspond.")
+
+        baseline = {}
+        if compare:
+            with open(compare) as f:
+                baseline = json.load(f)["results"]
+
+        results = {}
+        regressions = []
+        for name in selected:
+            results[name] = result = self.run_benchmark(name, repeat)
+
+            line = f"{name:<30} {result['min'] * 1000:>10.2f} ms (min) {result['median'] * 1000:>10.2f} ms (médiane)"
+            if name in baseline:
+                change = result["min"] / baseline[name]["min"] - 1
+                line += f" {change:>+8.1%}"
+                if change > threshold:
+                    regressions.append(name)
+                    line += " RÉGRESSION"
+            self.stdout.write(line)
+
+        if output:
+            with open(output, "w") as f:
+                json.dump(
+                    {"date": timezone.now().isoformat(), "results": results},
+                    f,
+                    indent=2,
+                )
+
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} régression(s) au-delà de {threshold:.0%} : "
+                + ", ".join(regressions)
+            )
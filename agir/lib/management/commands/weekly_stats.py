@@ -5,7 +5,7 @@ from django.utils import timezone
 from django.utils.formats import date_format
 from nuntius.models import Campaign
 
-from ...stats import *
+from agir.statistics.actions import get_period_stats, get_latest_instant_stats
 
 
 class Command(BaseCommand):
@@ -24,10 +24,11 @@ class Command(BaseCommand):
         last_week_start = start - timezone.timedelta(days=7)
         twelveweeksago = start - timezone.timedelta(days=7 * 12)
 
-        instant_stats = get_instant_stats()
-        main_week_stats = get_general_stats(start, end)
-        previous_week_stats = get_general_stats(last_week_start, start)
-        twelveweeksstats = get_general_stats(twelveweeksago, end)
+        # les statistiques des semaines passées sont relues si elles ont déjà été calculées
+        instant_stats = get_latest_instant_stats()
+        main_week_stats = get_period_stats(start, end)
+        previous_week_stats = get_period_stats(last_week_start, start)
+        twelveweeksstats = get_period_stats(twelveweeksago, end)
 
         def print_stock(label, key):
             print(
@@ -0,0 +1,35 @@
+from prometheus_client import Counter, Histogram
+
+mosaico_emails_sent = Counter(
+    "agir_mosaico_emails_sent", "Emails Mosaico envoyés", ["code"]
+)
+mosaico_emails_duration = Counter(
+    "agir_mosaico_emails_duration_seconds",
+    "Temps passé à générer et envoyer les emails Mosaico (le débit en emails par seconde "
+    "s'obtient en divisant agir_mosaico_emails_sent par ce compteur)",
+    ["code"],
+)
+
+# profilage des requêtes (voir agir.lib.profiling)
+view_db_queries = Histogram(
+    "agir_view_db_queries",
+    "Nombre de requêtes SQL par requête HTTP (échantillonnée)",
+    ["view"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+view_db_duration = Histogram(
+    "agir_view_db_duration_seconds",
+    "Temps passé en base de données par requête HTTP (échantillonnée)",
+    ["view"],
+)
+view_repeated_queries = Counter(
+    "agir_view_repeated_queries",
+    "Exécutions de requêtes SQL identiques répétées au-delà du seuil, symptôme de "
+    "requêtes N+1",
+    ["view"],
+)
+serializer_method_field_duration = Histogram(
+    "agir_serializer_method_field_duration_seconds",
+    "Temps total passé dans un SerializerMethodField par requête HTTP (échantillonnée)",
+    ["serializer", "field"],
+)
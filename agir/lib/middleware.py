@@ -1,7 +1,9 @@
+import random
 import re
 from urllib.parse import urljoin
 
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.utils.http import urlquote
 
 
@@ -49,3 +51,31 @@ class NoVaryCookieMiddleWare:
             del response["Vary"]
 
         return response
+
+
+class ProfilingMiddleware:
+    """Profile une fraction des requêtes et exporte les mesures vers Prometheus
+
+    Voir `agir.lib.profiling`. La proportion de requêtes profilées est fixée par le
+    paramètre PROFILING_SAMPLE_RATE ; le middleware est désactivé s'il vaut 0.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_SAMPLE_RATE:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from agir.lib.profiling import profile_request, record_profile
+
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        with profile_request() as profile:
+            response = self.get_response(request)
+
+        resolver_match = getattr(request, "resolver_match", None)
+        view_name = resolver_match.view_name if resolver_match else "<unresolved>"
+        record_profile(view_name, profile)
+
+        return response
@@ -19,6 +19,7 @@ from agir.lib.data import departement_from_zipcode, FRANCE_COUNTRY_CODES
 from .form_fields import RichEditorWidget, AdminRichEditorWidget
 from .html import sanitize_html
 from .display import display_address
+from .images import render_variations_async
 
 
 RE_FRENCH_ZIPCODE = re.compile("^[0-9]{5}$")
@@ -396,6 +397,7 @@ class ImageMixin(models.Model):
         _("image"),
         upload_to=banner_path,
         variations=settings.BANNER_CONFIG,
+        render_variations=render_variations_async,
         blank=True,
         help_text=_(
             "Vous pouvez ajouter une image de bannière : elle apparaîtra sur la page, et sur les réseaux"
@@ -1,17 +1,151 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from collections import OrderedDict
 
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
-class APIPaginator(PageNumberPagination):
+def estimate_count(model):
+    """Renvoie une estimation du nombre de lignes de la table du modèle
+
+    L'estimation est celle des statistiques de PostgreSQL, mise à jour à chaque VACUUM
+    ou ANALYZE : elle ne coûte rien, contrairement à un COUNT(*) sur toute la table.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+
+    # reltuples vaut -1 pour une table qui n'a jamais été analysée
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class KeysetPaginationMixin:
+    """Ajoute un mode de pagination par curseur à une pagination par numéro de page
+
+    Ce mode est utilisé dès que le paramètre `cursor` est présent dans la requête (vide
+    pour la première page). Les éléments sont alors triés selon un couple de champs
+    (par défaut `created` puis `pk`, ou l'attribut `keyset_ordering` de la vue), et
+    chaque page est obtenue en filtrant sur les valeurs du dernier élément de la page
+    précédente : contrairement à un OFFSET, le coût d'une page ne dépend pas de sa
+    position, et aucun COUNT(*) n'est fait.
+    """
+
+    cursor_query_param = "cursor"
+    keyset_ordering = ("created", "pk")
+    invalid_cursor_message = _("Curseur invalide")
+
+    keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view=view)
+
+        self.keyset = True
+        self.request = request
+        self.keyset_page_size = self.get_page_size(request)
+        self.ordering = getattr(view, "keyset_ordering", self.keyset_ordering)
+
+        position = self.decode_cursor(
+            queryset.model, request.query_params[self.cursor_query_param]
+        )
+
+        # le total estimé n'a de sens que pour la table entière
+        self.estimated_total = (
+            None if queryset.query.where else estimate_count(queryset.model)
+        )
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = self.filter_after(queryset, position)
+
+        results = list(queryset[: self.keyset_page_size + 1])
+        self.next_position = None
+        if len(results) > self.keyset_page_size:
+            results = results[: self.keyset_page_size]
+            self.next_position = [
+                getattr(results[-1], field.lstrip("-")) for field in self.ordering
+            ]
+
+        return results
+
+    def filter_after(self, queryset, position):
+        (field, pk_field), (value, pk) = self.ordering, position
+        descending = field.startswith("-")
+        field, pk_field = field.lstrip("-"), pk_field.lstrip("-")
+
+        # équivalent de (field, pk) > (value, pk) qui permet à PostgreSQL de parcourir
+        # l'index à partir de la position du curseur
+        return queryset.filter(
+            **{f"{field}__{'lte' if descending else 'gte'}": value}
+        ).exclude(**{field: value, f"{pk_field}__{'gte' if descending else 'lte'}": pk})
+
+    def encode_cursor(self, position):
+        return urlsafe_b64encode(
+            json.dumps([str(value) for value in position]).encode()
+        ).decode()
+
+    def decode_cursor(self, model, cursor):
+        if not cursor:
+            return None
+
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()))
+            fields = [
+                model._meta.pk
+                if name.lstrip("-") == "pk"
+                else model._meta.get_field(name.lstrip("-"))
+                for name in self.ordering
+            ]
+            if len(values) != len(fields):
+                raise ValueError()
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        return self.get_keyset_paginated_response(data)
+
+    def get_keyset_paginated_response(self, data):
+        content = OrderedDict()
+        if self.estimated_total is not None:
+            content["estimated_count"] = self.estimated_total
+        content["next"] = self.get_next_cursor_link()
+        content["results"] = data
+
+        return Response(content)
+
+
+class APIPaginator(KeysetPaginationMixin, PageNumberPagination):
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 100
 
 
-class LegacyPaginator(PageNumberPagination):
+class LegacyPaginator(KeysetPaginationMixin, PageNumberPagination):
     """
     A legacy paginator that mocks the one from Eve Python
     """
@@ -21,6 +155,9 @@ class LegacyPaginator(PageNumberPagination):
     max_page_size = 100
 
     def get_paginated_response(self, data):
+        if self.keyset:
+            return self.get_keyset_paginated_response(data)
+
         links = OrderedDict()
         if self.page.has_next():
             links["next"] = OrderedDict(
@@ -42,3 +179,19 @@ class LegacyPaginator(PageNumberPagination):
         return Response(
             OrderedDict([("_items", data), ("_links", links), ("_meta", meta)])
         )
+
+    def get_keyset_paginated_response(self, data):
+        links = OrderedDict()
+        if self.next_position is not None:
+            links["next"] = OrderedDict(
+                [("href", self.get_next_cursor_link()), ("title", _("page suivante"))]
+            )
+
+        meta = OrderedDict([("max_results", self.keyset_page_size)])
+        if self.estimated_total is not None:
+            meta["total"] = self.estimated_total
+            meta["total_is_estimate"] = True
+
+        return Response(
+            OrderedDict([("_items", data), ("_links", links), ("_meta", meta)])
+        )
@@ -0,0 +1,104 @@
+"""Profilage léger des requêtes, exporté vers Prometheus
+
+Pour une fraction des requêtes (paramètre PROFILING_SAMPLE_RATE), le middleware
+`ProfilingMiddleware` compte les requêtes SQL et le temps passé en base de données, et
+chronomètre les `SerializerMethodField`. Les requêtes SQL exécutées de nombreuses fois
+avec le même texte (donc avec des paramètres différents) sont signalées : c'est le
+symptôme habituel d'un problème de requêtes N+1.
+"""
+import logging
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.fields import SerializerMethodField
+
+from agir.lib import metrics
+
+logger = logging.getLogger(__name__)
+
+_current_profile = ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.db_duration = 0.0
+        self.fingerprints = Counter()
+        self.method_fields = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_duration += perf_counter() - start
+            # le texte SQL utilise des paramètres : il sert directement d'empreinte
+            self.fingerprints[sql] += 1
+
+    def repeated_queries(self, threshold):
+        return {sql: n for sql, n in self.fingerprints.items() if n >= threshold}
+
+
+@contextmanager
+def profile_request():
+    profile = RequestProfile()
+    token = _current_profile.set(profile)
+
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+def record_profile(view_name, profile):
+    metrics.view_db_queries.labels(view_name).observe(profile.queries)
+    metrics.view_db_duration.labels(view_name).observe(profile.db_duration)
+
+    for (serializer, field), duration in profile.method_fields.items():
+        metrics.serializer_method_field_duration.labels(serializer, field).observe(
+            duration
+        )
+
+    repeated = profile.repeated_queries(settings.PROFILING_REPEATED_QUERY_THRESHOLD)
+    for sql, count in repeated.items():
+        metrics.view_repeated_queries.labels(view_name).inc(count)
+        logger.warning(
+            "Requête répétée %d fois dans la vue %s : %s",
+            count,
+            view_name,
+            sql,
+            extra={"view": view_name},
+        )
+
+
+def install_serializer_profiling():
+    """Chronomètre les SerializerMethodField pendant les requêtes profilées
+
+    Hors des requêtes profilées, le coût se limite à la lecture d'une ContextVar.
+    """
+    original = SerializerMethodField.to_representation
+
+    @wraps(original)
+    def to_representation(self, value):
+        profile = _current_profile.get()
+        if profile is None:
+            return original(self, value)
+
+        start = perf_counter()
+        try:
+            return original(self, value)
+        finally:
+            profile.method_fields[(type(self.parent).__name__, self.field_name)] += (
+                perf_counter() - start
+            )
+
+    SerializerMethodField.to_representation = to_representation
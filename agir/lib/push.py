@@ -0,0 +1,259 @@
+"""Canal de notifications en temps réel (Server-Sent Events)
+
+Les événements (nouveau message ou commentaire dans un groupe, nouvelle activité)
+sont publiés sur des canaux Redis après la validation de la transaction en cours :
+
+- `push:person:<id>` pour les événements destinés à une personne ;
+- `push:group:<id>` pour ceux destinés à tous les membres d'un groupe.
+
+Le point d'entrée ASGI (voir `agir.api.asgi`), servi par un processus distinct du
+reste du site, sert sur `PUSH_PATH` un flux `text/event-stream` qui relaie les
+événements des canaux de la personne connectée et de ses groupes. Lorsque la personne
+rejoint ou quitte un groupe, l'événement interne `EVENT_SUBSCRIPTIONS` publié sur son
+canal fait recalculer la liste des canaux de chacune de ses connexions. Dans chaque processus, un unique thread est abonné à tous les canaux
+et répartit les messages entre les connexions ouvertes : le nombre de connexions Redis
+ne dépend pas du nombre de clients.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import partial
+from http.cookies import SimpleCookie
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections, transaction
+from django.http import HttpRequest
+
+from agir.api.redis import get_auth_redis_client
+
+PUSH_PATH = "/api/flux/"
+CHANNEL_PREFIX = "push:"
+
+EVENT_ACTIVITY = "activity"
+EVENT_NEW_MESSAGE = "new-message"
+EVENT_NEW_COMMENT = "new-comment"
+# événement interne, qui n'est pas transmis au client
+EVENT_SUBSCRIPTIONS = "subscriptions"
+
+
+def person_channel(person_id):
+    return f"{CHANNEL_PREFIX}person:{person_id}"
+
+
+def group_channel(group_id):
+    return f"{CHANNEL_PREFIX}group:{group_id}"
+
+
+def send_events(events):
+    """Publie immédiatement les événements
+
+    :param events: itérable de triplets (canal, type d'événement, données)
+    """
+    pipeline = get_auth_redis_client().pipeline(transaction=False)
+    for channel, event_type, data in events:
+        pipeline.publish(
+            channel, json.dumps({"type": event_type, "data": data}, default=str)
+        )
+    pipeline.execute()
+
+
+def publish(events):
+    """Publie les événements une fois la transaction en cours validée"""
+    events = list(events)
+    if events:
+        transaction.on_commit(partial(send_events, events))
+
+
+def publish_to_person(person_id, event_type, **data):
+    publish([(person_channel(person_id), event_type, data)])
+
+
+def publish_to_group(group_id, event_type, **data):
+    publish([(group_channel(group_id), event_type, data)])
+
+
+def format_event(event):
+    """Met en forme un événement publié sur Redis au format Server-Sent Events"""
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n".encode()
+
+
+class PushHub:
+    """Répartit les messages des canaux Redis entre les connexions du processus
+
+    Le thread d'écoute est démarré à la première connexion.
+    """
+
+    def __init__(self):
+        self.queues = defaultdict(set)
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def subscribe(self, channels, loop, queue=None):
+        if queue is None:
+            queue = asyncio.Queue()
+        with self.lock:
+            for channel in channels:
+                self.queues[channel].add((queue, loop))
+
+            if self.thread is None or not self.thread.is_alive():
+                ready = threading.Event()
+                self.thread = threading.Thread(
+                    target=self.listen, args=(ready,), daemon=True
+                )
+                self.thread.start()
+                ready.wait(timeout=5)
+        return queue
+
+    def unsubscribe(self, channels, queue, loop):
+        with self.lock:
+            for channel in channels:
+                self.queues[channel].discard((queue, loop))
+                if not self.queues[channel]:
+                    del self.queues[channel]
+
+    def listen(self, ready):
+        pubsub = get_auth_redis_client().pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+        # on attend la confirmation de l'abonnement, pour ne pas perdre les messages
+        # publiés juste après la première connexion
+        pubsub.get_message(ignore_subscribe_messages=False, timeout=5)
+        ready.set()
+
+        for message in pubsub.listen():
+            channel = message["channel"].decode()
+            with self.lock:
+                receivers = list(self.queues.get(channel, ()))
+            for queue, loop in receivers:
+                loop.call_soon_threadsafe(queue.put_nowait, message["data"])
+
+
+hub = PushHub()
+
+
+def get_subscriptions(headers):
+    """Renvoie les canaux de la personne authentifiée par le cookie de session
+
+    Renvoie une liste vide si la requête n'est pas authentifiée.
+    """
+    from agir.groups.models import Membership
+    from agir.people.models import Person
+
+    close_old_connections()
+    try:
+        cookies = SimpleCookie()
+        for name, value in headers:
+            if name == b"cookie":
+                cookies.load(value.decode("latin-1"))
+
+        session_cookie = cookies.get(settings.SESSION_COOKIE_NAME)
+        if session_cookie is None:
+            return []
+
+        request = HttpRequest()
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore(
+            session_cookie.value
+        )
+        user = get_user(request)
+        if not user.is_authenticated:
+            return []
+
+        person_id = (
+            Person.objects.filter(role_id=user.pk).values_list("pk", flat=True).first()
+        )
+        if person_id is None:
+            return []
+
+        return [person_channel(person_id)] + [
+            group_channel(group_id)
+            for group_id in Membership.objects.filter(person_id=person_id).values_list(
+                "supportgroup_id", flat=True
+            )
+        ]
+    finally:
+        close_old_connections()
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def push_application(scope, receive, send):
+    """Application ASGI servant le flux d'événements de la personne connectée"""
+    channels = await sync_to_async(get_subscriptions)(scope["headers"])
+
+    if not channels:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 401,
+                "headers": [(b"content-type", b"text/plain")],
+            }
+        )
+        await send({"type": "http.response.body", "body": b""})
+        return
+
+    loop = asyncio.get_event_loop()
+    queue = hub.subscribe(channels, loop)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    # désactive la mise en tampon par nginx
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        await send(
+            {
+                "type": "http.response.body",
+                "body": b"retry: 5000\n\n",
+                "more_body": True,
+            }
+        )
+
+        while not disconnected.done():
+            next_message = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                [next_message, disconnected],
+                timeout=settings.PUSH_KEEPALIVE_INTERVAL,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+
+            if next_message in done:
+                event = json.loads(next_message.result())
+                if event["type"] == EVENT_SUBSCRIPTIONS:
+                    new_channels = await sync_to_async(get_subscriptions)(
+                        scope["headers"]
+                    )
+                    hub.subscribe(set(new_channels) - set(channels), loop, queue)
+                    hub.unsubscribe(set(channels) - set(new_channels), queue, loop)
+                    channels = new_channels
+                    if not channels:
+                        # la session a expiré entre temps
+                        break
+                    continue
+                body = format_event(event)
+            else:
+                next_message.cancel()
+                if disconnected in done:
+                    break
+                # commentaire SSE, pour que les proxys ne ferment pas la connexion
+                body = b": keepalive\n\n"
+
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+    finally:
+        disconnected.cancel()
+        hub.unsubscribe(channels, queue, loop)
@@ -0,0 +1,217 @@
+"""Budgets de requêtes SQL par vue
+
+Le lanceur de tests (voir `agir.api.test_runner`) appelle chacune des vues enregistrées
+ici sur les données de `load_fake_data` complétées par des groupes, événements,
+messages et activités (voir `grow_fake_data`), puis de nouveau après avoir ajouté une
+seconde série de ces objets. Le test échoue si l'une des mesures dépasse le budget de
+la vue, ou si le nombre de requêtes SQL a changé entre les deux mesures : c'est ainsi
+que se manifestent les requêtes N+1 introduites dans les sérialiseurs. Les requêtes
+répétées sont alors indiquées, et le détail des requêtes de chaque vue est journalisé
+au niveau INFO.
+
+Pour ajouter une vue, il suffit d'appeler `register_query_budget` avec le nom de l'URL,
+le nombre maximal de requêtes mesuré sur ces données, et si nécessaire une fonction qui
+calcule les arguments de l'URL à partir des données de test.
+"""
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from agir.lib.profiling import profile_request
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUDGETS = {}
+
+
+class QueryBudget:
+    def __init__(self, url_name, max_queries, kwargs=None, user="user1", params=None):
+        self.url_name = url_name
+        self.max_queries = max_queries
+        self.kwargs = kwargs
+        self.user = user
+        self.params = params or {}
+
+    def get_url(self, data):
+        return reverse(self.url_name, kwargs=self.kwargs(data) if self.kwargs else None)
+
+
+def register_query_budget(url_name, max_queries, **options):
+    QUERY_BUDGETS[url_name] = QueryBudget(url_name, max_queries, **options)
+
+
+def group_pk(data):
+    return {"pk": data["groups"]["user1_group"].pk}
+
+
+def event_pk(data):
+    return {"pk": data["events"]["user1_event1"].pk}
+
+
+register_query_budget("api_session", 15)
+register_query_budget("api_user_groups", 15)
+register_query_budget("api_group_view", 25, kwargs=group_pk)
+register_query_budget("api_near_groups_view", 15, kwargs=group_pk)
+register_query_budget("api_group_events_view", 20, kwargs=group_pk)
+register_query_budget("api_group_past_events_view", 20, kwargs=group_pk)
+register_query_budget("api_group_upcoming_events_view", 20, kwargs=group_pk)
+register_query_budget("api_group_past_event_reports_view", 20, kwargs=group_pk)
+register_query_budget("api_group_message_list", 20, kwargs=group_pk)
+register_query_budget("api_event_view", 20, kwargs=event_pk)
+register_query_budget("api_event_rsvped", 20)
+register_query_budget("api_event_suggestions", 25)
+register_query_budget("activity:api_user_activities", 15)
+register_query_budget("activity:api_user_required_activities", 15)
+
+
+def grow_fake_data(data, n=3):
+    """Ajoute aux données de `load_fake_data` des objets liés à user1 et à son groupe"""
+    from agir.activity.models import Activity
+    from agir.events.models import Event, OrganizerConfig, RSVP
+    from agir.groups.models import Membership, SupportGroup
+    from agir.msgs.models import SupportGroupMessage, SupportGroupMessageComment
+
+    user1, user2 = data["people"]["user1"], data["people"]["user2"]
+    user1_group = data["groups"]["user1_group"]
+    subtype = data["group_subtypes"]["local_group_default"]
+    now = timezone.now()
+
+    for i in range(n):
+        group = SupportGroup.objects.create(
+            name=f"Autre groupe {i}", coordinates=user1_group.coordinates
+        )
+        subtype.supportgroups.add(group)
+        Membership.objects.create(
+            supportgroup=group,
+            person=user1,
+            membership_type=Membership.MEMBERSHIP_TYPE_MANAGER,
+        )
+        Membership.objects.create(supportgroup=group, person=user2)
+
+        for days in (2 + i, -2 - i):
+            event = Event.objects.create(
+                name=f"Autre événement {i}",
+                start_time=now + timedelta(days=days),
+                end_time=now + timedelta(days=days, hours=1),
+                coordinates=data["events"]["user1_event1"].coordinates,
+                report_content="Compte-rendu" if days < 0 else "",
+            )
+            OrganizerConfig.objects.create(
+                event=event, person=user1, is_creator=True, as_group=user1_group
+            )
+            RSVP.objects.create(person=user1, event=event)
+            RSVP.objects.create(person=user2, event=event)
+
+        message = SupportGroupMessage.objects.create(
+            supportgroup=user1_group, author=user2, text="Message", linked_event=event
+        )
+        SupportGroupMessageComment.objects.create(
+            message=message, author=user1, text="Commentaire"
+        )
+
+        Activity.objects.create(
+            type=Activity.TYPE_NEW_MEMBER,
+            recipient=user1,
+            individual=user2,
+            supportgroup=group,
+        )
+        Activity.objects.create(
+            type=Activity.TYPE_NEW_REPORT, recipient=user1, event=event,
+        )
+
+
+def format_report(budget, url, profile, limit=5, detailed=False):
+    """Résume les requêtes d'une vue
+
+    Seules les requêtes répétées sont indiquées, sauf si `detailed` est vrai : toutes
+    les empreintes de requêtes sont alors listées.
+    """
+    lines = [
+        f"{budget.url_name} ({url}) : {profile.queries} requêtes "
+        f"(budget : {budget.max_queries})."
+    ]
+
+    if detailed:
+        lines.append("Requêtes :")
+        lines.extend(f"  {n} × {sql}" for sql, n in profile.fingerprints.most_common())
+        return "\n".join(lines)
+
+    repeated = [(sql, n) for sql, n in profile.fingerprints.most_common() if n > 1]
+    if repeated:
+        lines.append("Requêtes répétées :")
+        lines.extend(f"  {n} × {sql}" for sql, n in repeated[:limit])
+
+    return "\n".join(lines)
+
+
+class QueryBudgetTestCase(TestCase):
+    """Vérifie que le nombre de requêtes des vues de QUERY_BUDGETS reste dans leur budget
+    et ne dépend pas de la quantité de données
+
+    Une méthode de test est générée pour chaque vue par `build_query_budget_tests`.
+    """
+
+    def setUp(self):
+        from agir.lib.tests.mixins import load_fake_data
+
+        self.data = load_fake_data()
+
+    def profile_view(self, budget):
+        url = budget.get_url(self.data)
+        # le contexte de session, notamment, est mis en cache
+        cache.clear()
+
+        with profile_request() as profile:
+            res = self.client.get(url, budget.params)
+
+        self.assertLess(res.status_code, 400, f"{budget.url_name} ({url})")
+
+        logger.info(format_report(budget, url, profile, detailed=True))
+        return url, profile
+
+    def check_budget(self, budget):
+        if budget.user:
+            self.client.force_login(self.data["people"][budget.user].role)
+
+        # les listes vides ne déclenchent pas les requêtes de préchargement : les deux
+        # mesures sont donc faites après avoir ajouté des données. Une première
+        # requête remplit les caches propres au processus (types de contenus, etc.)
+        grow_fake_data(self.data)
+        self.client.get(budget.get_url(self.data), budget.params)
+        url, profile = self.profile_view(budget)
+
+        grow_fake_data(self.data)
+        more_url, more_profile = self.profile_view(budget)
+
+        for measure_url, measure in ((url, profile), (more_url, more_profile)):
+            if measure.queries > budget.max_queries:
+                self.fail(
+                    "Budget de requêtes dépassé\n"
+                    + format_report(budget, measure_url, measure, detailed=True)
+                )
+
+        if more_profile.queries != profile.queries:
+            self.fail(
+                "Le nombre de requêtes dépend de la quantité de données\n"
+                f"{format_report(budget, url, profile)}\n"
+                f"{format_report(budget, more_url, more_profile)}"
+            )
+
+
+def build_query_budget_tests():
+    """Renvoie la liste des tests de budget, un par vue enregistrée"""
+    attrs = {}
+
+    for url_name, budget in QUERY_BUDGETS.items():
+        method_name = "test_" + url_name.replace(":", "_")
+        attrs[method_name] = (lambda budget: lambda self: self.check_budget(budget))(
+            budget
+        )
+
+    test_case = type("QueryBudgetTestCase", (QueryBudgetTestCase,), attrs)
+
+    return [test_case(name) for name in attrs]
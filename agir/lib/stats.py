@@ -1,7 +1,7 @@
 from datetime import timedelta
 
 from django.conf import settings
-from django.db.models import Count
+from django.db.models import Count, Q
 from django.utils.timezone import now
 from nuntius.models import CampaignSentEvent
 
@@ -9,94 +9,104 @@ from agir.people.models import Person
 from agir.groups.models import SupportGroup, Membership
 from agir.events.models import Event, EventSubtype
 
+__all__ = ["get_general_stats", "get_events_by_subtype", "get_instant_stats"]
+
+
+def _count(filter=None, field="id", distinct=False):
+    return Count(field, filter=filter, distinct=distinct)
+
+
+def _rate(numerator, denominator):
+    return numerator / (denominator or 1) * 100
+
 
 def get_general_stats(start, end):
-    nouveaux_soutiens = Person.objects.filter(
+    """Calcule les statistiques de flux sur la période [start, end]
+
+    Chaque table n'est parcourue qu'une seule fois : les différents indicateurs sont
+    calculés par des agrégats conditionnels.
+    """
+    nouveaux_soutiens = Q(
         meta__subscriptions__NSP__date__gt=start.isoformat(),
         meta__subscriptions__NSP__date__lt=end.isoformat(),
     )
 
-    membres_equipes = Person.objects.filter(
-        memberships__supportgroup__type=SupportGroup.TYPE_2022,
-        memberships__supportgroup__published=True,
+    people = Person.objects.filter(
+        nouveaux_soutiens | Q(role__last_login__range=(start, end))
+    ).aggregate(
+        soutiens_NSP=_count(nouveaux_soutiens),
+        soutiens_NSP_insoumis=_count(nouveaux_soutiens & Q(is_insoumise=True)),
+        soutiens_NSP_non_insoumis=_count(nouveaux_soutiens & Q(is_insoumise=False)),
+        ap_users=_count(Q(role__last_login__range=(start, end))),
+        ap_users_LFI=_count(Q(role__last_login__range=(start, end), is_insoumise=True)),
+        ap_users_NSP=_count(
+            Q(role__last_login__range=(start, end), is_insoumise=False, is_2022=True)
+        ),
     )
 
-    ouvert_news = Person.objects.filter(
-        campaignsentevent__datetime__range=(start, end),
-        campaignsentevent__open_count__gt=0,
-        is_2022=True,
+    opened = Q(open_count__gt=0)
+    insoumis = Q(subscriber__is_insoumise=True)
+    non_insoumis = Q(subscriber__is_insoumise=False)
+    news = CampaignSentEvent.objects.filter(
+        subscriber__is_2022=True, datetime__range=(start, end)
+    ).aggregate(
+        news_LFI=_count(opened & insoumis, field="subscriber_id", distinct=True),
+        news_NSP=_count(opened & non_insoumis, field="subscriber_id", distinct=True),
+        envois_LFI=_count(insoumis),
+        ouvertures_LFI=_count(opened & insoumis),
+        envois_NSP=_count(non_insoumis),
+        ouvertures_NSP=_count(opened & non_insoumis),
     )
 
-    ap_users = Person.objects.filter(role__last_login__range=(start, end))
-
-    sent_events = CampaignSentEvent.objects.filter(
-        subscriber__is_2022=True, datetime__range=(start, end)
+    events = Event.objects.filter(
+        visibility=Event.VISIBILITY_PUBLIC, start_time__range=(start, end)
+    ).aggregate(
+        ap_events=_count(),
+        ap_events_LFI=_count(Q(for_users=Event.FOR_USERS_INSOUMIS)),
+        ap_events_NSP=_count(Q(for_users=Event.FOR_USERS_2022)),
     )
 
-    return {
-        "soutiens_NSP": nouveaux_soutiens.count(),
-        "soutiens_NSP_insoumis": nouveaux_soutiens.filter(is_insoumise=True).count(),
-        "soutiens_NSP_non_insoumis": nouveaux_soutiens.filter(
-            is_insoumise=False
-        ).count(),
-        "news_LFI": ouvert_news.filter(is_insoumise=True).distinct().count(),
-        "taux_news_LFI": sent_events.filter(
-            subscriber__is_insoumise=True, open_count__gt=0,
-        ).count()
-        / (sent_events.filter(subscriber__is_insoumise=True).count() or 1)
-        * 100,
-        "news_NSP": ouvert_news.filter(is_insoumise=False).distinct().count(),
-        "taux_news_NSP": sent_events.filter(
-            subscriber__is_insoumise=False, open_count__gt=0,
-        ).count()
-        / (sent_events.filter(subscriber__is_insoumise=False,).count() or 1)
-        * 100,
-        "ap_users": ap_users.count(),
-        "ap_users_LFI": ap_users.filter(is_insoumise=True).count(),
-        "ap_users_NSP": ap_users.filter(is_insoumise=False, is_2022=True).count(),
-        "ap_events": Event.objects.filter(
-            visibility=Event.VISIBILITY_PUBLIC, start_time__range=(start, end)
-        ).count(),
-        "ap_events_LFI": Event.objects.filter(
-            visibility=Event.VISIBILITY_PUBLIC,
-            for_users=Event.FOR_USERS_INSOUMIS,
-            start_time__range=(start, end),
-        ).count(),
-        "ap_events_NSP": Event.objects.filter(
-            visibility=Event.VISIBILITY_PUBLIC,
-            for_users=Event.FOR_USERS_2022,
-            start_time__range=(start, end),
-        ).count(),
-        "ga_LFI": SupportGroup.objects.active()
-        .filter(type=SupportGroup.TYPE_LOCAL_GROUP, created__range=(start, end))
-        .count(),
-        "equipes_NSP": SupportGroup.objects.active()
-        .filter(type=SupportGroup.TYPE_2022, created__range=(start, end))
-        .count(),
-        "membres_ga_LFI": Person.objects.filter(
-            memberships__supportgroup__type=SupportGroup.TYPE_LOCAL_GROUP,
-            memberships__supportgroup__published=True,
-        )
-        .filter(memberships__created__range=(start, end))
-        .distinct()
-        .count(),
-        "membres_equipes_NSP": membres_equipes.filter(
-            memberships__created__range=(start, end)
+    groups = (
+        SupportGroup.objects.active()
+        .filter(created__range=(start, end))
+        .aggregate(
+            ga_LFI=_count(Q(type=SupportGroup.TYPE_LOCAL_GROUP)),
+            equipes_NSP=_count(Q(type=SupportGroup.TYPE_2022)),
         )
-        .distinct()
-        .count(),
-        "membres_equipes_NSP_insoumis": membres_equipes.filter(
-            memberships__created__range=(start, end)
-        )
-        .filter(is_insoumise=True)
-        .distinct()
-        .count(),
-        "membres_equipes_NSP_non_insoumis": membres_equipes.filter(
-            memberships__created__range=(start, end)
+    )
+
+    equipes = Q(supportgroup__type=SupportGroup.TYPE_2022)
+    members = (
+        Membership.objects.active()
+        .filter(created__range=(start, end))
+        .aggregate(
+            membres_ga_LFI=_count(
+                Q(supportgroup__type=SupportGroup.TYPE_LOCAL_GROUP),
+                field="person_id",
+                distinct=True,
+            ),
+            membres_equipes_NSP=_count(equipes, field="person_id", distinct=True),
+            membres_equipes_NSP_insoumis=_count(
+                equipes & Q(person__is_insoumise=True),
+                field="person_id",
+                distinct=True,
+            ),
+            membres_equipes_NSP_non_insoumis=_count(
+                equipes & Q(person__is_insoumise=False),
+                field="person_id",
+                distinct=True,
+            ),
         )
-        .filter(is_insoumise=False)
-        .distinct()
-        .count(),
+    )
+
+    return {
+        **people,
+        **news,
+        "taux_news_LFI": _rate(news["ouvertures_LFI"], news["envois_LFI"]),
+        "taux_news_NSP": _rate(news["ouvertures_NSP"], news["envois_NSP"]),
+        **events,
+        **groups,
+        **members,
     }
 
 
@@ -109,74 +119,60 @@ def get_events_by_subtype(start, end):
 
 
 def get_instant_stats():
-    return {
-        "soutiens_NSP": Person.objects.filter(is_2022=True).count(),
-        "soutiens_NSP_insoumis": Person.objects.filter(
-            is_2022=True, is_insoumise=True
-        ).count(),
-        "soutiens_NSP_non_insoumis": Person.objects.filter(
-            is_2022=True, is_insoumise=False
-        ).count(),
-        "ga_LFI": SupportGroup.objects.filter(
-            type=SupportGroup.TYPE_LOCAL_GROUP, published=True
-        ).count(),
-        "ga_LFI_certifies": SupportGroup.objects.certified()
-        .filter(published=True)
-        .count(),
-        "equipes_NSP": SupportGroup.objects.active()
-        .filter(type=SupportGroup.TYPE_2022)
-        .count(),
-        "membres_ga_LFI": Person.objects.filter(
-            supportgroups__type=SupportGroup.TYPE_LOCAL_GROUP,
-            supportgroups__published=True,
-        )
-        .distinct()
-        .count(),
-        "membres_ga_LFI_certifies": Person.objects.filter(
-            supportgroups__type=SupportGroup.TYPE_LOCAL_GROUP,
-            supportgroups__subtypes__label__in=settings.CERTIFIED_GROUP_SUBTYPES,
-            supportgroups__published=True,
-        )
-        .distinct()
-        .count(),
-        "membres_equipes_NSP": Person.objects.filter(
-            supportgroups__type=SupportGroup.TYPE_2022, supportgroups__published=True,
-        )
-        .distinct()
-        .count(),
-        "membres_equipes_NSP_insoumis": Person.objects.filter(
-            supportgroups__type=SupportGroup.TYPE_2022, supportgroups__published=True,
-        )
-        .filter(is_insoumise=True)
-        .distinct()
-        .count(),
-        "membres_equipes_NSP_non_insoumis": Person.objects.filter(
-            supportgroups__type=SupportGroup.TYPE_2022, supportgroups__published=True,
-        )
-        .filter(is_insoumise=False)
+    """Calcule les statistiques de stock à l'instant présent"""
+    insoumis_non_NSP = Q(
+        is_insoumise=True, is_2022=False, newsletters__contains=[Person.NEWSLETTER_LFI],
+    )
+
+    people = Person.objects.aggregate(
+        soutiens_NSP=_count(Q(is_2022=True)),
+        soutiens_NSP_insoumis=_count(Q(is_2022=True, is_insoumise=True)),
+        soutiens_NSP_non_insoumis=_count(Q(is_2022=True, is_insoumise=False)),
+        insoumis_non_NSP_phone=_count(insoumis_non_NSP & ~Q(contact_phone="")),
+    )
+
+    # ces deux indicateurs nécessitent des jointures qui multiplient les lignes : on
+    # les calcule à part pour ne pas alourdir les autres
+    people["insoumis_non_NSP"] = (
+        Person.objects.filter(insoumis_non_NSP, emails___bounced=False)
         .distinct()
-        .count(),
-        "insoumis_non_NSP": Person.objects.filter(
-            is_insoumise=True,
-            is_2022=False,
-            emails___bounced=False,
-            newsletters__contains=[Person.NEWSLETTER_LFI],
-        ).count(),
-        "insoumis_non_NSP_newsletter": Person.objects.filter(
-            is_insoumise=True,
-            is_2022=False,
+        .count()
+    )
+    people["insoumis_non_NSP_newsletter"] = (
+        Person.objects.filter(
+            insoumis_non_NSP,
             emails___bounced=False,
-            newsletters__contains=[Person.NEWSLETTER_LFI],
             campaignsentevent__datetime__gt=(now() - timedelta(days=90)),
             campaignsentevent__open_count__gt=0,
         )
         .distinct()
-        .count(),
-        "insoumis_non_NSP_phone": Person.objects.filter(
-            is_insoumise=True,
-            is_2022=False,
-            newsletters__contains=[Person.NEWSLETTER_LFI],
-        )
-        .exclude(contact_phone="")
-        .count(),
-    }
+        .count()
+    )
+
+    certified = Q(subtypes__label__in=settings.CERTIFIED_GROUP_SUBTYPES)
+    groups = SupportGroup.objects.active().aggregate(
+        ga_LFI=_count(Q(type=SupportGroup.TYPE_LOCAL_GROUP), distinct=True),
+        ga_LFI_certifies=_count(certified, distinct=True),
+        equipes_NSP=_count(Q(type=SupportGroup.TYPE_2022), distinct=True),
+    )
+
+    local_groups = Q(supportgroup__type=SupportGroup.TYPE_LOCAL_GROUP)
+    equipes = Q(supportgroup__type=SupportGroup.TYPE_2022)
+    members = Membership.objects.active().aggregate(
+        membres_ga_LFI=_count(local_groups, field="person_id", distinct=True),
+        membres_ga_LFI_certifies=_count(
+            local_groups
+            & Q(supportgroup__subtypes__label__in=settings.CERTIFIED_GROUP_SUBTYPES),
+            field="person_id",
+            distinct=True,
+        ),
+        membres_equipes_NSP=_count(equipes, field="person_id", distinct=True),
+        membres_equipes_NSP_insoumis=_count(
+            equipes & Q(person__is_insoumise=True), field="person_id", distinct=True
+        ),
+        membres_equipes_NSP_non_insoumis=_count(
+            equipes & Q(person__is_insoumise=False), field="person_id", distinct=True
+        ),
+    )
+
+    return {**people, **groups, **members}
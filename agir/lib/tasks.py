@@ -1,10 +1,45 @@
+from functools import partial
+
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from agir.api.redis import get_auth_redis_client
+
 from agir.events.models import Event
 from agir.groups.models import SupportGroup
 from agir.people.models import Person
 from .celery import http_task
-from .geo import geocode_element
+from .geo import geocode_element, geocode_batch
+from .images import process_image, clear_pending_image
+
+__all__ = [
+    "geocode_event",
+    "geocode_support_group",
+    "geocode_person",
+    "geocode_items",
+    "schedule_batch_geocoding",
+    "schedule_geocoding",
+    "geocode_queued_items",
+    "process_uploaded_image",
+]
 
-__all__ = ["geocode_event", "geocode_support_group", "geocode_person"]
+GEOCODING_RESULT_FIELDS = [
+    "coordinates",
+    "coordinates_type",
+    "location_city",
+    "location_citycode",
+]
+
+# modèles pouvant être géocodés via la file d'attente, avec la fonction prévenant leurs
+# gestionnaires lorsqu'aucune position n'a pu être trouvée
+GEOCODING_QUEUE_MODELS = {
+    "events.Event": "agir.events.tasks.create_waiting_location_activities",
+    "groups.SupportGroup": "agir.groups.tasks.create_waiting_location_activities",
+}
+GEOCODING_QUEUE_KEY = "geocoding:queue:{model_label}"
 
 
 def create_geocoder(model):
@@ -23,3 +58,80 @@ def create_geocoder(model):
 
 
 geocode_person = create_geocoder(Person)
+
+
+@http_task
+def geocode_items(model_label, pks):
+    model = apps.get_model(model_label)
+    items = list(model.objects.filter(pk__in=pks))
+
+    geocode_batch(items)
+    model.objects.bulk_update(items, GEOCODING_RESULT_FIELDS)
+
+    if model_label in GEOCODING_QUEUE_MODELS:
+        import_string(GEOCODING_QUEUE_MODELS[model_label])(
+            [
+                item
+                for item in items
+                if item.coordinates_type is not None
+                and item.coordinates_type >= model.COORDINATES_NO_POSITION
+            ]
+        )
+
+
+def schedule_batch_geocoding(queryset, batch_size=None):
+    """Lance le géocodage des éléments du queryset, par lots
+
+    Une seule tâche est lancée par lot, plutôt qu'une par élément.
+
+    :return: le nombre de tâches lancées
+    """
+    if batch_size is None:
+        batch_size = settings.GEOCODING_BATCH_SIZE
+
+    model_label = queryset.model._meta.label
+    pks = [str(pk) for pk in queryset.values_list("pk", flat=True)]
+
+    for i in range(0, len(pks), batch_size):
+        geocode_items.delay(model_label, pks[i : i + batch_size])
+
+    return (len(pks) + batch_size - 1) // batch_size
+
+
+def _add_to_geocoding_queue(model_label, pk):
+    get_auth_redis_client().sadd(
+        GEOCODING_QUEUE_KEY.format(model_label=model_label), str(pk)
+    )
+
+
+def schedule_geocoding(instance):
+    """Ajoute l'élément à la file d'attente de géocodage, une fois la transaction validée
+
+    La file est vidée par lots toutes les `GEOCODING_QUEUE_INTERVAL` secondes par
+    `geocode_queued_items` : les éléments créés ou modifiés pendant cet intervalle sont
+    géocodés ensemble.
+    """
+    transaction.on_commit(
+        partial(_add_to_geocoding_queue, instance._meta.label, instance.pk)
+    )
+
+
+@shared_task
+def geocode_queued_items():
+    client = get_auth_redis_client()
+
+    for model_label in GEOCODING_QUEUE_MODELS:
+        key = GEOCODING_QUEUE_KEY.format(model_label=model_label)
+        while True:
+            pks = client.spop(key, settings.GEOCODING_BATCH_SIZE)
+            if not pks:
+                break
+            geocode_items.delay(model_label, [pk.decode() for pk in pks])
+
+
+@shared_task
+def process_uploaded_image(file_name, variations):
+    try:
+        process_image(file_name, variations, replace=True)
+    finally:
+        clear_pending_image(file_name)
@@ -1,5 +1,6 @@
 from django import template
 
+from ..images import variation_url as original_variation_url
 from ..display import (
     display_price as original_display_price,
     pretty_time_since as original_pretty_time_since,
@@ -16,6 +17,11 @@ def display_price(value):
     return original_display_price(value)
 
 
+@register.filter(name="variation_url")
+def variation_url(image, variation):
+    return original_variation_url(image, variation)
+
+
 @register.filter(name="pretty_time_since")
 def pretty_time_since(d, now=None):
     return original_pretty_time_since(d, now)
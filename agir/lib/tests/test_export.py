@@ -0,0 +1,58 @@
+from io import BytesIO, StringIO
+
+from django.test import TestCase
+from glom import T
+
+from agir.lib.export import (
+    iterate_in_chunks,
+    spec_to_dicts,
+    write_csv,
+    write_export,
+)
+from agir.people.models import Person
+
+
+class StreamingExportTestCase(TestCase):
+    def setUp(self):
+        self.people = [
+            Person.objects.create_insoumise(
+                f"personne{i}@example.com", first_name=f"P{i}"
+            )
+            for i in range(5)
+        ]
+        self.people[0].add_email("secondaire@example.com")
+
+    def test_prefetch_is_applied_to_each_chunk(self):
+        queryset = Person.objects.prefetch_related("emails").order_by("created")
+
+        # une requête pour les personnes, puis une requête de préchargement par lot
+        with self.assertNumQueries(4):
+            emails = [p.email for p in iterate_in_chunks(queryset, chunk_size=2)]
+
+        self.assertEqual(emails, [p.email for p in self.people])
+
+    def test_write_csv_from_spec(self):
+        spec = {"Prénom": "first_name", "Emails": ("emails", T.count())}
+        output = StringIO()
+
+        write_csv(
+            spec_to_dicts(iterate_in_chunks(Person.objects.order_by("created")), spec),
+            list(spec),
+            output,
+        )
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[0], "Prénom,Emails")
+        self.assertEqual(lines[1:], ["P0,2", "P1,1", "P2,1", "P3,1", "P4,1"])
+
+    def test_write_xls(self):
+        output = BytesIO()
+        write_export(
+            ({"Prénom": p.first_name, "Créé": p.created} for p in self.people),
+            ["Prénom", "Créé"],
+            output,
+            format="xls",
+        )
+
+        # signature d'un document OLE2, utilisé par le format XLS
+        self.assertTrue(output.getvalue().startswith(b"\xd0\xcf\x11\xe0"))
@@ -1,4 +1,9 @@
+import cgi
+import csv
+import io
 import json
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
 from pathlib import Path
 from unittest.mock import patch, Mock
 
@@ -6,9 +11,25 @@ import requests
 from functools import wraps
 
 from django.test import TestCase
+from django.utils import timezone
 
-from agir.lib.geo import geocode_france, get_commune
+from agir.activity.models import Activity
+from agir.api.redis import using_separate_redis_server
+from agir.events.models import Event, OrganizerConfig
+from agir.lib.geo import (
+    geocode_france,
+    get_commune,
+    geocode_data_france,
+    geocode_data_france_batch,
+    geocode_batch,
+)
+from agir.lib.geo_index import get_commune_index, invalidate_commune_index
 from agir.lib.models import LocationMixin
+from agir.lib.tasks import (
+    geocode_queued_items,
+    schedule_batch_geocoding,
+    schedule_geocoding,
+)
 from agir.lib.tests.utils import import_communes_test_data
 from agir.people.models import Person
 
@@ -52,6 +73,7 @@ class FranceGeocodingTestCase(TestCase):
             "multi_city@test.com", location_country="FR"
         )
         import_communes_test_data()
+        self.addCleanup(invalidate_commune_index)
 
     @with_no_request
     def test_geocode_only_zip(self):
@@ -157,3 +179,211 @@ class FranceGeocodingTestCase(TestCase):
         self.person.save()
         commune = get_commune(self.person)
         self.assertIsNone(commune)
+
+    def test_geocode_batch_without_queries(self):
+        people = [
+            Person(location_country="FR", location_zip="12345"),
+            Person(location_country="FR", location_citycode="00002"),
+            Person(location_country="FR", location_zip="54321"),
+            Person(location_country="FR", location_city="la Troisième"),
+            Person(location_country="FR", location_zip="99999"),
+        ]
+        # construit l'index
+        get_commune_index()
+
+        with self.assertNumQueries(0):
+            geocode_data_france_batch(people)
+
+        self.assertEqual(
+            [p.location_citycode for p in people], ["00001", "00002", "", "00003", ""]
+        )
+        self.assertEqual(people[2].coordinates.coords, (0.0, -0.5))
+        self.assertEqual(
+            people[4].coordinates_type, LocationMixin.COORDINATES_NOT_FOUND
+        )
+
+    def test_database_lookup_matches_index(self):
+        def make_people():
+            return [
+                Person(location_country="FR", location_zip="12345"),
+                Person(location_country="FR", location_citycode="00002"),
+                Person(location_country="FR", location_zip="54321"),
+                Person(location_country="FR", location_city="la Troisième"),
+                Person(location_country="FR", location_zip="99999"),
+            ]
+
+        from_database = make_people()
+        for person in from_database:
+            geocode_data_france(person)
+        from_index = geocode_data_france_batch(make_people())
+
+        for person, other in zip(from_database, from_index):
+            self.assertEqual(person.coordinates_type, other.coordinates_type)
+            self.assertEqual(person.location_citycode, other.location_citycode)
+            self.assertEqual(person.coordinates is None, other.coordinates is None)
+            if person.coordinates is not None:
+                self.assertAlmostEqual(person.coordinates.x, other.coordinates.x)
+                self.assertAlmostEqual(person.coordinates.y, other.coordinates.y)
+            self.assertEqual(get_commune(person), get_commune(other))
+
+
+class BANStubHandler(BaseHTTPRequestHandler):
+    """Imite l'interface CSV de la BAN : toutes les adresses contenant « rue » sont
+    trouvées au même endroit"""
+
+    def do_POST(self):
+        self.server.requests += 1
+        form = cgi.FieldStorage(
+            fp=self.rfile,
+            headers=self.headers,
+            environ={
+                "REQUEST_METHOD": "POST",
+                "CONTENT_TYPE": self.headers["Content-Type"],
+            },
+        )
+        rows = list(csv.DictReader(io.StringIO(form["data"].value.decode())))
+        self.server.queries.extend(row["q"] for row in rows)
+
+        output = io.StringIO()
+        writer = csv.DictWriter(
+            output,
+            fieldnames=[
+                "q",
+                "postcode",
+                "longitude",
+                "latitude",
+                "result_type",
+                "result_citycode",
+            ],
+        )
+        writer.writeheader()
+        for row in rows:
+            if "rue" in row["q"]:
+                row.update(
+                    longitude="2.3",
+                    latitude="48.8",
+                    result_type="housenumber",
+                    result_citycode="75056",
+                )
+            writer.writerow(row)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.end_headers()
+        self.wfile.write(output.getvalue().encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@using_separate_redis_server
+class BatchGeocodingTestCase(TestCase):
+    def setUp(self):
+        import_communes_test_data()
+        self.addCleanup(invalidate_commune_index)
+
+        self.server = HTTPServer(("127.0.0.1", 0), BANStubHandler)
+        self.server.requests = 0
+        self.server.queries = []
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        endpoint_patcher = patch(
+            "agir.lib.geo.BAN_CSV_ENDPOINT",
+            f"http://127.0.0.1:{self.server.server_port}/search/csv/",
+        )
+        endpoint_patcher.start()
+        self.addCleanup(endpoint_patcher.stop)
+
+    def create_people(self):
+        return [
+            Person.objects.create_insoumise(
+                f"person{i}@test.com",
+                location_country="FR",
+                location_address1=address,
+                location_zip="75001",
+            )
+            for i, address in enumerate(["1 rue du Louvre", "2 rue du Louvre", "?"])
+        ]
+
+    def test_geocode_batch_with_single_request(self):
+        people = self.create_people()
+        people.append(Person(location_country="FR", location_zip="12345"))
+        people.append(Person(location_country="", location_zip="12345"))
+
+        geocode_batch(people)
+
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(
+            [p.coordinates_type for p in people],
+            [
+                LocationMixin.COORDINATES_EXACT,
+                LocationMixin.COORDINATES_EXACT,
+                LocationMixin.COORDINATES_NOT_FOUND,
+                LocationMixin.COORDINATES_CITY,
+                LocationMixin.COORDINATES_NO_POSITION,
+            ],
+        )
+        self.assertEqual(people[0].location_citycode, "75056")
+
+    def test_found_results_are_cached(self):
+        geocode_batch(self.create_people())
+        self.assertEqual(self.server.requests, 1)
+
+        Person.objects.all().delete()
+        people = self.create_people()
+        geocode_batch(people)
+        self.assertEqual(people[1].coordinates.coords, (2.3, 48.8))
+
+        # seule l'adresse introuvable est de nouveau envoyée à la BAN
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual(self.server.queries[3:], ["?"])
+
+    def test_schedule_batch_geocoding_saves_results(self):
+        people = self.create_people()
+
+        schedule_batch_geocoding(Person.objects.filter(pk__in=[p.pk for p in people]))
+
+        self.assertEqual(self.server.requests, 1)
+        people[0].refresh_from_db()
+        self.assertEqual(people[0].coordinates_type, LocationMixin.COORDINATES_EXACT)
+
+    def test_queued_items_are_geocoded_together(self):
+        events = [
+            Event.objects.create(
+                name=f"Événement {i}",
+                start_time=timezone.now() + timezone.timedelta(days=1),
+                end_time=timezone.now() + timezone.timedelta(days=1, hours=1),
+                location_country="FR",
+                location_address1=address,
+                location_zip="75001",
+            )
+            for i, address in enumerate(["1 rue du Louvre", "?"])
+        ]
+        organizer = Person.objects.create_insoumise("organizer@test.com")
+        OrganizerConfig.objects.create(event=events[1], person=organizer)
+
+        with patch(
+            "agir.lib.tasks.transaction.on_commit",
+            side_effect=lambda callback: callback(),
+        ):
+            for event in events:
+                schedule_geocoding(event)
+        geocode_queued_items()
+
+        self.assertEqual(self.server.requests, 1)
+        for event in events:
+            event.refresh_from_db()
+        self.assertEqual(events[0].coordinates_type, LocationMixin.COORDINATES_EXACT)
+        self.assertEqual(
+            events[1].coordinates_type, LocationMixin.COORDINATES_NOT_FOUND
+        )
+        self.assertTrue(
+            Activity.objects.filter(
+                type=Activity.TYPE_WAITING_LOCATION_EVENT,
+                recipient=organizer,
+                event=events[1],
+            ).exists()
+        )
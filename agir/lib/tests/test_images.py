@@ -0,0 +1,100 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest.mock import patch
+
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+
+from agir.events.models import EventImage
+from agir.lib.images import (
+    autorotate,
+    render_variations_async,
+    is_pending_image,
+    variation_url,
+    clear_pending_image,
+    prefetch_pending_images,
+)
+
+
+def make_image(size, orientation=None):
+    image = Image.new("RGB", size, color="red")
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[274] = orientation
+
+    with BytesIO() as buffer:
+        image.save(buffer, "JPEG", exif=exif.tobytes())
+        return buffer.getvalue()
+
+
+class ImageProcessingTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.field = EventImage._meta.get_field("image")
+        self.file_name = default_storage.save(
+            "events/image.jpg", ContentFile(make_image((400, 300), orientation=6))
+        )
+        self.addCleanup(clear_pending_image, self.file_name)
+
+    def test_autorotate(self):
+        autorotate(self.file_name)
+
+        with default_storage.open(self.file_name) as f, Image.open(f) as image:
+            self.assertEqual(image.size, (300, 400))
+
+    def test_autorotate_strips_exif(self):
+        file_name = default_storage.save(
+            "events/upright.jpg", ContentFile(make_image((400, 300), orientation=1))
+        )
+        autorotate(file_name)
+
+        with default_storage.open(file_name) as f, Image.open(f) as image:
+            self.assertEqual(image.size, (400, 300))
+            self.assertNotIn("exif", image.info)
+
+    def test_autorotate_keeps_images_without_exif(self):
+        with BytesIO() as buffer:
+            Image.new("RGB", (400, 300), color="red").save(buffer, "JPEG")
+            content = buffer.getvalue()
+        file_name = default_storage.save("events/no-exif.jpg", ContentFile(content))
+
+        autorotate(file_name)
+
+        with default_storage.open(file_name) as f:
+            self.assertEqual(f.read(), content)
+
+    def test_variations_are_rendered_by_task(self):
+        render_variations_async(self.file_name, self.field.variations)
+
+        self.assertFalse(is_pending_image(self.file_name))
+        image = EventImage(image=self.file_name).image
+        self.assertTrue(default_storage.exists(image.thumbnail.name))
+        self.assertEqual(variation_url(image, "thumbnail"), image.thumbnail.url)
+
+    @patch("agir.lib.tasks.process_uploaded_image.delay")
+    def test_original_is_served_while_pending(self, delay):
+        render_variations_async(self.file_name, self.field.variations)
+
+        delay.assert_called_once_with(self.file_name, self.field.variations)
+        self.assertTrue(is_pending_image(self.file_name))
+        image = EventImage(image=self.file_name).image
+        self.assertEqual(variation_url(image, "thumbnail"), image.url)
+
+    @patch("agir.lib.tasks.process_uploaded_image.delay")
+    def test_prefetch_pending_images(self, delay):
+        render_variations_async(self.file_name, self.field.variations)
+        images = [EventImage(image=self.file_name).image, EventImage().image]
+
+        prefetch_pending_images(images)
+
+        with patch("agir.lib.images.is_pending_image") as is_pending:
+            self.assertEqual(variation_url(images[0], "thumbnail"), images[0].url)
+            is_pending.assert_not_called()
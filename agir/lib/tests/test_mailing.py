@@ -0,0 +1,84 @@
+from django.core import mail
+from django.template import engines
+from django.test import TestCase
+
+from agir.lib.mailing import (
+    MosaicoRenderer,
+    send_mosaico_email,
+    _uses_only_simple_variables,
+)
+from agir.lib.utils import front_url
+from agir.people.models import Person
+
+
+class MosaicoRendererTestCase(TestCase):
+    def setUp(self):
+        self.person = Person.objects.create_insoumise("a&b@domain.com")
+        self.bindings = {
+            "GROUP_NAME": "Groupe <test>",
+            "PERSON_INFORMATION": "Une personne",
+            "MANAGE_GROUP_LINK": front_url("dashboard"),
+            "preferences_link": front_url("contact"),
+            "unsubscribe_link": front_url("unsubscribe"),
+        }
+
+    def test_batch_rendering_is_identical_to_individual_rendering(self):
+        batch_renderer = MosaicoRenderer(
+            "GROUP_SOMEONE_JOINED_NOTIFICATION", self.bindings
+        )
+        renderer = MosaicoRenderer(
+            "GROUP_SOMEONE_JOINED_NOTIFICATION", self.bindings, batch=False
+        )
+        self.assertTrue(batch_renderer.batch)
+
+        for recipient in [self.person, "c@domain.com"]:
+            self.assertEqual(
+                batch_renderer.render(recipient), renderer.render(recipient)
+            )
+
+    def test_links_are_kept_for_recipients_without_account(self):
+        html, text = MosaicoRenderer(
+            "GROUP_SOMEONE_JOINED_NOTIFICATION", self.bindings
+        ).render("c@domain.com")
+
+        self.assertIn(self.bindings["MANAGE_GROUP_LINK"], text)
+        self.assertIn(self.bindings["unsubscribe_link"], text)
+
+    def test_detect_complex_uses_of_recipient_variables(self):
+        names = {"EMAIL", "GREETINGS"}
+        engine = engines["django"]
+
+        self.assertTrue(
+            _uses_only_simple_variables(
+                engine.from_string("{{ GREETINGS }} {{ EMAIL }} {{ OTHER|upper }}"),
+                names,
+            )
+        )
+        self.assertFalse(
+            _uses_only_simple_variables(engine.from_string("{{ EMAIL|upper }}"), names)
+        )
+        self.assertFalse(
+            _uses_only_simple_variables(
+                engine.from_string("{% if GREETINGS %}{{ GREETINGS }}{% endif %}"),
+                names,
+            )
+        )
+
+    def test_send_emails_by_batches(self):
+        recipients = [self.person] + [
+            Person.objects.create_insoumise(f"{i}@domain.com") for i in range(4)
+        ]
+
+        send_mosaico_email(
+            code="GROUP_SOMEONE_JOINED_NOTIFICATION",
+            subject="Sujet",
+            from_email="from@domain.com",
+            recipients=recipients,
+            bindings=self.bindings,
+            batch_size=2,
+        )
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(mail.outbox[0].to, [self.person.email])
+        self.assertIn("a&amp;b@domain.com", mail.outbox[0].alternatives[0][0])
+        self.assertIn("a&b@domain.com", mail.outbox[0].body)
@@ -0,0 +1,69 @@
+from django.test import TestCase, override_settings
+from prometheus_client import REGISTRY
+from rest_framework import serializers
+
+from agir.lib.profiling import profile_request, record_profile
+from agir.people.models import Person
+
+
+class DummySerializer(serializers.Serializer):
+    value = serializers.SerializerMethodField()
+
+    def get_value(self, obj):
+        return obj
+
+
+class ProfileRequestTestCase(TestCase):
+    def test_count_queries_and_repeated_fingerprints(self):
+        with profile_request() as profile:
+            for i in range(3):
+                list(Person.objects.filter(first_name=f"Prénom {i}"))
+
+        self.assertEqual(profile.queries, 3)
+        self.assertGreater(profile.db_duration, 0)
+        self.assertEqual(len(profile.repeated_queries(3)), 1)
+        self.assertEqual(profile.repeated_queries(4), {})
+
+    def test_time_serializer_method_fields_only_when_profiling(self):
+        DummySerializer([1, 2], many=True).data
+
+        with profile_request() as profile:
+            DummySerializer([1, 2], many=True).data
+
+        self.assertEqual(list(profile.method_fields), [("DummySerializer", "value")])
+
+    def test_record_profile(self):
+        def sample(name, view):
+            return REGISTRY.get_sample_value(name, {"view": view}) or 0
+
+        with profile_request() as profile:
+            for i in range(3):
+                list(Person.objects.filter(first_name=f"Prénom {i}"))
+
+        with self.settings(PROFILING_REPEATED_QUERY_THRESHOLD=3):
+            record_profile("test_record_profile", profile)
+
+        self.assertEqual(sample("agir_view_db_queries_sum", "test_record_profile"), 3)
+        self.assertEqual(
+            sample("agir_view_repeated_queries_total", "test_record_profile"), 3
+        )
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1)
+class ProfilingMiddlewareTestCase(TestCase):
+    def test_sampled_requests_are_recorded(self):
+        before = (
+            REGISTRY.get_sample_value(
+                "agir_view_db_queries_count", {"view": "api_session"}
+            )
+            or 0
+        )
+
+        self.client.get("/api/session/")
+
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "agir_view_db_queries_count", {"view": "api_session"}
+            ),
+            before + 1,
+        )
@@ -0,0 +1,152 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.test import TestCase
+
+from agir.groups.models import SupportGroup, Membership
+from agir.lib.push import (
+    EVENT_ACTIVITY,
+    EVENT_NEW_MESSAGE,
+    EVENT_SUBSCRIPTIONS,
+    PUSH_PATH,
+    group_channel,
+    hub,
+    person_channel,
+    push_application,
+    send_events,
+)
+from agir.people.models import Person
+
+
+def http_scope(cookie=None):
+    headers = [(b"cookie", cookie.encode())] if cookie else []
+    return {"type": "http", "method": "GET", "path": PUSH_PATH, "headers": headers}
+
+
+# les connexions à la base de données sont gérées par la transaction de chaque test
+@patch("agir.lib.push.close_old_connections")
+class PushTestCase(TestCase):
+    def setUp(self):
+        self.person = Person.objects.create_insoumise(
+            "person@example.com", create_role=True
+        )
+        self.group = SupportGroup.objects.create(name="Groupe")
+        Membership.objects.create(supportgroup=self.group, person=self.person)
+
+    def test_hub_dispatches_to_subscribed_channels(self, _close):
+        async def receive():
+            loop = asyncio.get_event_loop()
+            channels = [person_channel(self.person.pk)]
+            queue = hub.subscribe(channels, loop)
+            try:
+                await sync_to_async(send_events)(
+                    [
+                        (person_channel("autre"), EVENT_ACTIVITY, {"type": "autre"}),
+                        (channels[0], EVENT_ACTIVITY, {"type": "new-member"}),
+                    ]
+                )
+                return await asyncio.wait_for(queue.get(), timeout=5)
+            finally:
+                hub.unsubscribe(channels, queue, loop)
+
+        payload = json.loads(async_to_sync(receive)())
+        self.assertEqual(
+            payload, {"type": EVENT_ACTIVITY, "data": {"type": "new-member"}}
+        )
+
+    def test_anonymous_request_is_rejected(self, _close):
+        async def request():
+            communicator = ApplicationCommunicator(push_application, http_scope())
+            await communicator.send_input({"type": "http.request"})
+            return await communicator.receive_output(timeout=5)
+
+        self.assertEqual(async_to_sync(request)()["status"], 401)
+
+    def get_session_cookie(self):
+        self.client.force_login(self.person.role)
+        return "{}={}".format(
+            settings.SESSION_COOKIE_NAME,
+            self.client.cookies[settings.SESSION_COOKIE_NAME].value,
+        )
+
+    def test_stream_group_events_to_members(self, _close):
+        cookie = self.get_session_cookie()
+
+        async def stream():
+            communicator = ApplicationCommunicator(push_application, http_scope(cookie))
+            await communicator.send_input({"type": "http.request"})
+            start = await communicator.receive_output(timeout=5)
+            await communicator.receive_output(timeout=5)
+
+            await sync_to_async(send_events)(
+                [
+                    (
+                        group_channel(self.group.pk),
+                        EVENT_NEW_MESSAGE,
+                        {"group": str(self.group.pk), "message": "1"},
+                    )
+                ]
+            )
+            event = await communicator.receive_output(timeout=5)
+
+            await communicator.send_input({"type": "http.disconnect"})
+            await communicator.wait(timeout=5)
+            return start, event
+
+        start, event = async_to_sync(stream)()
+
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), start["headers"])
+        self.assertEqual(
+            event["body"],
+            (
+                f"event: {EVENT_NEW_MESSAGE}\n"
+                f'data: {{"group": "{self.group.pk}", "message": "1"}}\n\n'
+            ).encode(),
+        )
+
+    def test_stream_groups_joined_after_connection(self, _close):
+        cookie = self.get_session_cookie()
+        other_group = SupportGroup.objects.create(name="Autre groupe")
+
+        async def stream():
+            communicator = ApplicationCommunicator(push_application, http_scope(cookie))
+            await communicator.send_input({"type": "http.request"})
+            await communicator.receive_output(timeout=5)
+            await communicator.receive_output(timeout=5)
+
+            await sync_to_async(Membership.objects.create)(
+                supportgroup=other_group, person=self.person
+            )
+            await sync_to_async(send_events)(
+                [(person_channel(self.person.pk), EVENT_SUBSCRIPTIONS, {})]
+            )
+            for _ in range(50):
+                if group_channel(other_group.pk) in hub.queues:
+                    break
+                await asyncio.sleep(0.1)
+
+            await sync_to_async(send_events)(
+                [
+                    (
+                        group_channel(other_group.pk),
+                        EVENT_NEW_MESSAGE,
+                        {"group": str(other_group.pk), "message": "1"},
+                    )
+                ]
+            )
+            event = await communicator.receive_output(timeout=5)
+
+            await communicator.send_input({"type": "http.disconnect"})
+            await communicator.wait(timeout=5)
+            return event
+
+        event = async_to_sync(stream)()
+
+        self.assertTrue(
+            event["body"].startswith(f"event: {EVENT_NEW_MESSAGE}".encode())
+        )
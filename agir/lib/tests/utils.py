@@ -10,6 +10,8 @@ from data_france.typologies import TypeNom
 from django.contrib.gis.geos import MultiPolygon, Polygon
 from django.db import transaction
 
+from agir.lib.geo_index import invalidate_commune_index
+
 
 def import_communes_test_data():
 
@@ -88,3 +90,5 @@ def import_communes_test_data():
         cp1.communes.set([c1])
         cp2.communes.set([c2, c3])
         cp3.communes.set([arr1])
+
+    invalidate_commune_index()
@@ -1,15 +1,12 @@
+import uuid
+from functools import lru_cache
 from urllib.parse import urljoin
 
 import requests
-from PIL import Image
 from django.conf import settings
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
 from django.http import QueryDict
-from django.urls import reverse
+from django.urls import reverse, NoReverseMatch
 from django.utils.functional import lazy
-from io import BytesIO
-from stdimage.utils import render_variations
 
 from agir.authentication.tokens import connection_token_generator
 from agir.lib.http import add_query_params_to_url
@@ -47,6 +44,48 @@ def front_url(
 
 front_url_lazy = lazy(front_url, str)
 
+# valeurs d'identifiant improbables, par type d'identifiant, utilisées pour repérer
+# l'emplacement de l'identifiant dans les URL inversées
+ROUTE_TEMPLATE_SENTINELS = {
+    uuid.UUID: uuid.UUID("e2c9ec5a-0b0d-4c44-9b4e-0a1f9d6a7c3b"),
+    int: 918273645,
+}
+
+
+@lru_cache(maxsize=None)
+def get_route_template(viewname, pk_type, urlconf, domain):
+    """Renvoie le gabarit de l'URL absolue d'une vue prenant un unique identifiant
+
+    Le gabarit est un couple (préfixe, suffixe) entre lesquels placer un identifiant du
+    type indiqué, ou None si la vue n'accepte pas un tel identifiant seul.
+    """
+    sentinel = ROUTE_TEMPLATE_SENTINELS[pk_type]
+    try:
+        url = urljoin(domain, reverse(viewname, args=(sentinel,), urlconf=urlconf))
+    except NoReverseMatch:
+        return None
+
+    if url.count(str(sentinel)) != 1:
+        return None
+
+    return tuple(url.split(str(sentinel)))
+
+
+def front_url_with_pk(viewname, pk, urlconf="agir.api.front_urls"):
+    """Équivalent de `front_url(viewname, args=(pk,))` qui n'inverse l'URL qu'une
+    seule fois par vue, puis se contente d'y insérer l'identifiant"""
+    template = None
+    if type(pk) in ROUTE_TEMPLATE_SENTINELS:
+        template = get_route_template(
+            viewname, type(pk), urlconf, settings.FRONT_DOMAIN
+        )
+
+    if template is None:
+        return front_url(viewname, args=(pk,), urlconf=urlconf)
+
+    prefix, suffix = template
+    return AutoLoginUrl(f"{prefix}{pk}{suffix}")
+
 
 def admin_url(viewname, args=None, kwargs=None, query=None, absolute=True):
     if not viewname.startswith("admin:"):
@@ -68,43 +107,6 @@ def generate_token_params(person):
     return {"p": person.pk, "code": connection_token_generator.make_token(user=person)}
 
 
-def resize_and_autorotate(
-    file_name, variations, replace=False, storage=default_storage
-):
-    with storage.open(file_name) as f:
-        with Image.open(f) as image:
-            file_format = image.format
-            try:
-                exif = image._getexif()
-            except AttributeError:
-                exif = None
-
-            # if image has exif data about orientation, let's rotate it
-            orientation_key = 274  # cf ExifTags
-            if exif and orientation_key in exif:
-                orientation = exif[orientation_key]
-
-                rotate_values = {
-                    3: Image.ROTATE_180,
-                    6: Image.ROTATE_270,
-                    8: Image.ROTATE_90,
-                }
-
-                if orientation in rotate_values:
-                    image = image.transpose(rotate_values[orientation])
-
-            with BytesIO() as file_buffer:
-                image.save(file_buffer, file_format)
-                f = ContentFile(file_buffer.getvalue())
-                storage.delete(file_name)
-                storage.save(file_name, f)
-
-    # render stdimage variations
-    render_variations(file_name, variations, replace=replace, storage=storage)
-
-    return False
-
-
 def shorten_url(url, secret=False):
     return requests.post(
         settings.DJAN_URL + "/api/shorten",
@@ -84,7 +84,10 @@ class SegmentAdmin(CenterOnFranceMixin, OSMGeoAdmin):
             {"fields": ("elu", "elu_municipal", "elu_departemental", "elu_regional",)},
         ),
         ("Combiner des segments", {"fields": ("add_segments", "exclude_segments")}),
-        ("Abonnés", {"fields": ("get_subscribers_count",)}),
+        (
+            "Abonnés",
+            {"fields": ("get_subscribers_count", "materialized", "materialized_at")},
+        ),
     )
     map_template = "custom_fields/french_area_widget.html"
     autocomplete_fields = (
@@ -98,7 +101,8 @@ class SegmentAdmin(CenterOnFranceMixin, OSMGeoAdmin):
         "forms",
         "polls",
     )
-    readonly_fields = ("get_subscribers_count",)
+    readonly_fields = ("get_subscribers_count", "materialized_at")
+    actions = ("refresh_subscribers",)
     ordering = ("name",)
     search_fields = ("name",)
     list_filter = ("supportgroup_status", "supportgroup_subtypes", "tags")
@@ -109,6 +113,16 @@ class SegmentAdmin(CenterOnFranceMixin, OSMGeoAdmin):
         "tags_list",
     )
 
+    def refresh_subscribers(self, request, queryset):
+        for segment in queryset.filter(materialized=True):
+            added, removed = segment.refresh_subscribers()
+            self.message_user(
+                request,
+                f"{segment.name} : {added} personnes ajoutées, {removed} retirées.",
+            )
+
+    refresh_subscribers.short_description = "Recalculer les membres précalculés"
+
     def supportgroup_subtypes_list(self, instance):
         return ", ".join(str(s) for s in instance.supportgroup_subtypes.all())
 
@@ -0,0 +1,71 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("people", "0004_display_name_and_image"),
+        ("mailing", "0037_empty_newsletters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="segment",
+            name="materialized",
+            field=models.BooleanField(
+                default=False,
+                help_text="Les membres du segment sont enregistrés et recalculés régulièrement, plutôt qu'à chaque utilisation. À réserver aux segments complexes ou souvent utilisés.",
+                verbose_name="Précalculer les membres du segment",
+            ),
+        ),
+        migrations.AddField(
+            model_name="segment",
+            name="materialized_at",
+            field=models.DateTimeField(
+                editable=False,
+                null=True,
+                verbose_name="Date du dernier calcul des membres",
+            ),
+        ),
+        migrations.CreateModel(
+            name="SegmentSubscriber",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "person",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="segment_subscriptions",
+                        to="people.person",
+                    ),
+                ),
+                (
+                    "segment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="subscribers",
+                        to="mailing.segment",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Membre précalculé d'un segment",
+                "verbose_name_plural": "Membres précalculés des segments",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="segmentsubscriber",
+            constraint=models.UniqueConstraint(
+                fields=("segment", "person"), name="unique_segment_subscriber"
+            ),
+        ),
+    ]
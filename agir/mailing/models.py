@@ -2,8 +2,8 @@ from datetime import timedelta
 
 from django.contrib.gis.db.models import MultiPolygonField
 from django.contrib.postgres.fields import DateRangeField
-from django.db import models
-from django.db.models import Q, Sum
+from django.db import models, transaction
+from django.db.models import Q, Sum, Exists, OuterRef
 from django.utils.timezone import now
 from django_countries.fields import CountryField
 from nuntius.models import BaseSegment, CampaignSentStatusType
@@ -14,10 +14,10 @@ from agir.lib import data
 from agir.lib.model_fields import ChoiceArrayField
 from agir.payments.model_fields import AmountField
 from agir.payments.models import Subscription, Payment
-from agir.people.models import Person
+from agir.people.models import Person, PersonEmail
 
 
-__all__ = ["Segment"]
+__all__ = ["Segment", "SegmentSubscriber"]
 
 
 DATE_HELP_TEXT = (
@@ -257,6 +257,31 @@ class Segment(BaseSegment, models.Model):
         blank=True,
     )
 
+    materialized = models.BooleanField(
+        "Précalculer les membres du segment",
+        default=False,
+        help_text="Les membres du segment sont enregistrés et recalculés régulièrement, plutôt"
+        " qu'à chaque utilisation. À réserver aux segments complexes ou souvent utilisés.",
+    )
+    materialized_at = models.DateTimeField(
+        "Date du dernier calcul des membres", null=True, editable=False
+    )
+
+    def get_required_newsletters(self):
+        """Renvoie l'ensemble des lettres dont les membres du segment reçoivent au moins
+        une, ou None si le segment peut inclure des personnes inscrites à aucune lettre"""
+        newsletters = set(self.newsletters or ())
+        if not newsletters:
+            return None
+
+        for s in self.add_segments.all():
+            added = s.get_required_newsletters()
+            if added is None:
+                return None
+            newsletters |= added
+
+        return newsletters
+
     def get_subscribers_q(self):
         # ne pas inclure les rôles inactifs dans les envois de mail
         q = ~Q(role__is_active=False)
@@ -461,7 +486,7 @@ class Segment(BaseSegment, models.Model):
 
         return qs.filter(self.get_subscribers_q()).filter(emails___bounced=False)
 
-    def get_subscribers_queryset(self):
+    def _get_live_subscribers_queryset(self):
         qs = self._get_own_filters_queryset()
 
         for s in self.add_segments.all():
@@ -472,17 +497,98 @@ class Segment(BaseSegment, models.Model):
         for s in self.exclude_segments.all():
             qs = qs.exclude(pk__in=s.get_subscribers_queryset())
 
-        return qs.order_by("id").distinct("id")
+        return qs
+
+    @property
+    def is_materialized(self):
+        return self.materialized and self.materialized_at is not None
+
+    def get_subscribers_queryset(self):
+        if self.is_materialized:
+            # la liste précalculée peut dater du dernier recalcul : les désinscriptions,
+            # adresses invalides et comptes désactivés depuis sont vérifiés à chaque fois
+            qs = Person.objects.filter(segment_subscriptions__segment=self).filter(
+                ~Q(role__is_active=False),
+                Exists(
+                    PersonEmail.objects.filter(person_id=OuterRef("id"), _bounced=False)
+                ),
+            )
+
+            newsletters = self.get_required_newsletters()
+            if newsletters is not None:
+                qs = qs.filter(newsletters__overlap=list(newsletters))
+
+            return qs.order_by("id")
+
+        return self._get_live_subscribers_queryset().order_by("id").distinct("id")
 
     def get_subscribers_count(self):
-        return (
-            self._get_own_filters_queryset().order_by("id").distinct("id").count()
-            + sum(s.get_subscribers_count() for s in self.add_segments.all())
-            - sum(s.get_subscribers_count() for s in self.exclude_segments.all())
-        )
+        return self.get_subscribers_queryset().count()
 
     get_subscribers_count.short_description = "Personnes"
-    get_subscribers_count.help_text = "Estimation du nombre d'inscrits"
+    get_subscribers_count.help_text = "Nombre d'inscrits"
+
+    def refresh_subscribers(self, batch_size=5000):
+        """Recalcule la liste enregistrée des membres du segment
+
+        Seules les différences avec la liste précédente sont écrites : les personnes qui
+        ne font plus partie du segment sont retirées et les nouvelles sont ajoutées.
+
+        :return: un couple (nombre de personnes ajoutées, nombre de personnes retirées)
+        """
+        live_ids = self._get_live_subscribers_queryset().values("id")
+
+        with transaction.atomic():
+            # verrouille le segment pour éviter deux recalculs simultanés
+            Segment.objects.select_for_update().filter(pk=self.pk).first()
+
+            removed, _ = (
+                self.subscribers.exclude(person_id__in=live_ids).delete()
+                if self.materialized_at is not None
+                else self.subscribers.all().delete()
+            )
+
+            new_ids = (
+                Person.objects.filter(pk__in=live_ids)
+                .exclude(segment_subscriptions__segment=self)
+                .values_list("id", flat=True)
+            )
+
+            added = 0
+            batch = []
+            for person_id in new_ids.iterator(chunk_size=batch_size):
+                batch.append(SegmentSubscriber(segment=self, person_id=person_id))
+                if len(batch) == batch_size:
+                    SegmentSubscriber.objects.bulk_create(batch)
+                    added += len(batch)
+                    batch = []
+            SegmentSubscriber.objects.bulk_create(batch)
+            added += len(batch)
+
+            self.materialized_at = now()
+            Segment.objects.filter(pk=self.pk).update(
+                materialized_at=self.materialized_at
+            )
+
+        return added, removed
 
     def __str__(self):
         return self.name
+
+
+class SegmentSubscriber(models.Model):
+    segment = models.ForeignKey(
+        "Segment", on_delete=models.CASCADE, related_name="subscribers"
+    )
+    person = models.ForeignKey(
+        "people.Person", on_delete=models.CASCADE, related_name="segment_subscriptions"
+    )
+
+    class Meta:
+        verbose_name = "Membre précalculé d'un segment"
+        verbose_name_plural = "Membres précalculés des segments"
+        constraints = (
+            models.UniqueConstraint(
+                fields=["segment", "person"], name="unique_segment_subscriber"
+            ),
+        )
@@ -1,9 +1,14 @@
 import json
 import logging
+from functools import partial
 
 from anymail.signals import tracking
+from django.db import transaction
+from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .models import Segment
+
 
 logger = logging.getLogger(__name__)
 
@@ -24,3 +29,20 @@ def log_anymail_tracking_events(sender, event, esp_name, **kwargs):
             {"esp_name": esp_name, **{f: getattr(event, f, None) for f in event_fields}}
         )
     )
+
+
+@receiver(post_save, sender=Segment, dispatch_uid="refresh_materialized_segment")
+def refresh_materialized_segment(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+
+    if instance.materialized:
+        # les relations ManyToMany ne sont enregistrées par l'admin qu'après le segment :
+        # on attend la fin de la transaction pour recalculer ses membres
+        from .tasks import refresh_segment_subscribers
+
+        transaction.on_commit(partial(refresh_segment_subscribers.delay, instance.pk))
+    elif instance.materialized_at is not None:
+        instance.subscribers.all().delete()
+        instance.materialized_at = None
+        Segment.objects.filter(pk=instance.pk).update(materialized_at=None)
@@ -0,0 +1,33 @@
+import logging
+
+from celery import shared_task
+
+from .models import Segment
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_segment_subscribers(segment_pk):
+    try:
+        segment = Segment.objects.get(pk=segment_pk, materialized=True)
+    except Segment.DoesNotExist:
+        return
+
+    added, removed = segment.refresh_subscribers()
+    logger.info(
+        f"Segment {segment.pk} ({segment.name}) : {added} personnes ajoutées, "
+        f"{removed} retirées"
+    )
+
+
+@shared_task
+def refresh_materialized_segments():
+    # les segments recalculés le plus anciennement d'abord : un segment qui en combine
+    # d'autres sera ainsi généralement recalculé après eux
+    for segment_pk in (
+        Segment.objects.filter(materialized=True)
+        .order_by("materialized_at")
+        .values_list("pk", flat=True)
+    ):
+        refresh_segment_subscribers(segment_pk)
@@ -26,3 +26,59 @@ class SegmentTestCase(TestCase):
         role.save()
 
         self.assertNotIn(self.person_with_account, s.get_subscribers_queryset())
+
+
+class MaterializedSegmentTestCase(TestCase):
+    def setUp(self) -> None:
+        self.p1 = Person.objects.create_insoumise(email="a@a.a")
+        self.p2 = Person.objects.create_insoumise(email="b@b.b")
+        self.p3 = Person.objects.create_person(email="c@c.c", is_insoumise=False)
+
+        self.insoumis = Segment.objects.create(newsletters=[], is_insoumise=True)
+        self.everyone = Segment.objects.create(newsletters=[], is_insoumise=None)
+
+    def test_materialized_segment_uses_precomputed_subscribers(self):
+        self.insoumis.materialized = True
+        self.insoumis.save()
+        self.assertEqual(self.insoumis.refresh_subscribers(), (2, 0))
+
+        self.assertCountEqual(
+            self.insoumis.get_subscribers_queryset(), [self.p1, self.p2]
+        )
+        self.assertEqual(self.insoumis.get_subscribers_count(), 2)
+
+        # la liste précalculée n'est mise à jour qu'au prochain recalcul
+        self.p2.is_insoumise = False
+        self.p2.save()
+        self.assertIn(self.p2, self.insoumis.get_subscribers_queryset())
+
+        self.assertEqual(self.insoumis.refresh_subscribers(), (0, 1))
+        self.assertCountEqual(self.insoumis.get_subscribers_queryset(), [self.p1])
+
+    def test_count_is_exact_with_overlapping_segments(self):
+        s = Segment.objects.create(newsletters=[], is_insoumise=True)
+        s.add_segments.set([self.insoumis, self.everyone])
+
+        self.assertEqual(s.get_subscribers_count(), 3)
+
+        s.exclude_segments.set([self.insoumis])
+        self.assertEqual(s.get_subscribers_count(), 1)
+
+    def test_materialized_segment_excludes_unsubscribed_people(self):
+        s = Segment.objects.create(
+            newsletters=[Person.NEWSLETTER_LFI], is_insoumise=True, materialized=True
+        )
+        self.p1.newsletters = [Person.NEWSLETTER_LFI]
+        self.p1.save()
+        self.p2.newsletters = [Person.NEWSLETTER_LFI]
+        self.p2.save()
+        s.refresh_subscribers()
+        self.assertCountEqual(s.get_subscribers_queryset(), [self.p1, self.p2])
+
+        # désinscription et adresse invalide, sans nouveau calcul du segment
+        self.p1.newsletters = []
+        self.p1.save()
+        self.p2.emails.update(_bounced=True)
+
+        self.assertCountEqual(s.get_subscribers_queryset(), [])
+        self.assertEqual(s.get_subscribers_count(), 0)
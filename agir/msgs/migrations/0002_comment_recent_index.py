@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("msgs", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="supportgroupmessagecomment",
+            index=models.Index(
+                condition=models.Q(deleted=False),
+                fields=["message", "-created"],
+                name="msgs_comment_recent_index",
+            ),
+        ),
+    ]
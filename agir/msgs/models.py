@@ -72,3 +72,12 @@ class SupportGroupMessageComment(AbstractMessage):
     class Meta:
         verbose_name = "Commentaire de messages de groupe"
         verbose_name_plural = "Commentaires de messages de groupe"
+        indexes = (
+            # utilisé pour récupérer les derniers commentaires de chaque message
+            # (voir agir.msgs.queries.get_recent_comments)
+            models.Index(
+                fields=["message", "-created"],
+                condition=models.Q(deleted=False),
+                name="msgs_comment_recent_index",
+            ),
+        )
@@ -0,0 +1,35 @@
+from agir.msgs.models import SupportGroupMessageComment
+
+
+def get_recent_comments(message_ids, limit):
+    """Renvoie les `limit` derniers commentaires non supprimés de chacun des messages
+
+    Une seule requête est effectuée, quel que soit le nombre de messages : pour chaque
+    message, une sous-requête LATERAL parcourt l'index partiel
+    `msgs_comment_recent_index`. Chaque commentaire porte aussi un attribut
+    `total_count`, le nombre total de commentaires non supprimés du message, calculé
+    avant l'application de la limite.
+
+    Les commentaires de chaque message sont renvoyés du plus récent au plus ancien.
+    """
+    if not message_ids:
+        return SupportGroupMessageComment.objects.none()
+
+    table = SupportGroupMessageComment._meta.db_table
+
+    # noinspection SqlResolve
+    return SupportGroupMessageComment.objects.raw(
+        f"""
+        SELECT c.*
+        FROM unnest(%s::uuid[]) WITH ORDINALITY AS m(id, position)
+        CROSS JOIN LATERAL (
+            SELECT comment.*, count(*) OVER () AS total_count
+            FROM "{table}" comment
+            WHERE comment.message_id = m.id AND NOT comment.deleted
+            ORDER BY comment.created DESC
+            LIMIT %s
+        ) c
+        ORDER BY m.position, c.created DESC
+        """,
+        [list(message_ids), limit],
+    )
@@ -1,4 +1,8 @@
+from dataclasses import dataclass
+from typing import List
+
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 
 from agir.events.models import Event
@@ -6,6 +10,7 @@ from agir.events.serializers import EventSerializer
 from agir.groups.serializers import SupportGroupSerializer
 from agir.lib.serializers import FlexibleFieldsMixin
 from agir.msgs.models import SupportGroupMessage, SupportGroupMessageComment, UserReport
+from agir.msgs.queries import get_recent_comments
 from agir.people.serializers import PersonSerializer
 
 
@@ -28,12 +33,28 @@ class MessageCommentSerializer(BaseMessageSerializer):
         fields = ("id", "author", "text", "image", "created")
 
 
+@dataclass
+class PreloadedMessageData:
+    recent_comments: List[SupportGroupMessageComment]
+    comment_count: int
+
+
 class LinkedEventField(serializers.RelatedField):
     queryset = Event.objects.all()
 
+    def get_attribute(self, instance):
+        # dans les listes de messages, les événements liés de toute la page ont déjà
+        # été sérialisés ensemble (voir SupportGroupMessageSerializer.preload)
+        linked_events = getattr(self.parent, "linked_events", {})
+        if instance.linked_event_id in linked_events:
+            return linked_events[instance.linked_event_id]
+        return super().get_attribute(instance)
+
     def to_representation(self, obj):
         if obj is None:
             return None
+        if isinstance(obj, dict):
+            return obj
         return EventSerializer(obj, context=self.context).data
 
     def to_internal_value(self, pk):
@@ -42,8 +63,27 @@ class LinkedEventField(serializers.RelatedField):
         return self.queryset.model.objects.get(pk=pk)
 
 
+class SupportGroupMessageListSerializer(serializers.ListSerializer):
+    """Sérialise une page de messages en préchargeant leurs commentaires récents et
+    leurs événements liés
+
+    Le nombre de requêtes ne dépend ainsi ni du nombre de messages, ni du nombre de
+    commentaires.
+    """
+
+    def to_representation(self, data):
+        messages = list(data.all() if hasattr(data, "all") else data)
+        self.child.preload(messages, linked_events=True)
+        return [self.child.to_representation(message) for message in messages]
+
+
 class SupportGroupMessageSerializer(BaseMessageSerializer):
     RECENT_COMMENT_LIMIT = 4
+    LINKED_EVENT_FIELDS = EventSerializer.EVENT_CARD_FIELDS + [
+        "hasSubscriptionForm",
+        "compteRendu",
+        "groups",
+    ]
     LIST_FIELDS = (
         "id",
         "created",
@@ -75,24 +115,86 @@ class SupportGroupMessageSerializer(BaseMessageSerializer):
     commentCount = serializers.SerializerMethodField(read_only=True)
     comments = serializers.SerializerMethodField(read_only=True)
 
+    def preload(self, messages, linked_events=False):
+        """Charge en un nombre constant de requêtes les auteurs, les commentaires
+        récents et le nombre de commentaires de tous les messages
+
+        :param linked_events: sérialise aussi, en une seule fois, les événements liés
+        """
+        if not hasattr(self, "_preloaded"):
+            self._preloaded = {}
+
+        messages = [m for m in messages if m.pk not in self._preloaded]
+        if not messages:
+            return
+
+        prefetch_related_objects(
+            [m for m in messages if not SupportGroupMessage.author.is_cached(m)],
+            "author",
+        )
+
+        recent_comments = {m.pk: [] for m in messages}
+        comment_counts = {m.pk: 0 for m in messages}
+        if {"recentComments", "commentCount"}.intersection(self.fields):
+            comments = list(
+                get_recent_comments([m.pk for m in messages], self.RECENT_COMMENT_LIMIT)
+            )
+            prefetch_related_objects(comments, "author")
+            for comment in comments:
+                recent_comments[comment.message_id].append(comment)
+                comment_counts[comment.message_id] = comment.total_count
+
+        for message in messages:
+            self._preloaded[message.pk] = PreloadedMessageData(
+                recent_comments=recent_comments[message.pk][::-1],
+                comment_count=comment_counts[message.pk],
+            )
+
+        if linked_events and "linkedEvent" in self.fields:
+            self.preload_linked_events(
+                {m.linked_event_id for m in messages if m.linked_event_id}
+            )
+
+    def preload_linked_events(self, ids):
+        if not hasattr(self, "linked_events"):
+            self.linked_events = {}
+
+        ids = ids.difference(self.linked_events)
+        if not ids:
+            return
+
+        events = Event.objects.filter(pk__in=ids).select_related("subtype")
+        user = self.context["request"].user
+        if user.is_authenticated and user.person:
+            events = events.with_serializer_prefetch(user.person)
+
+        events = list(events)
+        serializer = EventSerializer(
+            events, context=self.context, many=True, fields=self.LINKED_EVENT_FIELDS,
+        )
+        for event, data in zip(events, serializer.data):
+            self.linked_events[event.pk] = data
+
+    def get_preloaded(self, obj):
+        if obj.pk not in getattr(self, "_preloaded", {}):
+            self.preload([obj])
+        return self._preloaded[obj.pk]
+
     def get_recentComments(self, obj):
-        recent_comments = obj.comments.filter(deleted=False).order_by("-created")[
-            : self.RECENT_COMMENT_LIMIT
-        ]
-        if recent_comments is not None:
-            recent_comments = MessageCommentSerializer(
-                reversed(recent_comments), context=self.context, many=True
-            ).data
-        return recent_comments
+        return MessageCommentSerializer(
+            self.get_preloaded(obj).recent_comments, context=self.context, many=True
+        ).data
 
     def get_commentCount(self, obj):
-        count = obj.comments.filter(deleted=False).count()
+        count = self.get_preloaded(obj).comment_count
         if count > self.RECENT_COMMENT_LIMIT:
             return count
 
     def get_comments(self, obj):
         return MessageCommentSerializer(
-            obj.comments.filter(deleted=False).order_by("created"),
+            obj.comments.filter(deleted=False)
+            .select_related("author")
+            .order_by("created"),
             context=self.context,
             many=True,
         ).data
@@ -111,6 +213,7 @@ class SupportGroupMessageSerializer(BaseMessageSerializer):
             "comments",
             "commentCount",
         )
+        list_serializer_class = SupportGroupMessageListSerializer
 
 
 class ContentTypeChoiceField(serializers.ChoiceField):
@@ -1,23 +1,26 @@
+import shutil
 from argparse import FileType
-from io import BytesIO
+from tempfile import TemporaryFile
 
-import pandas as pd
 from django.core.mail import EmailMessage, get_connection
 from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
 from django.utils import timezone
-from glom import Coalesce, T, glom
-
+from glom import Coalesce, T
+
+from agir.lib.export import (
+    EXPORT_FORMATS,
+    iterate_in_chunks,
+    spec_to_dicts,
+    write_export,
+)
 from agir.lib.management_utils import month_argument, month_range, email_argument
 from agir.payments.models import Payment
 from agir.system_pay.models import SystemPayTransaction
 
 FILE_DESC = {
-    "Code_uuid": (
-        "systempaytransaction_set",
-        T.get(status=SystemPayTransaction.STATUS_COMPLETED),
-        "uuid",
-        T.hex,
-    ),
+    # les transactions réussies sont préchargées par lots (voir `handle`)
+    "Code_uuid": ("completed_transactions", T[0], "uuid", T.hex),
     "No_abonnement": "subscription.id",
     "Email": Coalesce("person.email", "email"),
     "Nom": Coalesce("person.last_name", "subscription.meta.last_name"),
@@ -61,6 +64,8 @@ FILE_DESC = {
 }
 
 
+CONTENT_TYPES = {"xls": "application/vnd.ms-excel", "csv": "text/csv"}
+
 MESSAGE_BODY = """
 Bonjour,
 
@@ -97,8 +102,16 @@ class Command(BaseCommand):
             type=FileType(mode="wb"),
             help="Le chemin où sauvegarder l'extraction.",
         )
+        parser.add_argument(
+            "-f",
+            "--format",
+            dest="format",
+            choices=EXPORT_FORMATS,
+            default="xls",
+            help="Le format de l'extraction (XLS par défaut).",
+        )
 
-    def handle(self, *args, month, emails, output, **options):
+    def handle(self, *args, month, emails, output, format, **options):
         if month is None:
             now = timezone.now()
             month = month_range(now.year, now.month)
@@ -110,38 +123,55 @@ class Command(BaseCommand):
                 created__range=month,
             )
             .select_related("subscription", "person")
-            .prefetch_related("systempaytransaction_set")
+            .prefetch_related(
+                "person__emails",
+                Prefetch(
+                    "systempaytransaction_set",
+                    queryset=SystemPayTransaction.objects.filter(
+                        status=SystemPayTransaction.STATUS_COMPLETED
+                    ),
+                    to_attr="completed_transactions",
+                ),
+            )
+            .order_by("created", "id")
         )
 
-        results = glom(payments, [FILE_DESC])
-
-        df = pd.DataFrame(results)
-        xls_buffer = BytesIO()
-        df.to_excel(xls_buffer, engine="xlwt", index=False)
-        xls_file = xls_buffer.getvalue()
-
-        if not output and not emails:
-            self.stdout.buffer.write(xls_file)
-
-        if output:
-            output.write(xls_file)
-
-        if emails:
-            connection = get_connection()
-
-            with connection:
-                for e in emails:
-
-                    message = EmailMessage(
-                        subject=f"Export des abonnements — {month[0].strftime('%m/%Y')}",
-                        body=MESSAGE_BODY,
-                        from_email="nepasrepondre@lafranceinsoumise.fr",
-                        to=[e],
-                        connection=connection,
-                    )
-                    message.attach(
-                        f"export-{month[0].strftime('%m-%Y')}.xls",
-                        xls_file,
-                        "application/vnd.ms-excel",
-                    )
-                    message.send()
+        # l'extraction est écrite au fur et à mesure dans un fichier temporaire, puis
+        # recopiée vers chacune des destinations
+        with TemporaryFile() as export_file:
+            write_export(
+                spec_to_dicts(iterate_in_chunks(payments), FILE_DESC),
+                list(FILE_DESC),
+                export_file,
+                format=format,
+            )
+
+            if not output and not emails:
+                export_file.seek(0)
+                shutil.copyfileobj(export_file, self.stdout.buffer)
+
+            if output:
+                export_file.seek(0)
+                shutil.copyfileobj(export_file, output)
+
+            if emails:
+                export_file.seek(0)
+                content = export_file.read()
+                connection = get_connection()
+
+                with connection:
+                    for e in emails:
+
+                        message = EmailMessage(
+                            subject=f"Export des abonnements — {month[0].strftime('%m/%Y')}",
+                            body=MESSAGE_BODY,
+                            from_email="nepasrepondre@lafranceinsoumise.fr",
+                            to=[e],
+                            connection=connection,
+                        )
+                        message.attach(
+                            f"export-{month[0].strftime('%m-%Y')}.{format}",
+                            content,
+                            CONTENT_TYPES[format],
+                        )
+                        message.send()
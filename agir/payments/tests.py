@@ -1,3 +1,73 @@
+import uuid
+from io import BytesIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from agir.donations.apps import DonsConfig
+from agir.payments.models import Payment, Subscription
+from agir.people.models import Person
+from agir.system_pay import SystemPayPaymentMode
+from agir.system_pay.models import SystemPayTransaction
+
+
+class ExportSubscriptionsTestCase(TestCase):
+    def setUp(self):
+        self.person = Person.objects.create_insoumise(
+            "donateur@example.com",
+            first_name="Marie",
+            last_name="Curie",
+            location_zip="75005",
+            location_city="Paris",
+        )
+        self.subscription = Subscription.objects.create(
+            person=self.person,
+            price=1000,
+            type=DonsConfig.SUBSCRIPTION_TYPE,
+            mode=SystemPayPaymentMode.id,
+            status=Subscription.STATUS_ACTIVE,
+        )
+
+        for _ in range(3):
+            payment = Payment.objects.create(
+                person=self.person,
+                email=self.person.email,
+                price=1000,
+                type=DonsConfig.SUBSCRIPTION_TYPE,
+                mode=SystemPayPaymentMode.id,
+                status=Payment.STATUS_COMPLETED,
+                subscription=self.subscription,
+            )
+            SystemPayTransaction.objects.create(
+                payment=payment,
+                status=SystemPayTransaction.STATUS_ABANDONED,
+                uuid=uuid.uuid4(),
+            )
+            SystemPayTransaction.objects.create(
+                payment=payment,
+                status=SystemPayTransaction.STATUS_COMPLETED,
+                uuid=uuid.uuid4(),
+            )
+
+    def test_export_subscriptions_as_csv(self):
+        output = BytesIO()
+        call_command(
+            "export_subscriptions",
+            timezone.now().strftime("%Y-%m"),
+            output=output,
+            format="csv",
+        )
+
+        lines = output.getvalue().decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith("Code_uuid,No_abonnement,Email,Nom"))
 
-# Create your tests here.
+        completed_uuids = {
+            t.uuid.hex
+            for t in SystemPayTransaction.objects.filter(
+                status=SystemPayTransaction.STATUS_COMPLETED
+            )
+        }
+        self.assertEqual({line.split(",")[0] for line in lines[1:]}, completed_uuids)
+        self.assertIn(",donateur@example.com,Curie,Marie,", lines[1])
@@ -0,0 +1,21 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # la table des personnes est trop grosse pour être verrouillée pendant la
+    # création de l'index
+    atomic = False
+
+    dependencies = [
+        ("people", "0004_display_name_and_image"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="person",
+            index=models.Index(
+                fields=["created", "id"], name="people_created_id_index"
+            ),
+        ),
+    ]
@@ -464,6 +464,8 @@ class Person(
         indexes = (
             GinIndex(fields=["search"], name="search_index"),
             models.Index(fields=["contact_phone"], name="contact_phone_index"),
+            # utilisé par la pagination par curseur de l'API
+            models.Index(fields=["created", "id"], name="people_created_id_index"),
         )
 
     def save(self, *args, **kwargs):
@@ -501,6 +503,12 @@ class Person(
 
     @cached_property
     def primary_email(self):
+        if "emails" in getattr(self, "_prefetched_objects_cache", {}):
+            # évite une requête par personne lorsque les emails ont été préchargés
+            emails = self.emails.all()
+            return next((e for e in emails if not e._bounced), None) or next(
+                iter(emails), None
+            )
         return self.emails.filter(_bounced=False).first() or self.emails.first()
 
     @property
@@ -297,6 +297,44 @@ class LegacyPersonEndpointTestCase(APITestCase):
             ],
         )
 
+    def test_can_list_persons_with_cursor(self):
+        request = self.factory.get("", {"cursor": "", "max_results": 3})
+        self.as_viewer(request)
+        response = self.list_view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["_items"]), 3)
+        self.assertIn("next", response.data["_links"])
+        self.assertEqual(response.data["_meta"]["max_results"], 3)
+
+        emails = [person["email"] for person in response.data["_items"]]
+
+        request = self.factory.get(response.data["_links"]["next"]["href"])
+        self.as_viewer(request)
+        response = self.list_view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["_items"]), 1)
+        self.assertNotIn("next", response.data["_links"])
+
+        emails.extend(person["email"] for person in response.data["_items"])
+        self.assertEqual(
+            emails,
+            [
+                "jean.georges@domain.com",
+                "viewer@viewer.fr",
+                "adder@adder.fr",
+                "changer@changer.fr",
+            ],
+        )
+
+    def test_invalid_cursor_gives_404(self):
+        request = self.factory.get("", {"cursor": "nimp"})
+        self.as_viewer(request)
+        response = self.list_view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_can_post_users_with_empty_null_and_blank_fields(self):
         request = self.factory.post(
             "",
@@ -0,0 +1,97 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from agir.lib.stats import get_general_stats, get_instant_stats
+from .models import StatisticsSnapshot
+
+
+def local_midnight(date=None):
+    """Renvoie minuit, heure locale, du jour de `date`
+
+    Le décalage horaire est calculé pour minuit : les jours de changement d'heure, il
+    diffère de celui de `date`.
+    """
+    if date is None:
+        date = timezone.now()
+    day = timezone.localtime(date).date()
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def get_period_stats(start, end):
+    """Renvoie les statistiques de flux sur la période [start, end]
+
+    Les statistiques des périodes terminées sont enregistrées lors de leur premier calcul
+    puis relues : seules les périodes en cours sont recalculées à chaque appel.
+    """
+    if end > timezone.now():
+        return get_general_stats(start, end)
+
+    snapshot = StatisticsSnapshot.objects.filter(
+        kind=StatisticsSnapshot.KIND_PERIOD, start=start, end=end
+    ).first()
+
+    if snapshot is None:
+        snapshot, _ = StatisticsSnapshot.objects.update_or_create(
+            kind=StatisticsSnapshot.KIND_PERIOD,
+            start=start,
+            end=end,
+            defaults={"values": get_general_stats(start, end)},
+        )
+
+    return snapshot.values
+
+
+def store_instant_stats(date=None):
+    date = local_midnight(date)
+    snapshot, _ = StatisticsSnapshot.objects.update_or_create(
+        kind=StatisticsSnapshot.KIND_INSTANT,
+        start=date,
+        end=date,
+        defaults={"values": get_instant_stats()},
+    )
+    return snapshot
+
+
+def get_latest_instant_stats(max_age=timedelta(days=1)):
+    """Renvoie les dernières statistiques de stock enregistrées, si elles datent de
+    moins de `max_age`, ou les calcule sinon"""
+    snapshot = (
+        StatisticsSnapshot.objects.filter(
+            kind=StatisticsSnapshot.KIND_INSTANT, created__gt=timezone.now() - max_age,
+        )
+        .order_by("-end")
+        .first()
+    )
+
+    if snapshot is None:
+        return get_instant_stats()
+
+    return snapshot.values
+
+
+def fill_daily_stats(since, until=None):
+    """Calcule les statistiques de flux des journées terminées depuis `since` qui n'ont
+    pas encore été enregistrées
+
+    :return: le nombre de journées calculées
+    """
+    until = local_midnight(until)
+    day = local_midnight(since)
+
+    existing = set(
+        StatisticsSnapshot.objects.filter(
+            kind=StatisticsSnapshot.KIND_PERIOD, start__gte=day, end__lte=until,
+        ).values_list("start", "end")
+    )
+
+    filled = 0
+    while day < until:
+        # calcul en heure locale pour que les changements d'heure ne décalent pas les jours
+        next_day = local_midnight(day + timedelta(hours=36))
+        if (day, next_day) not in existing:
+            get_period_stats(day, next_day)
+            filled += 1
+        day = next_day
+
+    return filled
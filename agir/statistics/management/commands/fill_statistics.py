@@ -0,0 +1,27 @@
+import datetime
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from agir.statistics.actions import fill_daily_stats, store_instant_stats
+
+
+def parse_date(s):
+    return timezone.make_aware(datetime.datetime.strptime(s, "%Y-%m-%d"))
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcule et enregistre les statistiques quotidiennes manquantes depuis une date, "
+        "ainsi que les statistiques de stock du jour."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "since", type=parse_date, help="Date de début, au format AAAA-MM-JJ."
+        )
+
+    def handle(self, *args, since, **options):
+        filled = fill_daily_stats(since)
+        store_instant_stats()
+        self.stdout.write(f"{filled} journées calculées.")
@@ -0,0 +1,51 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="StatisticsSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("I", "Stock"), ("P", "Flux sur une période")],
+                        max_length=1,
+                        verbose_name="Type",
+                    ),
+                ),
+                ("start", models.DateTimeField(verbose_name="Début de la période")),
+                ("end", models.DateTimeField(verbose_name="Fin de la période")),
+                ("values", models.JSONField(default=dict, verbose_name="Valeurs")),
+                (
+                    "created",
+                    models.DateTimeField(auto_now=True, verbose_name="Date de calcul"),
+                ),
+            ],
+            options={
+                "verbose_name": "Instantané des statistiques",
+                "verbose_name_plural": "Instantanés des statistiques",
+                "ordering": ("-end",),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="statisticssnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("kind", "start", "end"), name="unique_statistics_snapshot"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import models
+
+__all__ = ["StatisticsSnapshot"]
+
+
+class StatisticsSnapshot(models.Model):
+    """Valeurs précalculées des statistiques de la plateforme
+
+    Un instantané de stock enregistre les valeurs de `get_instant_stats` à une date
+    donnée ; un instantané de flux celles de `get_general_stats` sur une période
+    terminée, qui n'ont donc plus besoin d'être recalculées.
+    """
+
+    KIND_INSTANT = "I"
+    KIND_PERIOD = "P"
+    KIND_CHOICES = ((KIND_INSTANT, "Stock"), (KIND_PERIOD, "Flux sur une période"))
+
+    kind = models.CharField("Type", max_length=1, choices=KIND_CHOICES)
+    start = models.DateTimeField("Début de la période")
+    end = models.DateTimeField("Fin de la période")
+    values = models.JSONField("Valeurs", default=dict)
+    created = models.DateTimeField("Date de calcul", auto_now=True)
+
+    class Meta:
+        verbose_name = "Instantané des statistiques"
+        verbose_name_plural = "Instantanés des statistiques"
+        ordering = ("-end",)
+        constraints = (
+            models.UniqueConstraint(
+                fields=["kind", "start", "end"], name="unique_statistics_snapshot"
+            ),
+        )
+
+    def __str__(self):
+        if self.kind == self.KIND_INSTANT:
+            return f"Stock au {self.end:%d/%m/%Y}"
+        return f"Flux du {self.start:%d/%m/%Y} au {self.end:%d/%m/%Y}"
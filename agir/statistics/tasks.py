@@ -0,0 +1,14 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+
+from .actions import store_instant_stats, fill_daily_stats, local_midnight
+
+
+@shared_task
+def store_daily_statistics():
+    store_instant_stats()
+    fill_daily_stats(
+        since=local_midnight() - timedelta(days=settings.STATISTICS_FILL_DAYS)
+    )
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from agir.people.models import Person
+from agir.statistics.actions import (
+    fill_daily_stats,
+    get_period_stats,
+    local_midnight,
+)
+from agir.statistics.models import StatisticsSnapshot
+
+
+class StatisticsSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.today = local_midnight()
+
+    def test_local_midnight_on_daylight_saving_day(self):
+        # le 28 mars 2021, Paris passe de UTC+1 à UTC+2 à 2h du matin
+        afternoon = timezone.make_aware(datetime(2021, 3, 28, 15))
+        midnight = local_midnight(afternoon)
+
+        self.assertEqual(midnight, timezone.make_aware(datetime(2021, 3, 28)))
+        self.assertEqual(midnight.utcoffset(), timedelta(hours=1))
+
+    def test_past_periods_are_stored_and_reused(self):
+        start = self.today - timedelta(days=7)
+
+        stats = get_period_stats(start, self.today)
+        self.assertEqual(
+            StatisticsSnapshot.objects.filter(
+                kind=StatisticsSnapshot.KIND_PERIOD
+            ).count(),
+            1,
+        )
+
+        with patch("agir.statistics.actions.get_general_stats") as get_general_stats:
+            self.assertEqual(get_period_stats(start, self.today), stats)
+            get_general_stats.assert_not_called()
+
+    def test_current_period_is_not_stored(self):
+        get_period_stats(self.today, timezone.now() + timedelta(hours=1))
+        self.assertFalse(StatisticsSnapshot.objects.exists())
+
+    def test_fill_only_missing_days(self):
+        Person.objects.create_insoumise("a@a.a")
+
+        self.assertEqual(fill_daily_stats(self.today - timedelta(days=3)), 3)
+        self.assertEqual(fill_daily_stats(self.today - timedelta(days=5)), 2)
+        self.assertEqual(StatisticsSnapshot.objects.count(), 5)
@@ -49,3 +49,38 @@ class SystemPayTransactionAdmin(admin.ModelAdmin):
             return obj.alias.identifier
 
         return "-"
+
+
+@admin.register(models.SystemPayWebhookCall)
+class SystemPayWebhookCallAdmin(admin.ModelAdmin):
+    list_display = ("id", "created", "order_id", "mode", "status", "attempts")
+    readonly_fields = (
+        "id",
+        "created",
+        "processed",
+        "mode",
+        "order_id",
+        "status",
+        "attempts",
+        "last_error",
+        "data",
+    )
+    fields = readonly_fields
+    list_filter = ("status", "mode")
+    search_fields = ("order_id",)
+    actions = ("retry",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        from .tasks import process_webhook_calls
+
+        calls = queryset.exclude(status=models.SystemPayWebhookCall.STATUS_PROCESSED)
+        order_ids = set(calls.values_list("order_id", flat=True))
+        calls.update(status=models.SystemPayWebhookCall.STATUS_PENDING, attempts=0)
+
+        for order_id in order_ids:
+            process_webhook_calls.delay(order_id)
+
+    retry.short_description = "Traiter de nouveau les appels sélectionnés"
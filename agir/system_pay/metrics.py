@@ -0,0 +1,22 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+webhook_calls = Counter(
+    "agir_system_pay_webhook_calls",
+    "Appels du webhook SystemPay, par étape (reçu, traité, rejeté, en échec)",
+    ["status"],
+)
+webhook_processing_errors = Counter(
+    "agir_system_pay_webhook_processing_errors",
+    "Erreurs inattendues lors du traitement d'un appel du webhook SystemPay (chaque "
+    "erreur donne lieu à une nouvelle tentative)",
+)
+webhook_lag = Histogram(
+    "agir_system_pay_webhook_lag_seconds",
+    "Délai entre la réception d'un appel du webhook SystemPay et la fin de son "
+    "traitement",
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600, 4 * 3600),
+)
+webhook_pending_age = Gauge(
+    "agir_system_pay_webhook_oldest_pending_seconds",
+    "Âge du plus ancien appel du webhook SystemPay en attente de traitement",
+)
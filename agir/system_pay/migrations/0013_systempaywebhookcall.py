@@ -0,0 +1,101 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("system_pay", "0012_auto_20201021_1525"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SystemPayWebhookCall",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="date de création",
+                    ),
+                ),
+                (
+                    "modified",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="dernière modification"
+                    ),
+                ),
+                (
+                    "mode",
+                    models.CharField(
+                        editable=False, max_length=70, verbose_name="Mode de paiement"
+                    ),
+                ),
+                (
+                    "order_id",
+                    models.CharField(
+                        editable=False,
+                        max_length=100,
+                        verbose_name="Numéro de commande",
+                    ),
+                ),
+                (
+                    "data",
+                    models.JSONField(editable=False, verbose_name="Contenu de l'appel"),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("P", "En attente de traitement"),
+                            ("T", "Traité"),
+                            ("R", "Rejeté"),
+                            ("F", "Échec après plusieurs tentatives"),
+                        ],
+                        default="P",
+                        max_length=1,
+                        verbose_name="Statut",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0, verbose_name="Tentatives de traitement"
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(blank=True, verbose_name="Dernière erreur"),
+                ),
+                (
+                    "processed",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Date de traitement"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Appel du webhook SystemPay",
+                "verbose_name_plural": "Appels du webhook SystemPay",
+                "ordering": ("-id",),
+            },
+        ),
+        migrations.AddIndex(
+            model_name="systempaywebhookcall",
+            index=models.Index(
+                condition=models.Q(status="P"),
+                fields=["order_id", "id"],
+                name="system_pay_pending_calls",
+            ),
+        ),
+    ]
@@ -6,7 +6,12 @@ from django_prometheus.models import ExportModelOperationsMixin
 from agir.lib.models import TimeStampedModel
 
 
-__all__ = ["SystemPayTransaction", "SystemPayAlias", "SystemPaySubscription"]
+__all__ = [
+    "SystemPayTransaction",
+    "SystemPayAlias",
+    "SystemPaySubscription",
+    "SystemPayWebhookCall",
+]
 
 
 class SystemPayTransaction(
@@ -71,3 +76,46 @@ class SystemPaySubscription(
     active = models.BooleanField(
         "La souscription est active côté SystemPay", default=True
     )
+
+
+class SystemPayWebhookCall(TimeStampedModel):
+    """Appel du webhook SystemPay, enregistré à sa réception
+
+    Les appels sont traités de façon asynchrone (voir `agir.system_pay.tasks`), dans
+    l'ordre de réception pour un même numéro de commande. Les champs sensibles sont
+    retirés des données avant l'enregistrement.
+    """
+
+    STATUS_PENDING = "P"
+    STATUS_PROCESSED = "T"
+    STATUS_REJECTED = "R"
+    STATUS_FAILED = "F"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "En attente de traitement"),
+        (STATUS_PROCESSED, "Traité"),
+        (STATUS_REJECTED, "Rejeté"),
+        (STATUS_FAILED, "Échec après plusieurs tentatives"),
+    )
+
+    mode = models.CharField("Mode de paiement", max_length=70, editable=False)
+    order_id = models.CharField("Numéro de commande", max_length=100, editable=False)
+    data = JSONField("Contenu de l'appel", editable=False)
+
+    status = models.CharField(
+        "Statut", max_length=1, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField("Tentatives de traitement", default=0)
+    last_error = models.TextField("Dernière erreur", blank=True)
+    processed = models.DateTimeField("Date de traitement", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Appel du webhook SystemPay"
+        verbose_name_plural = "Appels du webhook SystemPay"
+        ordering = ("-id",)
+        indexes = (
+            models.Index(
+                fields=["order_id", "id"],
+                condition=models.Q(status="P"),
+                name="system_pay_pending_calls",
+            ),
+        )
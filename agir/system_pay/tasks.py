@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from agir.lib.celery import retriable_task
+from agir.system_pay import metrics
+from agir.system_pay.models import SystemPayWebhookCall
+from agir.system_pay.webhooks import WebhookProcessingError, process_pending_calls
+
+
+@retriable_task(
+    start=30,
+    max=3600,
+    retry_on=(WebhookProcessingError,),
+    max_retries=settings.SYSTEMPAY_WEBHOOK_MAX_ATTEMPTS,
+)
+def process_webhook_calls(order_id):
+    process_pending_calls(order_id)
+
+
+@shared_task
+def process_stale_webhook_calls():
+    """Relance le traitement des appels restés en attente
+
+    Rattrape les appels dont la tâche de traitement a été perdue (worker arrêté,
+    broker indisponible…), et met à jour la mesure du retard de traitement.
+    """
+    pending = SystemPayWebhookCall.objects.filter(
+        status=SystemPayWebhookCall.STATUS_PENDING
+    )
+
+    oldest = pending.aggregate(oldest=Min("created"))["oldest"]
+    metrics.webhook_pending_age.set(
+        (timezone.now() - oldest).total_seconds() if oldest else 0
+    )
+
+    stale_order_ids = (
+        pending.filter(
+            created__lt=timezone.now()
+            - timedelta(seconds=settings.SYSTEMPAY_WEBHOOK_STALE_DELAY)
+        )
+        .values_list("order_id", flat=True)
+        .distinct()
+    )
+    for order_id in stale_order_ids:
+        process_webhook_calls.delay(order_id)
@@ -14,9 +14,10 @@ from agir.lib.tests.mixins import FakeDataMixin
 from agir.payments.models import Payment, Subscription
 from agir.system_pay import SystemPayPaymentMode
 from agir.system_pay.crypto import get_signature
-from agir.system_pay.models import SystemPayTransaction
+from agir.system_pay.models import SystemPayTransaction, SystemPayWebhookCall
 from agir.system_pay.soap_client import SystemPaySoapClient
 from agir.system_pay.utils import get_trans_id_from_order_id
+from agir.system_pay.webhooks import process_pending_calls
 
 
 def random_subscription_id():
@@ -330,3 +331,102 @@ class WebhookTestCase(FakeDataMixin, TestCase):
         cancel_alias.assert_called_with(
             subscription.system_pay_subscriptions.get(active=False).alias
         )
+
+
+class WebhookInboxTestCase(FakeDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.payment = Payment.objects.create(
+            person=self.data["people"]["user1"],
+            price=1000,
+            type=DonsConfig.PAYMENT_TYPE,
+            mode=SystemPayPaymentMode.id,
+        )
+        self.sp_transaction = SystemPayTransaction.objects.create(payment=self.payment)
+
+    def webhook_data(self, order_id=None, **kwargs):
+        order_id = order_id or self.sp_transaction.pk
+        return webhookcall_data(
+            order_id=order_id,
+            trans_id=get_trans_id_from_order_id(order_id),
+            operation_type="DEBIT",
+            trans_status="AUTHORISED",
+            amount=self.payment.price,
+            cust_id=self.payment.person.pk,
+            **kwargs,
+        )
+
+    @mock.patch("agir.donations.views.donations_views.send_donation_email")
+    def test_calls_are_stored_without_sensitive_data_and_processed(
+        self, send_donation_email
+    ):
+        data = self.webhook_data()
+        data["vads_card_number"] = "497010XXXXXX0000"
+        data["signature"] = get_signature(data, settings.SYSTEMPAY_CERTIFICATE)
+
+        res = self.client.post(reverse("system_pay:webhook"), data)
+        self.assertEqual(res.status_code, 200)
+
+        call = SystemPayWebhookCall.objects.get()
+        self.assertEqual(call.order_id, str(self.sp_transaction.pk))
+        self.assertEqual(call.status, SystemPayWebhookCall.STATUS_PROCESSED)
+        self.assertNotIn("vads_card_number", call.data)
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_COMPLETED)
+
+    def test_invalid_signature_is_rejected_immediately(self):
+        data = self.webhook_data()
+        data["signature"] = "mauvaise signature"
+
+        res = self.client.post(reverse("system_pay:webhook"), data)
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(SystemPayWebhookCall.objects.exists())
+
+    def test_processing_errors_are_acknowledged(self):
+        res = self.client.post(
+            reverse("system_pay:webhook"),
+            self.webhook_data(order_id=self.sp_transaction.pk + 1000),
+        )
+        self.assertEqual(res.status_code, 200)
+
+        call = SystemPayWebhookCall.objects.get()
+        self.assertEqual(call.status, SystemPayWebhookCall.STATUS_REJECTED)
+        self.assertIn("order_id", call.last_error)
+
+    @mock.patch("agir.system_pay.webhooks.WebhookCallProcessor.process")
+    def test_unexpected_errors_are_retried(self, process):
+        process.side_effect = RuntimeError("base de données indisponible")
+
+        res = self.client.post(reverse("system_pay:webhook"), self.webhook_data())
+        self.assertEqual(res.status_code, 200)
+
+        call = SystemPayWebhookCall.objects.get()
+        self.assertEqual(process.call_count, settings.SYSTEMPAY_WEBHOOK_MAX_ATTEMPTS)
+        self.assertEqual(call.attempts, settings.SYSTEMPAY_WEBHOOK_MAX_ATTEMPTS)
+        self.assertEqual(call.status, SystemPayWebhookCall.STATUS_FAILED)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_WAITING)
+
+    @mock.patch("agir.donations.views.donations_views.send_donation_email")
+    def test_calls_of_an_order_are_processed_in_order(self, send_donation_email):
+        data = self.webhook_data()
+
+        # SystemPay rejoue parfois le même appel : le second doit être ignoré
+        for _ in range(2):
+            SystemPayWebhookCall.objects.create(
+                mode=SystemPayPaymentMode.id,
+                order_id=str(self.sp_transaction.pk),
+                data=data,
+            )
+
+        process_pending_calls(str(self.sp_transaction.pk))
+
+        self.assertEqual(
+            list(SystemPayWebhookCall.objects.values_list("status", flat=True)),
+            [SystemPayWebhookCall.STATUS_PROCESSED] * 2,
+        )
+        self.sp_transaction.refresh_from_db()
+        self.assertEqual(len(self.sp_transaction.webhook_calls), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, Payment.STATUS_COMPLETED)
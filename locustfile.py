@@ -4,16 +4,38 @@ import random
 from locust import between
 from pyquery import PyQuery
 
-from agir.front.locustfile import FrontTaskSet
+from agir.front.locustfile import (
+    FrontTaskSet,
+    MapTaskSet,
+    SearchTaskSet,
+    RSVPTaskSet,
+    GroupMessagesTaskSet,
+    DonationsTaskSet,
+)
 from agir.lib.locust_utils import AgirHttpUser
 
 MAX_ACCOUNTS = 1000
 
 
+def random_ip():
+    subnet = ipaddress.ip_network("10.0.0.0/8")
+    bits = random.getrandbits(subnet.max_prefixlen - subnet.prefixlen)
+    addr = ipaddress.IPv4Address(subnet.network_address + bits)
+
+    return str(addr)
+
+
 class ConnectedUser(AgirHttpUser):
     wait_time = between(1, 2)
 
-    tasks = {FrontTaskSet: 1}
+    tasks = {
+        FrontTaskSet: 4,
+        MapTaskSet: 2,
+        SearchTaskSet: 1,
+        RSVPTaskSet: 1,
+        GroupMessagesTaskSet: 2,
+        DonationsTaskSet: 1,
+    }
 
     def on_start(self):
         self.wait()  # pour que tous les utilisateurs n'arrivent pas au même moment
@@ -68,8 +90,16 @@ class ConnectedUser(AgirHttpUser):
                 return self.stop()
 
     def choose_ip(self):
-        subnet = ipaddress.ip_network("10.0.0.0/8")
-        bits = random.getrandbits(subnet.max_prefixlen - subnet.prefixlen)
-        addr = ipaddress.IPv4Address(subnet.network_address + bits)
+        return random_ip()
+
+
+class AnonymousUser(AgirHttpUser):
+    """Visiteur non connecté, qui consulte la carte, la recherche et les dons"""
 
-        return str(addr)
+    wait_time = between(1, 2)
+
+    tasks = {MapTaskSet: 3, SearchTaskSet: 2, DonationsTaskSet: 1}
+
+    def on_start(self):
+        self.wait()
+        self.headers.update({"X-Forwarded-For": random_ip()})